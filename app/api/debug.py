@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from app.core import memoria, perfilado, trazas
+from typing import Optional
+from app.core.admision import control_admision
+from app.core.coalescencia import coalescedor
+from app.core.notificaciones import escucha_cambios
+from app.indices.cercanos import cache_cercanos
+from app.indices.sugerencias import indice_sugerencias
+
+
+def verificar_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    """Exigir en todas las rutas de /debug el mismo token que el perfilado"""
+    if not perfilado.token_valido(
+        x_profile_token.encode() if x_profile_token is not None else None
+    ):
+        raise HTTPException(status_code=403, detail="Token de depuración no válido")
+
+
+router = APIRouter(dependencies=[Depends(verificar_token)])
+
+
+@router.get("/coalescencia")
+def get_metricas_coalescencia():
+    """Llamadas, ejecuciones reales y ratio de coalescencia por operación"""
+    return coalescedor.get_metricas()
+
+
+@router.get("/admision")
+def get_estado_admision():
+    """Cupos en uso, colas y rechazos de cada presupuesto de admisión"""
+    return control_admision.get_estado()
+
+
+@router.get("/notificaciones")
+def get_estado_notificaciones():
+    """Estado de la escucha LISTEN/NOTIFY y avisos recibidos"""
+    return escucha_cambios.get_estado()
+
+
+@router.get("/cercanos-cache")
+def get_estado_cache_cercanos():
+    """Entradas, aciertos e invalidaciones de la caché de búsquedas cercanas"""
+    return cache_cercanos.get_estado()
+
+
+@router.get("/sugerencias")
+def get_estado_sugerencias():
+    """Sugerencias y claves cargadas en el índice de autocompletado"""
+    return indice_sugerencias.get_estado()
+
+
+@router.get("/profiles")
+def get_perfiles():
+    """Últimos perfiles de peticiones marcadas con X-Profile: 1"""
+    return {"perfiles": perfilado.get_perfiles()}
+
+
+@router.get("/profiles/{perfil_id}")
+def get_perfil(perfil_id: int, formato: str = "texto", orden: str = "cumulative"):
+    """Perfil de una petición como texto de pstats o volcado binario (formato=pstats)"""
+    perfil = perfilado.get_perfil(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    if formato == "pstats":
+        return Response(
+            content=perfil.get_pstats(),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="perfil-{perfil_id}.pstats"'
+            },
+        )
+    try:
+        return Response(content=perfil.get_texto(orden), media_type="text/plain")
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Orden no válido: {orden}")
+
+
+@router.get("/trazas")
+def get_estado_trazas():
+    """Trazas exportadas, en cola y descartadas"""
+    return trazas.exportador.get_estado()
+
+
+@router.get("/memory")
+def get_estado_memoria():
+    """Memoria trazada, picos muestreados por ruta e instantáneas guardadas"""
+    return memoria.get_estado()
+
+
+@router.post("/memory/instantaneas")
+def tomar_instantanea_memoria(etiqueta: Optional[str] = None):
+    """Tomar una instantánea de tracemalloc para compararla más adelante"""
+    if not memoria.activo():
+        raise HTTPException(
+            status_code=400, detail="El diagnóstico de memoria no está habilitado"
+        )
+    return memoria.tomar_instantanea(etiqueta)
+
+
+@router.get("/memory/diff")
+def comparar_memoria(
+    desde: int, hasta: Optional[int] = None, agrupar: str = "lineno", limite: int = 25
+):
+    """Diferencia de memoria entre dos instantáneas (o entre una y ahora)"""
+    if not memoria.activo():
+        raise HTTPException(
+            status_code=400, detail="El diagnóstico de memoria no está habilitado"
+        )
+    if agrupar not in ("lineno", "filename", "traceback"):
+        raise HTTPException(
+            status_code=400, detail="agrupar debe ser lineno, filename o traceback"
+        )
+    diferencia = memoria.comparar(desde, hasta, agrupar, limite)
+    if diferencia is None:
+        raise HTTPException(status_code=404, detail="Instantánea no encontrada")
+    return diferencia
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.salud_service import SaludService
+
+router = APIRouter()
+
+
+@router.get("/live")
+def get_vivo():
+    """Liveness: el proceso está en marcha"""
+    salud_service = SaludService()
+    return salud_service.get_vivo()
+
+
+@router.get("/ready")
+def get_preparado():
+    """Readiness: conexiones, consultas y cachés precalentados (503 si no)"""
+    salud_service = SaludService()
+    preparado, estado = salud_service.get_preparado()
+    return JSONResponse(content=estado, status_code=200 if preparado else 503)
@@ -1,10 +1,15 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import categorias, materiales, puntos_reciclaje
+from app.api.v1.endpoints import catalogo, categorias, export, materiales, puntos_reciclaje, rutas, snapshot, sync
 
 api_router = APIRouter()
 
 api_router.include_router(categorias.router, prefix="/categorias", tags=["categorias"])
+api_router.include_router(catalogo.router, prefix="/catalogo", tags=["catalogo"])
 api_router.include_router(materiales.router, prefix="/materiales", tags=["materiales"])
 api_router.include_router(
     puntos_reciclaje.router, prefix="/puntos-reciclaje", tags=["puntos-reciclaje"]
 )
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(snapshot.router, prefix="/snapshot", tags=["snapshot"])
+api_router.include_router(rutas.router, prefix="/rutas", tags=["rutas"])
+api_router.include_router(export.router, prefix="/export", tags=["export"])
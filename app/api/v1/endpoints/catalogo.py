@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+from app.services.categoria_service import CategoriaService
+
+router = APIRouter()
+
+
+@router.get("/")
+def get_catalogo():
+    """Obtener todas las categorías con sus materiales anidados en una sola petición"""
+    categoria_service = CategoriaService()
+    # El JSON ya viene serializado de la base de datos: se envía tal cual
+    return Response(
+        content=categoria_service.get_catalogo(), media_type="application/json"
+    )
@@ -1,23 +1,41 @@
 from fastapi import APIRouter
 from sqlalchemy.util import ellipses_string
 from app.services.categoria_service import CategoriaService
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from app.core.parametros import parse_campos, parse_ids
+from app.repositories.categoria_repository import CAMPOS_CATEGORIA
+from typing import Optional
 
 router = APIRouter()
 
 
 @router.get("/")
-def get_categorias():
-    """Obtener todas las categorías de materiales"""
+def get_categorias(ids: Optional[str] = None, fields: Optional[str] = None):
+    """Obtener todas las categorías de materiales, o solo las de ?ids=1,2,3"""
     categoria_service = CategoriaService()
-    return categoria_service.get_all_categorias()
+    campos = parse_campos(fields, CAMPOS_CATEGORIA) if fields else None
+    if ids is not None:
+        return categoria_service.get_categorias_by_ids(parse_ids(ids), campos)
+    return categoria_service.get_all_categorias(campos)
 
 
 @router.get("/{categoria_id}")
-def get_categoria(categoria_id: int):
+def get_categoria(categoria_id: int, fields: Optional[str] = None):
     """Obtener una categoría de material por su ID"""
     categoria_service = CategoriaService()
-    return categoria_service.get_categoria_by_id(categoria_id)
+    campos = parse_campos(fields, CAMPOS_CATEGORIA) if fields else None
+    return categoria_service.get_categoria_by_id(categoria_id, campos)
+
+
+@router.get("/{categoria_id}/materiales")
+def get_categoria_con_materiales(categoria_id: int):
+    """Obtener una categoría de material con sus materiales"""
+    categoria_service = CategoriaService()
+    # El JSON ya viene serializado de la base de datos: se envía tal cual
+    return Response(
+        content=categoria_service.get_categoria_con_materiales(categoria_id),
+        media_type="application/json",
+    )
 
 
 @router.post("/")
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.services.export_service import ExportService
+
+router = APIRouter()
+
+
+@router.get("/puntos-materiales")
+def exportar_puntos_materiales(format: str = "ndjson"):
+    """Exportar en streaming qué materiales acepta cada punto (ndjson o csv)"""
+    export_service = ExportService()
+    tipo = export_service.validar_formato(format)
+    return StreamingResponse(
+        export_service.exportar_puntos_materiales(format),
+        media_type=tipo,
+        headers={
+            "Content-Disposition": f'attachment; filename="puntos-materiales.{format}"'
+        },
+    )
@@ -1,29 +1,66 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Response
 from app.services.material_service import MaterialService
-from typing import Optional
+from app.core.parametros import parse_campos, parse_ids
+from app.repositories.material_repository import CAMPOS_MATERIAL
+from app.config.settings import settings
+from typing import Any, Dict, List, Optional
 
 router = APIRouter()
 
 
 @router.get("/")
-def get_materiales(categoria_id: Optional[int] = None):
-    """Obtener materiales, opcionalmente filtrados por categoría"""
+def get_materiales(
+    categoria_id: Optional[int] = None,
+    ids: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Obtener materiales, opcionalmente filtrados por categoría o por ?ids=1,2,3.
+
+    ?fields=id,nombre,categoria_id limita las columnas consultadas y devueltas.
+    """
     material_service = MaterialService()
-    return material_service.get_materiales(categoria_id)
+    campos = parse_campos(fields, CAMPOS_MATERIAL) if fields else None
+    if ids is not None:
+        return material_service.get_materiales_by_ids(parse_ids(ids), campos)
+    return material_service.get_materiales(categoria_id, campos)
 
 
 @router.get("/categoria/{categoria_id}")
-def get_materiales_por_categoria(categoria_id: int):
+def get_materiales_por_categoria(categoria_id: int, fields: Optional[str] = None):
     """Obtener materiales por categoría"""
     material_service = MaterialService()
-    return material_service.get_materiales_por_categoria(categoria_id)
+    campos = parse_campos(fields, CAMPOS_MATERIAL) if fields else None
+    return material_service.get_materiales_por_categoria(categoria_id, campos)
+
+
+# Debe declararse antes de /{material_id} para que no se tome como un ID
+@router.get("/sugerencias")
+def get_sugerencias(
+    prefijo: str = Query(..., min_length=1, max_length=100),
+    limite: int = Query(settings.sugerencias_limite, ge=1, le=settings.sugerencias_maximo),
+):
+    """Sugerir materiales y categorías cuyo nombre o ejemplos empiezan por el prefijo"""
+    material_service = MaterialService()
+    return material_service.get_sugerencias(prefijo, limite)
 
 
 @router.get("/{material_id}")
-def get_puntos_por_material(material_id: int):
+def get_puntos_por_material(material_id: int, fields: Optional[str] = None):
     """Obtener puntos que aceptan un material específico"""
     material_service = MaterialService()
-    return material_service.get_material_by_id(material_id)
+    campos = parse_campos(fields, CAMPOS_MATERIAL) if fields else None
+    return material_service.get_material_by_id(material_id, campos)
+
+
+@router.get("/{material_id}/puntos-reciclaje")
+def get_puntos_reciclaje_por_material(material_id: int):
+    """Obtener un material con los puntos de reciclaje que lo aceptan"""
+    material_service = MaterialService()
+    # El JSON ya viene serializado de la base de datos: se envía tal cual
+    return Response(
+        content=material_service.get_puntos_por_material(material_id),
+        media_type="application/json",
+    )
 
 
 @router.post("/")
@@ -33,6 +70,13 @@ def create_material(data: dict):
     return material_service.create_material(data)
 
 
+@router.patch("/batch")
+def update_materiales_lote(items: List[Dict[str, Any]]):
+    """Actualizar varios materiales en una sola transacción"""
+    material_service = MaterialService()
+    return material_service.update_materiales_lote(items)
+
+
 @router.patch("/{material_id}")
 def update_material(material_id: int, data: dict):
     """Actualizar un material existente"""
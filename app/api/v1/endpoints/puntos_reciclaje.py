@@ -1,26 +1,100 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Response
 from app.services.punto_reciclaje_service import PuntoReciclajeService
-from typing import Optional
+from app.core.parametros import parse_campos, parse_ids
+from app.repositories.punto_reciclaje_repository import CAMPOS_PUNTO
+from app.config.settings import settings
+from typing import Any, Dict, List, Optional, Union
 
 router = APIRouter()
 
 
 @router.get("/")
-def get_puntos_reciclaje(ciudad: Optional[str] = None):
-    """Obtener puntos de reciclaje, opcionalmente filtrados por ciudad"""
+def get_puntos_reciclaje(
+    ciudad: Optional[str] = None,
+    ids: Optional[str] = None,
+    fields: Optional[str] = None,
+    materiales: Optional[str] = None,
+    modo: str = "all",
+):
+    """Obtener puntos de reciclaje, opcionalmente filtrados por ciudad, por ?ids=1,2,3
+    o por los materiales que aceptan (?materiales=1,5,9&modo=all|any)"""
     punto_service = PuntoReciclajeService()
-    return punto_service.get_puntos_reciclaje(ciudad)
+    campos = parse_campos(fields, CAMPOS_PUNTO) if fields else None
+    if materiales is not None:
+        if modo not in ("all", "any"):
+            raise HTTPException(
+                status_code=400, detail="El parámetro 'modo' debe ser 'all' o 'any'"
+            )
+        return punto_service.get_puntos_por_materiales(
+            parse_ids(materiales, nombre="materiales"), modo, ciudad, campos
+        )
+    if ids is not None:
+        return punto_service.get_puntos_by_ids(parse_ids(ids), campos)
+    return punto_service.get_puntos_reciclaje(ciudad, campos)
+
+
+@router.post("/", status_code=201)
+def create_punto_reciclaje(data: dict):
+    """Crear un punto de reciclaje"""
+    punto_service = PuntoReciclajeService()
+    return punto_service.create_punto(data)
+
+
+@router.get("/facetas")
+def get_facetas(
+    ciudad: Optional[str] = None,
+    tipo_instalacion: Optional[str] = None,
+    estado: Optional[str] = None,
+    categoria_id: Optional[int] = None,
+):
+    """Conteos de puntos por faceta, acotados por los filtros de las demás facetas"""
+    punto_service = PuntoReciclajeService()
+    return punto_service.get_facetas(ciudad, tipo_instalacion, estado, categoria_id)
 
 
 @router.get("/cercanos")
-def get_puntos_cercanos(lat: float, lng: float, radio: Optional[float] = None):
-    """Buscar puntos de reciclaje cercanos a una ubicación"""
+def get_puntos_cercanos(
+    lat: float,
+    lng: float,
+    radio: Optional[float] = None,
+    k: Optional[int] = Query(None, ge=1, le=settings.knn_maximo),
+):
+    """Buscar puntos de reciclaje cercanos a una ubicación, o los k más cercanos con ?k="""
     punto_service = PuntoReciclajeService()
-    return punto_service.get_puntos_cercanos(lat, lng, radio)
+    return punto_service.get_puntos_cercanos(lat, lng, radio, k)
 
 
 @router.get("/{punto_id}/materiales")
 def get_materiales_por_punto(punto_id: int):
     """Obtener materiales que acepta un punto específico"""
     punto_service = PuntoReciclajeService()
-    return punto_service.get_materiales_por_punto(punto_id)
+    # El JSON ya viene serializado de la base de datos: se envía tal cual
+    return Response(
+        content=punto_service.get_materiales_por_punto(punto_id),
+        media_type="application/json",
+    )
+
+
+@router.put("/{punto_id}/materiales")
+def reemplazar_materiales_punto(
+    punto_id: int, materiales: List[Union[int, Dict[str, Any]]]
+):
+    """Reemplazar los materiales que acepta un punto en una sola transacción"""
+    punto_service = PuntoReciclajeService()
+    return punto_service.reemplazar_materiales(punto_id, materiales)
+
+
+# PUT se acepta igual que PATCH (actualización parcial), como lo usa demo_crud.py
+@router.put("/{punto_id}")
+@router.patch("/{punto_id}")
+def update_punto_reciclaje(punto_id: int, data: dict):
+    """Actualizar un punto de reciclaje existente"""
+    punto_service = PuntoReciclajeService()
+    return punto_service.update_punto(punto_id, data)
+
+
+@router.delete("/{punto_id}")
+def delete_punto_reciclaje(punto_id: int):
+    """Eliminar un punto de reciclaje y sus relaciones con materiales"""
+    punto_service = PuntoReciclajeService()
+    return punto_service.delete_punto(punto_id)
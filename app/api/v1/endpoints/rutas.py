@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from app.services.ruta_service import RutaService
+from app.schemas.ruta import PlanificarRutaRequest
+
+router = APIRouter()
+
+
+@router.post("/planificar")
+def planificar_ruta(solicitud: PlanificarRutaRequest):
+    """Planificar un recorrido de entrega con pocas paradas que acepten todos los materiales"""
+    ruta_service = RutaService()
+    return ruta_service.planificar(
+        solicitud.latitud, solicitud.longitud, solicitud.materiales
+    )
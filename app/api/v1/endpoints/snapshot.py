@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Header, Response
+from fastapi.responses import StreamingResponse
+from app.services.snapshot_service import SnapshotService
+from typing import Iterator, Optional, Union
+
+router = APIRouter()
+
+TIPO_SNAPSHOT = "application/gzip"
+TAMANO_TROZO = 64 * 1024
+
+
+def _coincide_etag(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110): admite "*", listas
+    separadas por comas y validadores W/"..." """
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidato.strip().removeprefix("W/") == etag
+        for candidato in if_none_match.split(",")
+    )
+
+
+def _trozos(datos: Union[bytes, memoryview]) -> Iterator[bytes]:
+    """Enviar el snapshot por trozos: con memoria compartida, la vista del
+    mmap no se copia entera en cada petición"""
+    vista = memoryview(datos)
+    for inicio in range(0, len(vista), TAMANO_TROZO):
+        yield bytes(vista[inicio : inicio + TAMANO_TROZO])
+
+
+@router.get("/")
+def get_snapshot(
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Descargar el snapshot del catálogo completo (admite descargas por rangos)"""
+    snapshot_service = SnapshotService()
+    datos, version = snapshot_service.get_snapshot()
+    etag = f'"{version}"'
+    cabeceras = {"ETag": etag, "Accept-Ranges": "bytes"}
+
+    if if_none_match and _coincide_etag(if_none_match, etag):
+        return Response(status_code=304, headers=cabeceras)
+
+    # Un rango solo es válido si el cliente sigue descargando la misma versión
+    if range and (if_range is None or if_range == etag):
+        inicio, fin = snapshot_service.get_rango(range, len(datos))
+        cabeceras["Content-Range"] = f"bytes {inicio}-{fin}/{len(datos)}"
+        cabeceras["Content-Length"] = str(fin - inicio + 1)
+        return StreamingResponse(
+            _trozos(memoryview(datos)[inicio : fin + 1]),
+            status_code=206,
+            media_type=TIPO_SNAPSHOT,
+            headers=cabeceras,
+        )
+
+    cabeceras["Content-Length"] = str(len(datos))
+    return StreamingResponse(
+        _trozos(datos), media_type=TIPO_SNAPSHOT, headers=cabeceras
+    )
+
+
+@router.get("/version")
+def get_version_snapshot():
+    """Consultar la versión actual del snapshot sin descargarlo"""
+    snapshot_service = SnapshotService()
+    return snapshot_service.get_info()
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.services.sync_service import SyncService
+from typing import Optional
+
+router = APIRouter()
+
+
+@router.get("/")
+def get_cambios(since: Optional[str] = None):
+    """Obtener categorías, materiales, puntos y relaciones cambiados desde el token"""
+    sync_service = SyncService()
+    return sync_service.get_cambios(since)
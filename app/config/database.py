@@ -1,9 +1,16 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import threading
 import psycopg2
+from psycopg2 import errors
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from .settings import settings
+from app.core.plazos import PlazoExcedido, restante_ms
+from app.core.trazas import ConexionTrazada
 
 engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,5 +25,160 @@ def get_db():
         db.close()
 
 
-def get_db_connection():
-    return psycopg2.connect(settings.database_url, cursor_factory=RealDictCursor)
+class PoolConexiones:
+    """Pool de conexiones psycopg2 que espera (con límite) en lugar de fallar.
+
+    ThreadedConnectionPool lanza PoolError al agotarse; el semáforo hace que
+    los hilos esperen hasta settings.db_pool_espera_segundos por una conexión.
+    """
+
+    def __init__(self, minimo: int, maximo: int, dsn: str):
+        self.minimo = minimo
+        self.maximo = maximo
+        opciones: Dict[str, Any] = {"cursor_factory": RealDictCursor}
+        if settings.trazas_habilitadas:
+            opciones["connection_factory"] = ConexionTrazada
+        self._pool = ThreadedConnectionPool(minimo, maximo, dsn, **opciones)
+        self._disponibles = threading.BoundedSemaphore(maximo)
+        self._en_uso = 0
+        # PID de backend de cada conexión del pool (ver es_conexion_propia);
+        # lo escriben los hilos de las peticiones y lo lee la escucha de NOTIFY
+        self._pids: Dict[int, int] = {}
+        self._pids_lock = threading.Lock()
+
+    def obtener(self, espera: Optional[float] = None):
+        if not self._disponibles.acquire(
+            timeout=settings.db_pool_espera_segundos if espera is None else espera
+        ):
+            raise psycopg2.OperationalError(
+                "No hay conexiones disponibles en el pool de base de datos"
+            )
+        try:
+            conn = self._pool.getconn()
+            if conn.closed:
+                # El servidor cerró la conexión inactiva: reemplazarla
+                with self._pids_lock:
+                    self._pids.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._disponibles.release()
+            raise
+        with self._pids_lock:
+            if id(conn) not in self._pids:
+                self._pids[id(conn)] = conn.get_backend_pid()
+        self._en_uso += 1
+        return conn
+
+    def devolver(self, conn) -> None:
+        try:
+            if self._pool.closed or conn.closed:
+                with self._pids_lock:
+                    self._pids.pop(id(conn), None)
+            if self._pool.closed:
+                # El pool se cerró (apagado) mientras la conexión estaba prestada
+                conn.close()
+            else:
+                self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._en_uso -= 1
+            self._disponibles.release()
+
+    def cerrar(self) -> None:
+        self._pool.closeall()
+        with self._pids_lock:
+            self._pids.clear()
+
+    def es_propia(self, pid: int) -> bool:
+        with self._pids_lock:
+            return pid in self._pids.values()
+
+    def get_estado(self) -> Dict[str, Any]:
+        return {
+            "minimo": self.minimo,
+            "maximo": self.maximo,
+            "en_uso": self._en_uso,
+            "abiertas": self._en_uso + len(self._pool._pool),
+        }
+
+
+_pool: Optional[PoolConexiones] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PoolConexiones:
+    """Obtener el pool del proceso, creándolo (y abriendo db_pool_min conexiones) si no existe"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexiones(
+                    settings.db_pool_min, settings.db_pool_max, settings.database_url
+                )
+    return _pool
+
+
+def cerrar_pool() -> None:
+    """Cerrar todas las conexiones; el siguiente uso crea un pool nuevo"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
+
+
+def es_conexion_propia(pid: Optional[int]) -> bool:
+    """Indicar si un PID de backend pertenece al pool de este proceso.
+
+    Los servicios ya publican sus escrituras en el bus de eventos; así la
+    escucha de NOTIFY puede descartar los avisos de sus propias conexiones.
+    """
+    pool = _pool
+    return pid is not None and pool is not None and pool.es_propia(pid)
+
+
+@contextmanager
+def get_db_connection(
+    isolation_level: Optional[str] = None, readonly: Optional[bool] = None
+):
+    """Prestar una conexión del pool dentro de una transacción.
+
+    Al salir se confirma (o se revierte si hubo una excepción) y la conexión
+    vuelve al pool en lugar de cerrarse. Si la petición actual tiene plazo,
+    el tiempo restante se aplica como statement_timeout de la transacción.
+    """
+    restante = restante_ms()
+    if restante is not None and restante <= 0:
+        raise PlazoExcedido("Plazo agotado antes de consultar la base de datos")
+
+    pool = get_pool()
+    espera = None
+    if restante is not None:
+        espera = min(settings.db_pool_espera_segundos, restante / 1000)
+    try:
+        conn = pool.obtener(espera)
+    except psycopg2.OperationalError as e:
+        if restante is not None and espera < settings.db_pool_espera_segundos:
+            raise PlazoExcedido("Plazo agotado esperando una conexión") from e
+        raise
+
+    cambia_sesion = isolation_level is not None or readonly is not None
+    try:
+        if cambia_sesion:
+            conn.set_session(isolation_level=isolation_level, readonly=readonly)
+        with conn:
+            restante = restante_ms()
+            if restante is not None:
+                with conn.cursor() as cur:
+                    # set_config(..., true) equivale a SET LOCAL: termina con la transacción
+                    cur.execute(
+                        "SELECT set_config('statement_timeout', %s, true);",
+                        (str(max(restante, 1)),),
+                    )
+            yield conn
+    except errors.QueryCanceled as e:
+        raise PlazoExcedido("La consulta superó el plazo de la petición") from e
+    finally:
+        if cambia_sesion and not conn.closed:
+            conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+        pool.devolver(conn)
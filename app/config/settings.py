@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 
@@ -9,14 +10,124 @@ class Settings(BaseSettings):
     # Base de datos
     database_url: str = os.getenv("DATABASE_URL")
 
+    # Pool de conexiones por proceso
+    db_pool_min: int = 2
+    db_pool_max: int = 20
+    db_pool_espera_segundos: float = 5.0
+
+    # Control de admisión: cupos simultáneos (mantener la suma por debajo de
+    # db_pool_max), colas de espera acotadas y respuesta 503 + Retry-After
+    admision_limite_lecturas: int = 16
+    admision_cola_lecturas: int = 64
+    admision_limite_escrituras: int = 4
+    admision_cola_escrituras: int = 16
+    admision_espera_maxima_segundos: float = 2.0
+    admision_retry_after_segundos: int = 1
+    admision_cola_por_ruta: int = 32
+    admision_limites_ruta: Dict[str, int] = {
+        "GET /api/v1/puntos-reciclaje/cercanos": 8,
+        "GET /api/v1/sync": 4,
+        "GET /api/v1/export/puntos-materiales": 2,
+    }
+    admision_rutas_excluidas: List[str] = [
+        "/health",
+        "/debug",
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+    ]
+
+    # Presupuestos de latencia por ruta ("METODO /ruta", IDs como {id}) en ms;
+    # se aplican como statement_timeout y al agotarse se responde 504. 0 = sin plazo
+    plazo_por_defecto_ms: int = 10000
+    plazos_ruta: Dict[str, int] = {
+        "GET /api/v1/categorias": 2000,
+        "GET /api/v1/materiales": 3000,
+        "GET /api/v1/puntos-reciclaje": 3000,
+        "GET /api/v1/puntos-reciclaje/cercanos": 2000,
+        "GET /api/v1/sync": 15000,
+        "POST /api/v1/rutas/planificar": 3000,
+        # Las exportaciones duran lo que tarde el cliente en descargar
+        "GET /api/v1/export/puntos-materiales": 0,
+    }
+
     # Configuración de la aplicación
     app_name: str = "EcoAndino API"
     app_description: str = "API para gestión de reciclaje"
     version: str = "1.0.0"
+    # También monta /debug (protegido con perfilado_token si está definido)
     debug: bool = False
 
     # Configuración de búsqueda
     default_search_radius: float = 10.0
+    # Búsqueda de los k más cercanos: radio inicial, ampliación y máximo de k
+    knn_radio_inicial_km: float = 5.0
+    knn_factor_ampliacion: float = 4.0
+    knn_maximo: int = 100
+    # Planificador de rutas: candidatos más cercanos que se consideran por material
+    ruta_candidatos_por_material: int = 8
+    # Caché de /cercanos por celda geohash y tramo de radio: cada entrada guarda
+    # los puntos de la celda ampliada con el radio del tramo (los radios mayores
+    # que el último tramo van siempre a la base)
+    cercanos_cache_habilitada: bool = True
+    cercanos_cache_precision: int = 5  # celdas de unos 5 x 5 km en el ecuador
+    cercanos_cache_radios_km: List[float] = [1.0, 2.0, 5.0, 10.0, 25.0]
+    cercanos_cache_maximo: int = 5000
+    cercanos_cache_ttl_segundos: float = 300.0
+    # Autocompletado de /materiales/sugerencias: sugerencias por defecto y máximo
+    sugerencias_limite: int = 10
+    sugerencias_maximo: int = 50
+
+    # Agrupar lecturas idénticas concurrentes en una sola consulta
+    coalescencia_habilitada: bool = True
+
+    # Sincronización incremental: margen de solapamiento del token (segundos)
+    # para no perder cambios de transacciones que confirmaron tarde
+    sync_margen_segundos: float = 5.0
+
+    # Filas por lote al exportar con cursor de servidor
+    export_tamano_lote: int = 2000
+
+    # Escuchar los NOTIFY de base.sql para invalidar cachés ante escrituras
+    # de otros procesos, cargas masivas o SQL manual
+    escucha_cambios_habilitada: bool = True
+    escucha_reconexion_segundos: float = 2.0
+    # Ventana para agrupar avisos y máximo de ids por tabla que se publican
+    # uno a uno; por encima se publica un solo evento de reconstrucción
+    escucha_lote_ms: int = 50
+    escucha_max_ids: int = 50
+
+    # Servidor de producción (gunicorn.conf.py)
+    bind: str = "0.0.0.0:8000"
+    workers: int = 0  # 0 = un worker por CPU
+    worker_timeout: int = 30
+    graceful_timeout: int = 30
+
+    # Directorio en memoria (p. ej. /dev/shm/ecoandino) donde se publican los
+    # modelos de lectura compartidos entre workers; vacío = copia por proceso
+    memoria_compartida_dir: Optional[str] = None
+    # Cada cuánto comprueba el publicador que su archivo sigue existiendo y
+    # cuánto espera un worker sin archivo a que el publicador lo escriba
+    snapshot_vigilancia_segundos: float = 1.0
+    snapshot_espera_segundos: float = 10.0
+
+    # Perfilado por petición (X-Profile: 1); si hay token, se exige en X-Profile-Token
+    perfilado_habilitado: bool = False
+    perfilado_token: Optional[str] = None
+    perfilado_maximo: int = 20
+
+    # Trazas por capas; exportador "archivo" (JSONL) u "otlp" (OTLP/HTTP JSON)
+    trazas_habilitadas: bool = False
+    trazas_muestreo: float = 1.0
+    trazas_exportador: str = "archivo"
+    trazas_archivo: str = "trazas.jsonl"
+    trazas_endpoint: str = "http://localhost:4318/v1/traces"
+
+    # Diagnóstico de memoria con tracemalloc (/debug/memory)
+    memoria_diagnostico_habilitado: bool = False
+    memoria_muestreo: float = 0.1  # fracción de peticiones a las que se mide el pico
+    memoria_frames: int = 10
+    memoria_instantaneas: int = 10
 
     class Config:
         env_file = ".env"
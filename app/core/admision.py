@@ -0,0 +1,166 @@
+"""Control de admisión: limita cuántas peticiones llegan a la vez a la base.
+
+Cada petición necesita un cupo de su ruta (si la ruta tiene límite propio)
+y un cupo del presupuesto de lecturas o de escrituras. Si no hay cupo,
+espera en una cola acotada; si la cola está llena o se agota la espera,
+responde 503 con Retry-After en lugar de acumular hilos y conexiones.
+"""
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.config.settings import settings
+from app.core.rutas import clave_ruta
+
+METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+
+class Presupuesto:
+    """Semáforo asíncrono con cola FIFO de tamaño máximo"""
+
+    def __init__(self, nombre: str, limite: int, cola_maxima: int):
+        self.nombre = nombre
+        self.limite = limite
+        self.cola_maxima = cola_maxima
+        self.activos = 0
+        self._cola: Deque[asyncio.Future] = deque()
+        self.admitidas = 0
+        self.rechazadas_cola_llena = 0
+        self.rechazadas_espera = 0
+
+    async def entrar(self, espera_maxima: float) -> bool:
+        if self.activos < self.limite and not self._cola:
+            self.activos += 1
+            self.admitidas += 1
+            return True
+        if len(self._cola) >= self.cola_maxima or espera_maxima <= 0:
+            self.rechazadas_cola_llena += 1
+            return False
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.append(futuro)
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), espera_maxima)
+        except asyncio.TimeoutError:
+            if not futuro.done():
+                futuro.cancel()
+                self.rechazadas_espera += 1
+                return False
+        except asyncio.CancelledError:
+            # El cliente se desconectó mientras esperaba
+            if futuro.done() and not futuro.cancelled():
+                self.salir()
+            else:
+                futuro.cancel()
+            raise
+        # salir() nos traspasó su cupo
+        self.admitidas += 1
+        return True
+
+    def salir(self) -> None:
+        while self._cola:
+            futuro = self._cola.popleft()
+            if not futuro.done():
+                futuro.set_result(None)
+                return
+        self.activos -= 1
+
+    def get_estado(self) -> Dict[str, Any]:
+        return {
+            "limite": self.limite,
+            "activos": self.activos,
+            "en_cola": sum(1 for f in self._cola if not f.done()),
+            "cola_maxima": self.cola_maxima,
+            "admitidas": self.admitidas,
+            "rechazadas_cola_llena": self.rechazadas_cola_llena,
+            "rechazadas_espera": self.rechazadas_espera,
+        }
+
+
+class ControlAdmision:
+    def __init__(self):
+        self.lecturas = Presupuesto(
+            "lecturas",
+            settings.admision_limite_lecturas,
+            settings.admision_cola_lecturas,
+        )
+        self.escrituras = Presupuesto(
+            "escrituras",
+            settings.admision_limite_escrituras,
+            settings.admision_cola_escrituras,
+        )
+        self._rutas: Dict[str, Presupuesto] = {
+            ruta: Presupuesto(ruta, limite, settings.admision_cola_por_ruta)
+            for ruta, limite in settings.admision_limites_ruta.items()
+        }
+
+    def excluida(self, path: str) -> bool:
+        return any(path.startswith(p) for p in settings.admision_rutas_excluidas)
+
+    async def admitir(self, metodo: str, path: str) -> Optional[List[Presupuesto]]:
+        """Obtener los cupos necesarios o None si hay que rechazar la petición"""
+        loop = asyncio.get_running_loop()
+        limite_espera = loop.time() + settings.admision_espera_maxima_segundos
+        necesarios = [
+            self._rutas.get(clave_ruta(metodo, path)),
+            self.lecturas if metodo in METODOS_LECTURA else self.escrituras,
+        ]
+
+        obtenidos: List[Presupuesto] = []
+        for presupuesto in necesarios:
+            if presupuesto is None:
+                continue
+            try:
+                admitida = await presupuesto.entrar(limite_espera - loop.time())
+            except asyncio.CancelledError:
+                self.liberar(obtenidos)
+                raise
+            if not admitida:
+                self.liberar(obtenidos)
+                return None
+            obtenidos.append(presupuesto)
+        return obtenidos
+
+    def liberar(self, presupuestos: List[Presupuesto]) -> None:
+        for presupuesto in reversed(presupuestos):
+            presupuesto.salir()
+
+    def get_estado(self) -> Dict[str, Any]:
+        return {
+            "lecturas": self.lecturas.get_estado(),
+            "escrituras": self.escrituras.get_estado(),
+            "rutas": {r: p.get_estado() for r, p in self._rutas.items()},
+        }
+
+
+control_admision = ControlAdmision()
+
+
+class AdmisionMiddleware:
+    """Middleware ASGI: el cupo se mantiene hasta enviar la respuesta completa"""
+
+    def __init__(self, app):
+        self.app = app
+        self.control = control_admision
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.control.excluida(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        presupuestos = await self.control.admitir(scope["method"], scope["path"])
+        if presupuestos is None:
+            respuesta = JSONResponse(
+                status_code=503,
+                content={"detail": "Servicio saturado, intente de nuevo en unos segundos"},
+                headers={"Retry-After": str(settings.admision_retry_after_segundos)},
+            )
+            await respuesta(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.liberar(presupuestos)
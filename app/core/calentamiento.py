@@ -0,0 +1,77 @@
+"""Registro de tareas de precalentamiento y de su estado.
+
+Cada caché o índice en memoria registra aquí cómo construirse; el lifespan
+de la aplicación las ejecuta al arrancar y /health/ready informa de si ya
+terminaron.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+ERROR = "error"
+
+_tareas: List[Tuple[int, str, Callable[[], Any]]] = []
+_estado: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+_en_curso = threading.Lock()
+
+
+def registrar(nombre: str, tarea: Callable[[], Any], orden: int = 100) -> None:
+    """Añadir una tarea; se ejecutan por orden ascendente y luego por registro"""
+    with _lock:
+        _tareas.append((orden, nombre, tarea))
+        _tareas.sort(key=lambda t: t[0])
+        _estado[nombre] = {"estado": PENDIENTE}
+
+
+def calentar() -> bool:
+    """Ejecutar todas las tareas pendientes o fallidas; devuelve True si todas terminaron"""
+    with _lock:
+        tareas = [t for t in _tareas if _estado[t[1]]["estado"] != LISTO]
+
+    for _, nombre, tarea in tareas:
+        inicio = time.perf_counter()
+        try:
+            tarea()
+            resultado = {"estado": LISTO}
+        except Exception as e:
+            logger.exception("Error en el precalentamiento de %s", nombre)
+            resultado = {"estado": ERROR, "detalle": str(e)}
+        resultado["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        with _lock:
+            _estado[nombre] = resultado
+    return listo()
+
+
+def calentar_en_segundo_plano() -> None:
+    """Lanzar calentar() en un hilo si no hay otro en curso"""
+    if not _en_curso.acquire(blocking=False):
+        return
+
+    def ejecutar():
+        try:
+            calentar()
+        finally:
+            _en_curso.release()
+
+    threading.Thread(target=ejecutar, name="calentamiento", daemon=True).start()
+
+
+def hay_errores() -> bool:
+    with _lock:
+        return any(e["estado"] == ERROR for e in _estado.values())
+
+
+def listo() -> bool:
+    with _lock:
+        return all(e["estado"] == LISTO for e in _estado.values())
+
+
+def get_estado() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {nombre: dict(estado) for nombre, estado in _estado.items()}
@@ -0,0 +1,143 @@
+"""Agrupación de lecturas idénticas concurrentes (single-flight).
+
+Si varias peticiones piden lo mismo a la vez, solo la primera consulta la
+base de datos; las demás esperan y reciben el mismo resultado. No es una
+caché: en cuanto la consulta termina, la siguiente llamada vuelve a ejecutarse.
+
+Cada seguidor espera como mucho lo que le queda a su propia petición; si
+vence antes que la del líder, recibe PlazoExcedido (504) sin esperarle.
+"""
+import copy
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.config.settings import settings
+from app.core import eventos
+from app.core.plazos import PlazoExcedido, restante_ms
+
+
+class _Llamada:
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _copia(error: BaseException) -> BaseException:
+    """Excepción nueva del mismo tipo para cada seguidor: relanzar la misma
+    instancia desde varios hilos modificaría su __traceback__ a la vez"""
+    try:
+        return copy.copy(error)
+    except Exception:
+        return Exception(str(error))
+
+
+class Coalescedor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[Tuple[str, Hashable], _Llamada] = {}
+        self._metricas: Dict[str, Dict[str, int]] = {}
+
+    def ejecutar(self, nombre: str, clave: Hashable, funcion: Callable[[], Any]) -> Any:
+        """Ejecutar funcion() o unirse a una ejecución en curso con la misma clave"""
+        k = (nombre, clave)
+        with self._lock:
+            metricas = self._metricas.setdefault(
+                nombre, {"llamadas": 0, "ejecuciones": 0, "coalescidas": 0}
+            )
+            metricas["llamadas"] += 1
+            llamada = self._en_vuelo.get(k)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_vuelo[k] = _Llamada()
+                metricas["ejecuciones"] += 1
+            else:
+                metricas["coalescidas"] += 1
+
+        if not lider:
+            restante = restante_ms()
+            if not llamada.evento.wait(
+                None if restante is None else max(restante, 0) / 1000
+            ):
+                raise PlazoExcedido("Plazo agotado esperando una lectura en curso")
+            if llamada.error is not None:
+                raise _copia(llamada.error) from llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion()
+            return llamada.resultado
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._en_vuelo.get(k) is llamada:
+                    del self._en_vuelo[k]
+            llamada.evento.set()
+
+    def desacoplar(self, *_evento) -> None:
+        """Tras una escritura, las nuevas llamadas no se unen a lecturas ya empezadas"""
+        with self._lock:
+            self._en_vuelo.clear()
+
+    def get_metricas(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                nombre: {
+                    **m,
+                    "ratio_coalescencia": round(m["coalescidas"] / m["llamadas"], 4)
+                    if m["llamadas"]
+                    else 0.0,
+                }
+                for nombre, m in self._metricas.items()
+            }
+
+
+coalescedor = Coalescedor()
+eventos.suscribir(eventos.TODAS, coalescedor.desacoplar)
+
+
+def _normalizar(valor: Any) -> Hashable:
+    # Coordenadas que solo difieren más allá de ~10 cm se consideran iguales
+    if isinstance(valor, float):
+        return round(valor, 6)
+    if isinstance(valor, (list, set, tuple)):
+        return tuple(_normalizar(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _normalizar(v)) for k, v in valor.items()))
+    return valor
+
+
+def coalescer(nombre: str):
+    """Decorador para métodos de servicio de solo lectura.
+
+    La clave son los argumentos normalizados (con sus valores por defecto),
+    sin incluir self, así que sirve aunque cada petición cree su servicio.
+    """
+
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not settings.coalescencia_habilitada:
+                return funcion(*args, **kwargs)
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            clave = tuple(
+                (k, _normalizar(v))
+                for k, v in argumentos.arguments.items()
+                if k != "self"
+            )
+            return coalescedor.ejecutar(
+                nombre, clave, lambda: funcion(*args, **kwargs)
+            )
+
+        return envoltura
+
+    return decorador
@@ -0,0 +1,35 @@
+"""Bus de eventos en proceso para avisar de escrituras.
+
+Los servicios publican aquí cada alta, modificación o baja, y las
+estructuras en memoria (snapshot, índices, cachés) se suscriben para
+invalidarse o actualizarse.
+"""
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TODAS = "*"
+
+Suscriptor = Callable[[str, str, Optional[int]], None]
+
+_suscriptores: Dict[str, List[Suscriptor]] = {}
+_lock = threading.Lock()
+
+
+def suscribir(tabla: str, callback: Suscriptor) -> None:
+    """Registrar un callback para los cambios de una tabla (o TODAS)"""
+    with _lock:
+        _suscriptores.setdefault(tabla, []).append(callback)
+
+
+def publicar(tabla: str, operacion: str, registro_id: Optional[int] = None) -> None:
+    """Notificar un cambio; los errores de un suscriptor no afectan a los demás"""
+    with _lock:
+        callbacks = _suscriptores.get(tabla, []) + _suscriptores.get(TODAS, [])
+    for callback in callbacks:
+        try:
+            callback(tabla, operacion, registro_id)
+        except Exception:
+            logger.exception("Error en suscriptor de eventos para %s", tabla)
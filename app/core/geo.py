@@ -0,0 +1,128 @@
+"""Cálculos de distancia sobre la esfera terrestre, vectorizados con numpy,
+y regiones geográficas (celdas de 1° x 1°) usadas como clave de partición"""
+import math
+from typing import List, Optional
+
+import numpy as np
+
+RADIO_TIERRA_KM = 6371.0
+# Km por grado de latitud sobre la misma esfera que haversine, para que una
+# caja de radio r contenga todos los puntos a r km o menos
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+_BASE32_GEOHASH = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Más celdas que esto no descartan particiones que compense enumerar
+MAXIMO_CELDAS_REGION = 1024
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia en km entre dos coordenadas"""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distancias_desde_km(lat: float, lng: float, latitudes, longitudes) -> np.ndarray:
+    """Distancias haversine en km desde una coordenada a cada una de las dadas"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(longitudes, dtype=float)) - math.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def matriz_distancias_km(latitudes, longitudes) -> np.ndarray:
+    """Matriz n×n de distancias haversine entre todas las coordenadas"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lng = np.radians(np.asarray(longitudes, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def region_de(lat: float, lng: float) -> int:
+    """Celda de 1° x 1° que contiene la coordenada; igual que region_de() en base.sql"""
+    fila = min(math.floor(lat), 89) + 90
+    columna = min(math.floor(lng), 179) + 180
+    return fila * 360 + columna
+
+
+def regiones_en_caja(
+    lat_min: float, lat_max: float, lng_min: float, lng_max: float
+) -> Optional[List[int]]:
+    """Celdas que tocan la caja, o None si son más de MAXIMO_CELDAS_REGION"""
+    filas = range(region_de(lat_min, 0) // 360, region_de(lat_max, 0) // 360 + 1)
+    columnas = range(region_de(0, lng_min) % 360, region_de(0, lng_max) % 360 + 1)
+    if len(filas) * len(columnas) > MAXIMO_CELDAS_REGION:
+        return None
+    return [fila * 360 + columna for fila in filas for columna in columnas]
+
+
+def ampliar_caja(caja: tuple, margen_km: float) -> Optional[tuple]:
+    """Caja (lat_min, lat_max, lng_min, lng_max) ampliada para contener todo
+    punto a margen_km o menos de ella, o None si cruza un polo o el antimeridiano"""
+    lat_min, lat_max, lng_min, lng_max = caja
+    dlat = margen_km / KM_POR_GRADO
+    if lat_min - dlat < -90 or lat_max + dlat > 90:
+        return None
+    # El ancho en longitud se calcula en el borde más cercano al polo
+    cos_lat = math.cos(math.radians(max(abs(lat_min - dlat), abs(lat_max + dlat))))
+    if cos_lat < 0.01:
+        return None
+    dlng = margen_km / (KM_POR_GRADO * cos_lat)
+    if lng_min - dlng < -180 or lng_max + dlng > 180:
+        return None
+    return (lat_min - dlat, lat_max + dlat, lng_min - dlng, lng_max + dlng)
+
+
+def caja_alrededor(lat: float, lng: float, radio_km: float) -> Optional[tuple]:
+    """Caja que contiene el círculo de radio_km alrededor de la coordenada"""
+    return ampliar_caja((lat, lat, lng, lng), radio_km)
+
+
+def geohash(lat: float, lng: float, precision: int) -> str:
+    """Código geohash de la celda que contiene la coordenada"""
+    lat_rango, lng_rango = [-90.0, 90.0], [-180.0, 180.0]
+    codigo, bits, valor, es_lng = [], 0, 0, True
+    while len(codigo) < precision:
+        rango, coordenada = (lng_rango, lng) if es_lng else (lat_rango, lat)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        es_lng = not es_lng
+        bits += 1
+        if bits == 5:
+            codigo.append(_BASE32_GEOHASH[valor])
+            bits, valor = 0, 0
+    return "".join(codigo)
+
+
+def caja_geohash(codigo: str) -> tuple:
+    """Límites (lat_min, lat_max, lng_min, lng_max) de una celda geohash"""
+    lat_rango, lng_rango = [-90.0, 90.0], [-180.0, 180.0]
+    es_lng = True
+    for caracter in codigo:
+        valor = _BASE32_GEOHASH.index(caracter)
+        for desplazamiento in range(4, -1, -1):
+            rango = lng_rango if es_lng else lat_rango
+            medio = (rango[0] + rango[1]) / 2
+            if valor >> desplazamiento & 1:
+                rango[0] = medio
+            else:
+                rango[1] = medio
+            es_lng = not es_lng
+    return (lat_rango[0], lat_rango[1], lng_rango[0], lng_rango[1])
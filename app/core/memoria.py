@@ -0,0 +1,162 @@
+"""Diagnóstico de memoria con tracemalloc.
+
+Con settings.memoria_diagnostico_habilitado se activa tracemalloc y:
+
+- el middleware mide, en una fracción settings.memoria_muestreo de las
+  peticiones, el pico de memoria asignada por encima de la que había al
+  empezar, y lo acumula por ruta;
+- /debug/memory permite tomar instantáneas y comparar dos de ellas (o una
+  con el estado actual) agrupando por línea o archivo, para buscar fugas.
+
+tracemalloc es global al proceso: el pico de una petición muestreada
+incluye lo que asignen a la vez otras peticiones o hilos. Solo se muestrea
+una petición a la vez para no reiniciar el pico de otra en curso.
+"""
+import itertools
+import random
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.config.settings import settings
+from app.core.rutas import clave_ruta
+
+
+class EstadisticasRuta:
+    __slots__ = ("muestras", "pico_maximo", "pico_total", "ultimo")
+
+    def __init__(self):
+        self.muestras = 0
+        self.pico_maximo = 0
+        self.pico_total = 0
+        self.ultimo = 0
+
+    def registrar(self, pico: int) -> None:
+        self.muestras += 1
+        self.pico_total += pico
+        self.ultimo = pico
+        self.pico_maximo = max(self.pico_maximo, pico)
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "muestras": self.muestras,
+            "pico_maximo_kb": round(self.pico_maximo / 1024, 1),
+            "pico_medio_kb": round(self.pico_total / self.muestras / 1024, 1),
+            "ultimo_kb": round(self.ultimo / 1024, 1),
+        }
+
+
+_rutas: Dict[str, EstadisticasRuta] = {}
+_instantaneas: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+_ids = itertools.count(1)
+_muestreando = threading.Lock()
+_lock = threading.Lock()
+
+
+def iniciar() -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.memoria_frames)
+
+
+def activo() -> bool:
+    return tracemalloc.is_tracing()
+
+
+def get_estado() -> Dict[str, Any]:
+    actual, pico = tracemalloc.get_traced_memory() if activo() else (0, 0)
+    with _lock:
+        rutas = {r: e.a_dict() for r, e in sorted(_rutas.items())}
+        instantaneas = [
+            {"id": i, "etiqueta": s["etiqueta"], "tomada": s["tomada"]}
+            for i, s in _instantaneas.items()
+        ]
+    return {
+        "activo": activo(),
+        "actual_kb": round(actual / 1024, 1),
+        "pico_kb": round(pico / 1024, 1),
+        "rutas": rutas,
+        "instantaneas": instantaneas,
+    }
+
+
+def tomar_instantanea(etiqueta: Optional[str] = None) -> Dict[str, Any]:
+    """Guardar una instantánea; se conservan las últimas settings.memoria_instantaneas"""
+    instantanea = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    actual, _ = tracemalloc.get_traced_memory()
+    with _lock:
+        instantanea_id = next(_ids)
+        _instantaneas[instantanea_id] = {
+            "etiqueta": etiqueta,
+            "tomada": time.time(),
+            "actual": actual,
+            "instantanea": instantanea,
+        }
+        while len(_instantaneas) > settings.memoria_instantaneas:
+            _instantaneas.popitem(last=False)
+    return {"id": instantanea_id, "etiqueta": etiqueta, "actual_kb": round(actual / 1024, 1)}
+
+
+def comparar(
+    desde: int, hasta: Optional[int] = None, agrupar: str = "lineno", limite: int = 25
+) -> Optional[Dict[str, Any]]:
+    """Diferencia entre dos instantáneas (o entre una y el estado actual)"""
+    with _lock:
+        anterior = _instantaneas.get(desde)
+        posterior = _instantaneas.get(hasta) if hasta is not None else None
+    if anterior is None or (hasta is not None and posterior is None):
+        return None
+    if posterior is None:
+        posterior = {
+            "instantanea": tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            ),
+            "actual": tracemalloc.get_traced_memory()[0],
+        }
+
+    diferencias = posterior["instantanea"].compare_to(anterior["instantanea"], agrupar)
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "variacion_kb": round((posterior["actual"] - anterior["actual"]) / 1024, 1),
+        "diferencias": [
+            {
+                "ubicacion": str(d.traceback[0]),
+                "variacion_kb": round(d.size_diff / 1024, 1),
+                "total_kb": round(d.size / 1024, 1),
+                "variacion_bloques": d.count_diff,
+            }
+            for d in diferencias[:limite]
+        ],
+    }
+
+
+class MemoriaMiddleware:
+    """Middleware ASGI que muestrea el pico de memoria por ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not activo()
+            or random.random() >= settings.memoria_muestreo
+            or not _muestreando.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await self.app(scope, receive, send)
+        finally:
+            _, pico = tracemalloc.get_traced_memory()
+            _muestreando.release()
+            ruta = clave_ruta(scope["method"], scope["path"])
+            with _lock:
+                _rutas.setdefault(ruta, EstadisticasRuta()).registrar(max(pico - base, 0))
@@ -0,0 +1,89 @@
+"""Publicación de datos de solo lectura compartidos entre workers.
+
+Un proceso escribe el contenido en un archivo de un directorio en memoria
+(por ejemplo /dev/shm) y lo sustituye de forma atómica; los demás lo mapean
+con mmap, así las páginas existen una sola vez en RAM aunque haya N workers.
+
+Qué proceso escribe se decide con un flock sobre "<nombre>.lock": quien lo
+consigue lo conserva hasta que termina o cede, y si muere el sistema lo
+libera para que otro tome el relevo.
+"""
+import fcntl
+import mmap
+import os
+import threading
+from typing import Optional, Tuple
+
+TAMANO_VERSION = 32
+
+
+class SegmentoCompartido:
+    """Archivo mapeado en memoria con formato: versión (32 bytes) + contenido"""
+
+    def __init__(self, directorio: str, nombre: str):
+        self.ruta = os.path.join(directorio, nombre)
+        self._lock = threading.Lock()
+        self._mapa: Optional[mmap.mmap] = None
+        self._inodo: Optional[Tuple[int, int]] = None
+        self._cerrojo: Optional[int] = None
+        os.makedirs(directorio, exist_ok=True)
+
+    def tomar_publicador(self) -> bool:
+        """Intentar ser el único proceso que publica; True si ya lo era o lo consigue"""
+        with self._lock:
+            if self._cerrojo is not None:
+                return True
+            fd = os.open(f"{self.ruta}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._cerrojo = fd
+            return True
+
+    def es_publicador(self) -> bool:
+        return self._cerrojo is not None
+
+    def ceder(self) -> None:
+        """Soltar el papel de publicador (p. ej. el maestro antes del fork:
+        si no, los workers heredarían el flock y ninguno podría tomarlo)"""
+        with self._lock:
+            if self._cerrojo is not None:
+                fcntl.flock(self._cerrojo, fcntl.LOCK_UN)
+                os.close(self._cerrojo)
+                self._cerrojo = None
+
+    def publicar(self, version: str, datos: bytes) -> None:
+        """Escribir una nueva versión; los lectores ven la antigua o la nueva, nunca una mezcla"""
+        cabecera = version.encode().ljust(TAMANO_VERSION, b" ")[:TAMANO_VERSION]
+        temporal = f"{self.ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(cabecera)
+            archivo.write(datos)
+        os.replace(temporal, self.ruta)
+
+    def leer(self) -> Optional[Tuple[str, memoryview]]:
+        """Devolver (versión, contenido) de la última publicación, o None si no hay"""
+        try:
+            estado = os.stat(self.ruta)
+        except FileNotFoundError:
+            return None
+
+        inodo = (estado.st_dev, estado.st_ino)
+        with self._lock:
+            if inodo != self._inodo:
+                # El archivo se reemplazó: mapear el nuevo y soltar el anterior
+                with open(self.ruta, "rb") as archivo:
+                    mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+                if self._mapa is not None:
+                    try:
+                        self._mapa.close()
+                    except BufferError:
+                        # Aún hay respuestas usando el mapa anterior; lo libera el GC
+                        pass
+                self._mapa, self._inodo = mapa, inodo
+            # Dentro del lock: otra llamada que vea un archivo nuevo no puede
+            # cerrar este mapa antes de que la vista lo retenga
+            version = bytes(self._mapa[:TAMANO_VERSION]).decode().strip()
+            return version, memoryview(self._mapa)[TAMANO_VERSION:]
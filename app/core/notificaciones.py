@@ -0,0 +1,152 @@
+"""Escucha de cambios de la base de datos con LISTEN/NOTIFY.
+
+Los triggers notificar_cambio() de base.sql envían un aviso por sentencia
+con los ids que tocó en categorias, materiales, puntos_reciclaje y
+punto_materiales. Cada proceso mantiene una conexión dedicada escuchando el
+canal y publica los avisos en el bus de eventos, así las cachés e índices en
+memoria se enteran en milisegundos de escrituras de otros workers, otras
+instancias, cargas masivas o SQL manual.
+
+Los avisos que llegan juntos se agrupan durante escucha_lote_ms y se publica
+cada (tabla, operación, id) una sola vez; si un lote toca más de
+escucha_max_ids ids de una tabla se publica un único evento sin id para que
+los índices se reconstruyan con una consulta en lugar de una por id.
+"""
+import json
+import logging
+import select
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from app.config.settings import settings
+from app.config.database import es_conexion_propia
+from app.core import eventos
+
+logger = logging.getLogger(__name__)
+
+CANAL = "ecoandino_cambios"
+TABLAS = ("categorias", "materiales", "puntos_reciclaje", "punto_materiales")
+
+
+class EscuchaCambios:
+    def __init__(self, dsn: str, canal: str = CANAL):
+        self.dsn = dsn
+        self.canal = canal
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._conn = None
+        self.conectado = False
+        self.recibidas = 0
+        self.propias = 0
+        self.reconexiones = 0
+        self.ultima: Optional[float] = None
+
+    def iniciar(self) -> None:
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(
+            target=self._bucle, name="escucha-cambios", daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=2)
+            self._hilo = None
+
+    def _bucle(self) -> None:
+        primera = True
+        while not self._detener.is_set():
+            try:
+                self._conn = psycopg2.connect(self.dsn)
+                self._conn.set_isolation_level(
+                    psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+                )
+                with self._conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.canal};")
+                self.conectado = True
+                if not primera:
+                    # Mientras no había escucha pudieron perderse avisos
+                    self.reconexiones += 1
+                    self._invalidar_todo()
+                primera = False
+                self._escuchar()
+            except Exception:
+                if not self._detener.is_set():
+                    logger.exception("Error en la escucha de cambios; reconectando")
+                    primera = False
+            finally:
+                self.conectado = False
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+            self._detener.wait(settings.escucha_reconexion_segundos)
+
+    def _escuchar(self) -> None:
+        conn = self._conn
+        while not self._detener.is_set():
+            # Despertar cada segundo para poder detener el hilo
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            # Esperar un poco a que lleguen los avisos del resto de la ráfaga
+            limite = time.monotonic() + settings.escucha_lote_ms / 1000
+            while (restante := limite - time.monotonic()) > 0:
+                if select.select([conn], [], [], restante) == ([], [], []):
+                    break
+                conn.poll()
+            payloads = [n.payload for n in conn.notifies]
+            conn.notifies.clear()
+            self._despachar(payloads)
+
+    def _despachar(self, payloads: List[str]) -> None:
+        cambios: Dict[Tuple[str, str], Optional[Set[int]]] = {}
+        for payload in payloads:
+            try:
+                aviso = json.loads(payload)
+            except ValueError:
+                logger.warning("Aviso de cambio ilegible: %s", payload)
+                continue
+            self.recibidas += 1
+            self.ultima = time.time()
+            if es_conexion_propia(aviso.get("pid")):
+                # El servicio que hizo la escritura ya la publicó en este proceso
+                self.propias += 1
+                continue
+            clave = (aviso["tabla"], aviso["operacion"])
+            # Los triggers por fila anteriores enviaban un solo "id"
+            ids = aviso["ids"] if "ids" in aviso else [aviso.get("id")]
+            if ids is None or None in ids:
+                cambios[clave] = None
+            elif clave not in cambios or cambios[clave] is not None:
+                cambios[clave] = cambios.get(clave, set()) | set(ids)
+
+        for (tabla, operacion), ids in cambios.items():
+            if ids is None or len(ids) > settings.escucha_max_ids:
+                eventos.publicar(tabla, operacion, None)
+                continue
+            for registro_id in sorted(ids):
+                eventos.publicar(tabla, operacion, registro_id)
+
+    def _invalidar_todo(self) -> None:
+        for tabla in TABLAS:
+            eventos.publicar(tabla, "RESYNC", None)
+
+    def get_estado(self) -> Dict[str, Any]:
+        return {
+            "canal": self.canal,
+            "conectado": self.conectado,
+            "recibidas": self.recibidas,
+            "propias": self.propias,
+            "reconexiones": self.reconexiones,
+            "ultima": self.ultima,
+        }
+
+
+escucha_cambios = EscuchaCambios(settings.database_url)
@@ -0,0 +1,58 @@
+"""Interpretación de parámetros de consulta compartidos por varios endpoints."""
+from typing import Iterable, List
+
+from fastapi import HTTPException
+
+MAX_IDS_POR_PETICION = 500
+
+
+def parse_ids(valor: str, nombre: str = "ids") -> List[int]:
+    """Convertir "1,2,3" en [1, 2, 3] conservando el orden y sin repetidos"""
+    ids: List[int] = []
+    vistos = set()
+    for parte in valor.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            registro_id = int(parte)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El parámetro '{nombre}' solo admite enteros separados por comas",
+            )
+        if registro_id not in vistos:
+            vistos.add(registro_id)
+            ids.append(registro_id)
+
+    if not ids:
+        raise HTTPException(status_code=400, detail=f"El parámetro '{nombre}' está vacío")
+    if len(ids) > MAX_IDS_POR_PETICION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Como máximo {MAX_IDS_POR_PETICION} valores en '{nombre}'",
+        )
+    return ids
+
+
+def parse_campos(
+    valor: str, permitidos: Iterable[str], nombre: str = "fields"
+) -> List[str]:
+    """Convertir "id,nombre" en la lista de campos pedidos, validada contra la lista blanca.
+
+    El "id" se incluye siempre para que el cliente pueda identificar cada registro.
+    """
+    permitidos = list(permitidos)
+    campos = ["id"]
+    for parte in valor.split(","):
+        campo = parte.strip()
+        if not campo or campo in campos:
+            continue
+        if campo not in permitidos:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Campo no permitido en '{nombre}': {campo}. "
+                f"Permitidos: {', '.join(permitidos)}",
+            )
+        campos.append(campo)
+    return campos
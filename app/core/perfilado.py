@@ -0,0 +1,188 @@
+"""Perfilado opcional de peticiones individuales con cProfile.
+
+Con settings.perfilado_habilitado, una petición con la cabecera
+``X-Profile: 1`` (o ``?profile=1``) se ejecuta bajo cProfile y su perfil se
+guarda entre los últimos settings.perfilado_maximo, consultables en
+/debug/profiles (montado solo con settings.debug). La respuesta indica el
+identificador en ``X-Profile-Id``. Si hay settings.perfilado_token, tanto el
+perfilado como todas las rutas de /debug lo exigen en ``X-Profile-Token``.
+
+Los endpoints síncronos corren en hilos del threadpool, así que se perfila
+por separado el hilo del bucle de eventos (middlewares, serialización) y el
+hilo del endpoint (servicio, repositorio, espera a la base), y luego se
+combinan. El perfil del bucle puede incluir trabajo de otras peticiones
+concurrentes. Solo se perfila una petición a la vez.
+
+Sin el flag, el coste es comprobar una cabecera; con el perfilado
+deshabilitado no se instala nada.
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+from app.config.settings import settings
+
+
+class Perfil:
+    def __init__(self, perfil_id: int, metodo: str, ruta: str):
+        self.id = perfil_id
+        self.metodo = metodo
+        self.ruta = ruta
+        self.inicio = time.time()
+        self.duracion_ms: Optional[float] = None
+        self.estado: Optional[int] = None
+        self.bucle = cProfile.Profile()
+        self.hilos: List[cProfile.Profile] = []
+
+    def get_stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.bucle)
+        for perfil_hilo in self.hilos:
+            stats.add(perfil_hilo)
+        return stats
+
+    def get_texto(self, orden: str = "cumulative", limite: int = 60) -> str:
+        salida = io.StringIO()
+        stats = self.get_stats()
+        stats.stream = salida
+        stats.sort_stats(orden).print_stats(limite)
+        return salida.getvalue()
+
+    def get_pstats(self) -> bytes:
+        """Volcado en el formato de pstats (snakeviz, flameprof, gprof2dot...)"""
+        return marshal.dumps(self.get_stats().stats)
+
+    def get_resumen(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "metodo": self.metodo,
+            "ruta": self.ruta,
+            "inicio": self.inicio,
+            "duracion_ms": self.duracion_ms,
+            "estado": self.estado,
+        }
+
+
+_perfil_actual: contextvars.ContextVar[Optional[Perfil]] = contextvars.ContextVar(
+    "perfil_actual", default=None
+)
+_perfiles: Deque[Perfil] = deque(maxlen=settings.perfilado_maximo)
+_ids = itertools.count(1)
+_en_curso = threading.Lock()
+
+
+def get_perfiles() -> List[Dict[str, Any]]:
+    """Resumen de los perfiles guardados, del más reciente al más antiguo"""
+    return [p.get_resumen() for p in reversed(_perfiles)]
+
+
+def get_perfil(perfil_id: int) -> Optional[Perfil]:
+    return next((p for p in _perfiles if p.id == perfil_id), None)
+
+
+def _envolver_endpoint(funcion):
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        perfil = _perfil_actual.get()
+        if perfil is None:
+            return funcion(*args, **kwargs)
+        perfil_hilo = cProfile.Profile()
+        perfil_hilo.enable()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            perfil_hilo.disable()
+            perfil.hilos.append(perfil_hilo)
+
+    return envoltura
+
+
+def instrumentar(app) -> None:
+    """Envolver los endpoints síncronos para perfilar también su hilo"""
+    for ruta in app.routes:
+        if isinstance(ruta, APIRoute) and not asyncio.iscoroutinefunction(
+            ruta.dependant.call
+        ):
+            ruta.dependant.call = _envolver_endpoint(ruta.dependant.call)
+
+
+def token_valido(token: Optional[bytes]) -> bool:
+    """Comparar en tiempo constante con settings.perfilado_token; sin token
+    configurado no se exige nada"""
+    if not settings.perfilado_token:
+        return True
+    return hmac.compare_digest(token or b"", settings.perfilado_token.encode())
+
+
+def _solicitado(scope) -> bool:
+    cabeceras = dict(scope["headers"])
+    pedido = cabeceras.get(b"x-profile") == b"1" or parse_qs(
+        scope["query_string"].decode("latin-1")
+    ).get("profile") == ["1"]
+    if not pedido:
+        return False
+    return token_valido(cabeceras.get(b"x-profile-token"))
+
+
+class PerfiladoMiddleware:
+    """Middleware ASGI; va por dentro de la admisión y los plazos para
+    perfilar solo el trabajo de la petición"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _solicitado(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _en_curso.acquire(blocking=False):
+            # Ya hay una petición perfilándose: atender esta sin perfil
+            await self.app(
+                scope, receive, self._con_cabecera(send, b"x-profile", b"ocupado")
+            )
+            return
+
+        perfil = Perfil(next(_ids), scope["method"], scope["path"])
+        token = _perfil_actual.set(perfil)
+        inicio = time.perf_counter()
+        perfil.bucle.enable()
+        try:
+            await self.app(
+                scope,
+                receive,
+                self._con_cabecera(send, b"x-profile-id", str(perfil.id).encode(), perfil),
+            )
+        finally:
+            perfil.bucle.disable()
+            perfil.duracion_ms = round((time.perf_counter() - inicio) * 1000, 2)
+            _perfil_actual.reset(token)
+            _en_curso.release()
+            _perfiles.append(perfil)
+
+    def _con_cabecera(
+        self, send, nombre: bytes, valor: bytes, perfil: Optional[Perfil] = None
+    ):
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                if perfil is not None:
+                    perfil.estado = mensaje["status"]
+                mensaje = {
+                    **mensaje,
+                    "headers": list(mensaje.get("headers", [])) + [(nombre, valor)],
+                }
+            await send(mensaje)
+
+        return enviar
@@ -0,0 +1,106 @@
+"""Plazos (deadlines) por petición propagados hasta la base de datos.
+
+El middleware fija cuándo vence la petición según su ruta; cada conexión
+prestada por get_db_connection aplica el tiempo restante como
+statement_timeout, y una consulta cancelada se traduce en un 504. El propio
+middleware responde ese 504 cuando la excepción llega sin capturar: va por
+dentro de CORS, así la respuesta lleva sus cabeceras (el manejador de
+Exception de Starlette corre por fuera de todos los middlewares).
+"""
+import contextvars
+import time
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from fastapi.exception_handlers import http_exception_handler
+
+from app.config.settings import settings
+from app.core.rutas import clave_ruta
+
+_vencimiento: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "vencimiento_peticion", default=None
+)
+
+
+class PlazoExcedido(Exception):
+    """La petición agotó su presupuesto de latencia"""
+
+
+def restante_ms() -> Optional[int]:
+    """Milisegundos que le quedan a la petición actual (None si no tiene plazo)"""
+    vencimiento = _vencimiento.get()
+    if vencimiento is None:
+        return None
+    return int((vencimiento - time.monotonic()) * 1000)
+
+
+def plazo_para(metodo: str, path: str) -> int:
+    return settings.plazos_ruta.get(clave_ruta(metodo, path), settings.plazo_por_defecto_ms)
+
+
+def causa_plazo(exc: BaseException) -> Optional[PlazoExcedido]:
+    """Buscar un PlazoExcedido en la cadena de excepciones.
+
+    Los repositorios y servicios envuelven los errores en Exception o
+    HTTPException(500); la excepción original queda en __cause__/__context__.
+    """
+    vistas = set()
+    while exc is not None and id(exc) not in vistas:
+        if isinstance(exc, PlazoExcedido):
+            return exc
+        vistas.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _respuesta_504() -> JSONResponse:
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "La petición superó su tiempo máximo de respuesta"},
+    )
+
+
+async def manejar_excepcion(request, exc: Exception):
+    # Los plazos agotados ya los responde PlazosMiddleware con 504
+    return JSONResponse(status_code=500, content={"detail": "Error interno del servidor"})
+
+
+async def manejar_http_exception(request, exc: StarletteHTTPException):
+    if exc.status_code >= 500 and causa_plazo(exc) is not None:
+        return _respuesta_504()
+    return await http_exception_handler(request, exc)
+
+
+class PlazosMiddleware:
+    """Middleware ASGI que fija el vencimiento; debe ir por fuera de la admisión
+    para que la espera en cola también consuma el presupuesto"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        plazo_ms = plazo_para(scope["method"], scope["path"])
+        token = _vencimiento.set(
+            time.monotonic() + plazo_ms / 1000 if plazo_ms > 0 else None
+        )
+        iniciada = False
+
+        async def enviar(mensaje):
+            nonlocal iniciada
+            if mensaje["type"] == "http.response.start":
+                iniciada = True
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception as e:
+            if iniciada or causa_plazo(e) is None:
+                raise
+            await _respuesta_504()(scope, receive, send)
+        finally:
+            _vencimiento.reset(token)
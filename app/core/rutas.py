@@ -0,0 +1,16 @@
+"""Utilidades para identificar la ruta de una petición antes del enrutado."""
+import re
+
+_SEGMENTO_ID = re.compile(r"/\d+(?=/|$)")
+
+
+def normalizar_ruta(path: str) -> str:
+    """Agrupar rutas con IDs: /api/v1/materiales/12/ -> /api/v1/materiales/{id}"""
+    ruta = _SEGMENTO_ID.sub("/{id}", path)
+    if len(ruta) > 1:
+        ruta = ruta.rstrip("/")
+    return ruta
+
+
+def clave_ruta(metodo: str, path: str) -> str:
+    return f"{metodo} {normalizar_ruta(path)}"
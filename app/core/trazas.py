@@ -0,0 +1,400 @@
+"""Trazas ligeras por capas (endpoint → servicio → repositorio → SQL).
+
+Con settings.trazas_habilitadas, el middleware abre un span raíz por
+petición (continuando el ``traceparent`` entrante si lo hay), los
+servicios y repositorios decorados con @trazar abren un span hijo por
+método y cada ejecución de SQL abre otro con la huella de la consulta y
+las filas afectadas. Al cerrar el span raíz la traza completa se encola y
+un hilo la exporta a un archivo JSONL o a un colector OTLP/HTTP (JSON).
+
+Fuera de una petición trazada (o con las trazas deshabilitadas) los
+métodos decorados solo comprueban una variable de contexto.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import psycopg2.extensions
+from fastapi.routing import APIRoute
+
+from app.config.settings import settings
+from app.core.rutas import clave_ruta
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "padre_id", "nombre", "capa",
+        "inicio_ns", "fin_ns", "atributos", "error", "_traza",
+    )
+
+    def __init__(
+        self,
+        nombre: str,
+        capa: str,
+        trace_id: str,
+        padre_id: Optional[str],
+        traza: List["Span"],
+    ):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.padre_id = padre_id
+        self.nombre = nombre
+        self.capa = capa
+        self.inicio_ns = time.time_ns()
+        self.fin_ns: Optional[int] = None
+        self.atributos: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self._traza = traza
+
+    def terminar(self) -> None:
+        self.fin_ns = time.time_ns()
+        self._traza.append(self)
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "padre_id": self.padre_id,
+            "nombre": self.nombre,
+            "capa": self.capa,
+            "inicio_ns": self.inicio_ns,
+            "duracion_ms": round((self.fin_ns - self.inicio_ns) / 1e6, 3),
+            "atributos": self.atributos,
+            "error": self.error,
+        }
+
+
+_span_actual: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "span_actual", default=None
+)
+
+
+@contextmanager
+def span(nombre: str, capa: str, **atributos):
+    """Abrir un span hijo del actual; no hace nada si la petición no se traza"""
+    padre = _span_actual.get()
+    if padre is None:
+        yield None
+        return
+    hijo = Span(nombre, capa, padre.trace_id, padre.span_id, padre._traza)
+    hijo.atributos.update(atributos)
+    token = _span_actual.set(hijo)
+    try:
+        yield hijo
+    except BaseException as e:
+        hijo.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span_actual.reset(token)
+        hijo.terminar()
+
+
+def trazar(capa: str):
+    """Decorador de clase: un span por cada método público (servicios, repositorios)"""
+
+    def envolver(nombre: str, funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _span_actual.get() is None:
+                return funcion(*args, **kwargs)
+            with span(nombre, capa):
+                return funcion(*args, **kwargs)
+
+        return envoltura
+
+    def decorador(clase):
+        for nombre, funcion in list(vars(clase).items()):
+            if (
+                nombre.startswith("_")
+                or not inspect.isfunction(funcion)
+                # Un generador terminaría su span antes de producir nada
+                or inspect.isgeneratorfunction(funcion)
+            ):
+                continue
+            setattr(clase, nombre, envolver(f"{clase.__name__}.{nombre}", funcion))
+        return clase
+
+    return decorador
+
+
+def instrumentar(app) -> None:
+    """Envolver cada endpoint en un span de la capa "endpoint" """
+
+    def envolver(nombre: str, funcion):
+        if inspect.iscoroutinefunction(funcion):
+
+            @functools.wraps(funcion)
+            async def envoltura_asincrona(*args, **kwargs):
+                with span(nombre, "endpoint"):
+                    return await funcion(*args, **kwargs)
+
+            return envoltura_asincrona
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with span(nombre, "endpoint"):
+                return funcion(*args, **kwargs)
+
+        return envoltura
+
+    for ruta in app.routes:
+        if isinstance(ruta, APIRoute):
+            ruta.dependant.call = envolver(ruta.name, ruta.dependant.call)
+
+
+# --- SQL ---------------------------------------------------------------------
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def huella_sql(consulta: Any) -> str:
+    """Consulta normalizada (sin literales ni espacios repetidos) para agrupar"""
+    if isinstance(consulta, bytes):
+        consulta = consulta.decode("utf-8", "replace")
+    elif not isinstance(consulta, str):
+        consulta = str(consulta)
+    consulta = _LITERALES.sub("?", consulta)
+    return _ESPACIOS.sub(" ", consulta).strip()[:300]
+
+
+class _CursorTrazado:
+    def execute(self, consulta, parametros=None):
+        if _span_actual.get() is None:
+            return super().execute(consulta, parametros)
+        with span("db.execute", "db", **{"db.huella": huella_sql(consulta)}) as s:
+            resultado = super().execute(consulta, parametros)
+            s.atributos["db.filas"] = self.rowcount
+            return resultado
+
+    def executemany(self, consulta, parametros):
+        if _span_actual.get() is None:
+            return super().executemany(consulta, parametros)
+        with span("db.executemany", "db", **{"db.huella": huella_sql(consulta)}) as s:
+            resultado = super().executemany(consulta, parametros)
+            s.atributos["db.filas"] = self.rowcount
+            return resultado
+
+
+_cursores_trazados: Dict[type, type] = {}
+
+
+def _cursor_trazado(fabrica: type) -> type:
+    clase = _cursores_trazados.get(fabrica)
+    if clase is None:
+        clase = _cursores_trazados[fabrica] = type(
+            f"{fabrica.__name__}Trazado", (_CursorTrazado, fabrica), {}
+        )
+    return clase
+
+
+class ConexionTrazada(psycopg2.extensions.connection):
+    """connection_factory del pool: cada cursor registra sus consultas como spans"""
+
+    def cursor(self, *args, **kwargs):
+        fabrica = (
+            kwargs.get("cursor_factory")
+            or self.cursor_factory
+            or psycopg2.extensions.cursor
+        )
+        kwargs["cursor_factory"] = _cursor_trazado(fabrica)
+        return super().cursor(*args, **kwargs)
+
+
+# --- Exportación -------------------------------------------------------------
+
+
+class Exportador:
+    """Hilo que vacía la cola de trazas terminadas hacia archivo u OTLP"""
+
+    def __init__(self):
+        self._cola: "queue.Queue[List[Span]]" = queue.Queue(maxsize=1000)
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exportadas = 0
+        self.descartadas = 0
+
+    def encolar(self, traza: List[Span]) -> None:
+        self._iniciar()
+        try:
+            self._cola.put_nowait(traza)
+        except queue.Full:
+            self.descartadas += 1
+
+    def _iniciar(self) -> None:
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="exportador-trazas", daemon=True
+                )
+                self._hilo.start()
+
+    def _bucle(self) -> None:
+        while True:
+            lote = [self._cola.get()]
+            while len(lote) < 100:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [s for traza in lote for s in traza]
+            try:
+                if settings.trazas_exportador == "otlp":
+                    self._enviar_otlp(spans)
+                else:
+                    self._escribir_archivo(spans)
+                self.exportadas += len(lote)
+            except Exception:
+                self.descartadas += len(lote)
+                logger.exception("Error exportando trazas")
+
+    def _escribir_archivo(self, spans: List[Span]) -> None:
+        with open(settings.trazas_archivo, "a", encoding="utf-8") as archivo:
+            for s in spans:
+                archivo.write(json.dumps(s.a_dict(), default=str) + "\n")
+
+    def _enviar_otlp(self, spans: List[Span]) -> None:
+        cuerpo = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [_atributo_otlp("service.name", settings.app_name)]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "ecoandino"},
+                            "spans": [_span_otlp(s) for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        peticion = urllib.request.Request(
+            settings.trazas_endpoint,
+            data=json.dumps(cuerpo, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(peticion, timeout=5):
+            pass
+
+    def get_estado(self) -> Dict[str, Any]:
+        return {
+            "exportador": settings.trazas_exportador,
+            "en_cola": self._cola.qsize(),
+            "exportadas": self.exportadas,
+            "descartadas": self.descartadas,
+        }
+
+
+def _atributo_otlp(clave: str, valor: Any) -> Dict[str, Any]:
+    if isinstance(valor, bool):
+        return {"key": clave, "value": {"boolValue": valor}}
+    if isinstance(valor, int):
+        return {"key": clave, "value": {"intValue": str(valor)}}
+    if isinstance(valor, float):
+        return {"key": clave, "value": {"doubleValue": valor}}
+    return {"key": clave, "value": {"stringValue": str(valor)}}
+
+
+def _span_otlp(s: Span) -> Dict[str, Any]:
+    return {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "parentSpanId": s.padre_id or "",
+        "name": s.nombre,
+        "kind": 2 if s.capa == "servidor" else 3 if s.capa == "db" else 1,
+        "startTimeUnixNano": str(s.inicio_ns),
+        "endTimeUnixNano": str(s.fin_ns),
+        "attributes": [_atributo_otlp("capa", s.capa)]
+        + [_atributo_otlp(k, v) for k, v in s.atributos.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+
+
+exportador = Exportador()
+
+
+# --- Middleware --------------------------------------------------------------
+
+
+def _leer_traceparent(scope):
+    for nombre, valor in scope["headers"]:
+        if nombre == b"traceparent":
+            coincidencia = _TRACEPARENT.match(valor.decode("latin-1").strip().lower())
+            if coincidencia and coincidencia.group(1) != "0" * 32:
+                trace_id, padre_id, banderas = coincidencia.groups()
+                return trace_id, padre_id, int(banderas, 16) & 1 == 1
+    return None
+
+
+class TrazasMiddleware:
+    """Middleware ASGI que abre el span raíz de cada petición muestreada"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        entrante = _leer_traceparent(scope)
+        if entrante is not None:
+            trace_id, padre_id, muestreada = entrante
+        else:
+            trace_id, padre_id = os.urandom(16).hex(), None
+            muestreada = random.random() < settings.trazas_muestreo
+        if not muestreada:
+            await self.app(scope, receive, send)
+            return
+
+        traza: List[Span] = []
+        raiz = Span(
+            f"{scope['method']} {scope['path']}", "servidor", trace_id, padre_id, traza
+        )
+        raiz.atributos.update(
+            {
+                "http.metodo": scope["method"],
+                "http.ruta": clave_ruta(scope["method"], scope["path"]),
+            }
+        )
+        traceparent = f"00-{trace_id}-{raiz.span_id}-01".encode()
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                raiz.atributos["http.estado"] = mensaje["status"]
+                mensaje = {
+                    **mensaje,
+                    "headers": list(mensaje.get("headers", []))
+                    + [(b"traceparent", traceparent)],
+                }
+            await send(mensaje)
+
+        token = _span_actual.set(raiz)
+        try:
+            await self.app(scope, receive, enviar)
+        except BaseException as e:
+            raiz.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _span_actual.reset(token)
+            raiz.terminar()
+            exportador.encolar(traza)
@@ -0,0 +1,191 @@
+"""Caché de búsquedas cercanas cuantizada por ubicación.
+
+Las peticiones a /puntos-reciclaje/cercanos desde un mismo barrio solo
+difieren en los últimos decimales de lat/lng, así que una clave exacta no
+acierta nunca. Aquí la clave es (celda geohash, tramo de radio) y cada
+entrada guarda los puntos activos de la celda ampliada con el radio del
+tramo. Cada petición se resuelve en memoria con sus coordenadas exactas
+(distancia, filtro por radio, orden y k): todo punto a menos del radio de
+cualquier coordenada de la celda está en la entrada, así que el resultado
+es el mismo que el de la consulta SQL.
+
+Un cambio en un punto invalida las entradas que lo contienen y las que
+cubren su ubicación actual; los borrados de materiales o categorías (que
+quitan relaciones en cascada) y los RESYNC vacían la caché.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+from app.core import eventos
+from app.core.geo import ampliar_caja, caja_geohash, distancias_desde_km, geohash
+from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
+
+Clave = Tuple[str, float]
+
+
+class _Entrada:
+    __slots__ = ("caja", "puntos", "latitudes", "longitudes", "creada")
+
+    def __init__(self, caja: tuple, puntos: List[Dict[str, Any]]):
+        self.caja = caja
+        self.puntos = puntos
+        self.latitudes = np.array([float(p["latitud"]) for p in puntos])
+        self.longitudes = np.array([float(p["longitud"]) for p in puntos])
+        self.creada = time.monotonic()
+
+    def contiene(self, lat: float, lng: float) -> bool:
+        lat_min, lat_max, lng_min, lng_max = self.caja
+        return lat_min <= lat <= lat_max and lng_min <= lng <= lng_max
+
+
+class CacheCercanos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[Clave, _Entrada]" = OrderedDict()
+        self._por_punto: Dict[int, Set[Clave]] = {}
+        # Cambia con cada invalidación: una entrada leída de la base antes de
+        # un cambio no se guarda después de él
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def buscar(
+        self, lat: float, lng: float, radio: Optional[float], k: Optional[int] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Puntos activos a radio km o menos (y/o los k más cercanos) ordenados
+        por distancia, o None si la petición debe resolverse con SQL"""
+        if not settings.cercanos_cache_habilitada:
+            return None
+        margen = self._get_tramo(
+            radio if radio is not None else settings.knn_radio_inicial_km
+        )
+        if margen is None:
+            return None
+        entrada = self._get_entrada(lat, lng, margen)
+        if entrada is None:
+            return None
+
+        distancias = distancias_desde_km(lat, lng, entrada.latitudes, entrada.longitudes)
+        orden = np.argsort(distancias, kind="stable")
+        if radio is not None:
+            orden = orden[distancias[orden] <= radio]
+        if k is not None:
+            # Sin radio, los k más cercanos solo son seguros si están dentro
+            # del margen: más allá puede haber puntos fuera de la entrada
+            if radio is None and (len(orden) < k or distancias[orden[k - 1]] > margen):
+                return None
+            orden = orden[:k]
+
+        resultado = []
+        for i in orden:
+            punto = dict(entrada.puntos[i])
+            total_materiales = punto.pop("total_materiales")
+            punto["distancia_km"] = round(float(distancias[i]), 2)
+            punto["total_materiales"] = total_materiales
+            resultado.append(punto)
+        return resultado
+
+    def _get_tramo(self, radio: float) -> Optional[float]:
+        return next(
+            (r for r in sorted(settings.cercanos_cache_radios_km) if r >= radio), None
+        )
+
+    def _get_entrada(self, lat: float, lng: float, margen: float) -> Optional[_Entrada]:
+        celda = geohash(lat, lng, settings.cercanos_cache_precision)
+        clave = (celda, margen)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if (
+                entrada is not None
+                and time.monotonic() - entrada.creada < settings.cercanos_cache_ttl_segundos
+            ):
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada
+            self.fallos += 1
+            generacion = self._generacion
+
+        caja = ampliar_caja(caja_geohash(celda), margen)
+        if caja is None:
+            return None
+        entrada = _Entrada(caja, PuntoReciclajeRepository().get_puntos_en_caja(caja))
+
+        with self._lock:
+            if self._generacion == generacion:
+                self._quitar(clave)
+                self._entradas[clave] = entrada
+                for punto in entrada.puntos:
+                    self._por_punto.setdefault(punto["id"], set()).add(clave)
+                while len(self._entradas) > settings.cercanos_cache_maximo:
+                    self._quitar(next(iter(self._entradas)))
+        return entrada
+
+    def _quitar(self, clave: Clave) -> None:
+        entrada = self._entradas.pop(clave, None)
+        if entrada is None:
+            return
+        for punto in entrada.puntos:
+            claves = self._por_punto.get(punto["id"])
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_punto[punto["id"]]
+
+    def invalidar_punto(
+        self, punto_id: int, coordenadas: Optional[Tuple[float, float]] = None
+    ) -> None:
+        """Quitar las entradas que contienen el punto y las que cubren sus coordenadas"""
+        with self._lock:
+            self._generacion += 1
+            claves = set(self._por_punto.get(punto_id, ()))
+            if coordenadas is not None:
+                claves.update(
+                    c for c, e in self._entradas.items() if e.contiene(*coordenadas)
+                )
+            for clave in claves:
+                self._quitar(clave)
+            self.invalidaciones += len(claves)
+
+    def vaciar(self) -> None:
+        with self._lock:
+            self._generacion += 1
+            self.invalidaciones += len(self._entradas)
+            self._entradas.clear()
+            self._por_punto.clear()
+
+    def al_cambiar(self, tabla: str, operacion: str, registro_id: Optional[int]) -> None:
+        """Suscriptor de eventos: invalidar solo las celdas afectadas"""
+        if tabla == "punto_materiales" and registro_id is not None:
+            # Cambia el total de materiales del punto, no su posición
+            self.invalidar_punto(registro_id)
+        elif tabla == "puntos_reciclaje" and registro_id is not None:
+            coordenadas = None
+            if self._entradas:
+                fila = PuntoReciclajeRepository().get_coordenadas_punto(registro_id)
+                if fila is not None:
+                    coordenadas = (float(fila["latitud"]), float(fila["longitud"]))
+            self.invalidar_punto(registro_id, coordenadas)
+        elif operacion in ("DELETE", "RESYNC") or registro_id is None:
+            self.vaciar()
+
+    def get_estado(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "habilitada": settings.cercanos_cache_habilitada,
+                "entradas": len(self._entradas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "ratio_aciertos": round(self.aciertos / consultas, 3) if consultas else None,
+                "invalidaciones": self.invalidaciones,
+            }
+
+
+cache_cercanos = CacheCercanos()
+eventos.suscribir(eventos.TODAS, cache_cercanos.al_cambiar)
@@ -0,0 +1,162 @@
+"""Contadores de facetas de puntos de reciclaje mantenidos en memoria.
+
+En lugar de contar punto por punto en cada petición se guarda cuántos
+puntos hay por combinación (ciudad, tipo_instalacion, estado) y, aparte,
+por combinación más categoría aceptada. Las combinaciones distintas son
+pocas, así que contar con filtros no depende del número de puntos, y
+una escritura solo mueve los contadores del punto afectado.
+"""
+import threading
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from app.core import calentamiento, eventos
+from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
+from app.repositories.categoria_repository import CategoriaRepository
+
+FACETAS = ("ciudad", "tipo_instalacion", "estado")
+
+Combinacion = Tuple[str, str, str]
+
+
+class IndiceFacetas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # punto_id -> (combinación, categorías aceptadas)
+        self._puntos: Dict[int, Tuple[Combinacion, FrozenSet[int]]] = {}
+        self._por_combinacion: Counter = Counter()
+        self._por_categoria: Counter = Counter()  # (combinación, categoria_id)
+        self._categorias: Dict[int, Dict[str, Any]] = {}
+        self._construido = False
+        self._reconstruir = False
+
+    def construir(self) -> None:
+        """Cargar todos los contadores desde la base"""
+        filas = PuntoReciclajeRepository().get_facetas_por_punto()
+        # Filas sin validar: orden_display admite NULL
+        categorias = {
+            c["id"]: {"nombre": c["nombre"], "orden": c["orden_display"]}
+            for c in CategoriaRepository().get_categorias_campos(
+                ["id", "nombre", "orden_display", "activo"]
+            )
+            if c["activo"]
+        }
+        with self._lock:
+            self._puntos = {}
+            self._por_combinacion = Counter()
+            self._por_categoria = Counter()
+            self._categorias = categorias
+            for fila in filas:
+                self._sumar(fila["punto_id"], self._entrada(fila))
+            self._construido = True
+            self._reconstruir = False
+
+    def _entrada(self, fila: Dict[str, Any]) -> Tuple[Combinacion, FrozenSet[int]]:
+        combinacion = (fila["ciudad"], fila["tipo_instalacion"], fila["estado"])
+        return combinacion, frozenset(fila["categorias"])
+
+    def _sumar(self, punto_id: int, entrada, signo: int = 1) -> None:
+        combinacion, categorias = entrada
+        self._mover(self._por_combinacion, combinacion, signo)
+        for categoria_id in categorias:
+            self._mover(self._por_categoria, (combinacion, categoria_id), signo)
+        if signo > 0:
+            self._puntos[punto_id] = entrada
+
+    @staticmethod
+    def _mover(contador: Counter, clave, signo: int) -> None:
+        contador[clave] += signo
+        if contador[clave] <= 0:
+            # Los contadores a cero no deben aparecer como valores de faceta
+            del contador[clave]
+
+    def actualizar_punto(self, punto_id: int) -> None:
+        """Mover los contadores de un punto tras crearlo, modificarlo o eliminarlo"""
+        filas = PuntoReciclajeRepository().get_facetas_por_punto([punto_id])
+        with self._lock:
+            anterior = self._puntos.pop(punto_id, None)
+            if anterior is not None:
+                self._sumar(punto_id, anterior, -1)
+            if filas:
+                self._sumar(punto_id, self._entrada(filas[0]))
+
+    def al_cambiar(self, tabla: str, operacion: str, registro_id: Optional[int]) -> None:
+        """Suscriptor de eventos: un punto se recalcula solo; los cambios de
+        materiales o categorías alteran muchos puntos y reconstruyen"""
+        if not self._construido:
+            return
+        if tabla in ("puntos_reciclaje", "punto_materiales") and registro_id is not None:
+            self.actualizar_punto(registro_id)
+        else:
+            self._reconstruir = True
+
+    def contar(
+        self,
+        ciudad: Optional[str] = None,
+        tipo_instalacion: Optional[str] = None,
+        estado: Optional[str] = None,
+        categoria_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Contar puntos por valor de cada faceta.
+
+        Cada faceta se cuenta aplicando los filtros de las demás pero no el
+        suyo (facetado disyuntivo), para que la interfaz pueda mostrar
+        cuántos puntos habría al cambiar de valor.
+        """
+        if not self._construido or self._reconstruir:
+            self.construir()
+        filtros = dict(zip(FACETAS, (ciudad, tipo_instalacion, estado)))
+
+        def coincide(combinacion: Combinacion, excepto: Optional[str] = None) -> bool:
+            return all(
+                valor is None or nombre == excepto or combinacion[i] == valor
+                for i, (nombre, valor) in enumerate(filtros.items())
+            )
+
+        with self._lock:
+            if categoria_id is None:
+                base = Counter(self._por_combinacion)
+            else:
+                base = Counter(
+                    {c: n for (c, cat), n in self._por_categoria.items() if cat == categoria_id}
+                )
+            por_categoria = list(self._por_categoria.items())
+            categorias = dict(self._categorias)
+
+        facetas: Dict[str, List[Dict[str, Any]]] = {}
+        for i, nombre in enumerate(FACETAS):
+            conteo: Counter = Counter()
+            for combinacion, n in base.items():
+                if coincide(combinacion, excepto=nombre):
+                    conteo[combinacion[i]] += n
+            facetas[nombre] = [
+                {"valor": valor, "total": n}
+                # tipo_instalacion y estado admiten NULL: los None van al final del empate
+                for valor, n in sorted(
+                    conteo.items(), key=lambda x: (-x[1], x[0] is None, x[0] or "")
+                )
+            ]
+
+        conteo_categorias: Counter = Counter()
+        for (combinacion, cat), n in por_categoria:
+            if coincide(combinacion):
+                conteo_categorias[cat] += n
+        facetas["categoria"] = [
+            {"id": cat, "nombre": categorias[cat]["nombre"], "total": n}
+            for cat, n in sorted(
+                conteo_categorias.items(),
+                key=lambda x: categorias.get(x[0], {}).get("orden") or 0,
+            )
+            if cat in categorias
+        ]
+
+        return {
+            "total": sum(n for c, n in base.items() if coincide(c)),
+            "filtros": {**filtros, "categoria_id": categoria_id},
+            "facetas": facetas,
+        }
+
+
+indice_facetas = IndiceFacetas()
+eventos.suscribir(eventos.TODAS, indice_facetas.al_cambiar)
+calentamiento.registrar("indice_facetas", indice_facetas.construir)
@@ -0,0 +1,141 @@
+"""Índice en memoria punto × material basado en bitsets.
+
+Por cada material se guarda un entero de Python cuyo bit N está encendido
+si el punto con ID N acepta ese material. "Puntos que aceptan TODOS los
+materiales" es un AND de enteros y "ALGUNO" un OR, sin tocar la base.
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core import calentamiento, eventos
+from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
+
+logger = logging.getLogger(__name__)
+
+MODO_TODOS = "all"
+MODO_ALGUNO = "any"
+
+# Posiciones de los bits encendidos de cada byte posible
+_BITS_DE_BYTE = [[b for b in range(8) if byte >> b & 1] for byte in range(256)]
+
+
+def bits_a_ids(bits: int) -> List[int]:
+    """Convertir un bitset en la lista ordenada de IDs encendidos"""
+    if bits <= 0:
+        return []
+    datos = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    ids: List[int] = []
+    for indice, byte in enumerate(datos):
+        if byte:
+            base = indice * 8
+            ids.extend(base + b for b in _BITS_DE_BYTE[byte])
+    return ids
+
+
+class IndicePuntoMaterial:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_material: Dict[int, int] = {}
+        self._materiales_de_punto: Dict[int, Set[int]] = {}
+        self._activos = 0
+        self._construido = False
+        self._reconstruir = False
+
+    def construir(self) -> None:
+        """Cargar el índice completo desde punto_materiales"""
+        filas = PuntoReciclajeRepository().get_materiales_aceptados_por_punto()
+        por_material: Dict[int, int] = {}
+        materiales_de_punto: Dict[int, Set[int]] = {}
+        activos = 0
+        for fila in filas:
+            punto_id = fila["punto_id"]
+            bit = 1 << punto_id
+            if fila["activo"]:
+                activos |= bit
+            materiales_de_punto[punto_id] = set(fila["materiales"])
+            for material_id in fila["materiales"]:
+                por_material[material_id] = por_material.get(material_id, 0) | bit
+
+        with self._lock:
+            self._por_material = por_material
+            self._materiales_de_punto = materiales_de_punto
+            self._activos = activos
+            self._construido = True
+            self._reconstruir = False
+
+    def actualizar_puntos(self, punto_ids: Iterable[int]) -> None:
+        """Volver a leer solo los puntos indicados y ajustar sus bits"""
+        punto_ids = list(punto_ids)
+        filas = {
+            f["punto_id"]: f
+            for f in PuntoReciclajeRepository().get_materiales_aceptados_por_punto(
+                punto_ids
+            )
+        }
+        with self._lock:
+            for punto_id in punto_ids:
+                bit = 1 << punto_id
+                fila = filas.get(punto_id)
+                nuevos = set(fila["materiales"]) if fila else set()
+                anteriores = self._materiales_de_punto.pop(punto_id, set())
+
+                for material_id in anteriores - nuevos:
+                    self._por_material[material_id] &= ~bit
+                for material_id in nuevos - anteriores:
+                    self._por_material[material_id] = (
+                        self._por_material.get(material_id, 0) | bit
+                    )
+
+                if fila is None:
+                    # El punto se eliminó
+                    self._activos &= ~bit
+                    continue
+                self._materiales_de_punto[punto_id] = nuevos
+                if fila["activo"]:
+                    self._activos |= bit
+                else:
+                    self._activos &= ~bit
+
+    def al_cambiar(self, tabla: str, operacion: str, registro_id: Optional[int]) -> None:
+        """Suscriptor de eventos: los cambios de un punto se aplican al momento;
+        los de materiales o categorías (activo, borrados en cascada) reconstruyen"""
+        if not self._construido:
+            return
+        if tabla in ("puntos_reciclaje", "punto_materiales") and registro_id is not None:
+            self.actualizar_puntos([registro_id])
+        else:
+            self._reconstruir = True
+
+    def _asegurar(self) -> None:
+        if not self._construido or self._reconstruir:
+            self.construir()
+
+    def buscar(self, materiales: List[int], modo: str = MODO_TODOS) -> List[int]:
+        """IDs de los puntos activos que aceptan todos (o alguno de) los materiales"""
+        self._asegurar()
+        bitsets = [self._por_material.get(m, 0) for m in materiales]
+        if not bitsets:
+            return []
+
+        resultado = bitsets[0]
+        for bits in bitsets[1:]:
+            if modo == MODO_TODOS:
+                resultado &= bits
+            else:
+                resultado |= bits
+        return bits_a_ids(resultado & self._activos)
+
+    def contar(self, material_id: int) -> int:
+        """Número de puntos activos que aceptan el material"""
+        self._asegurar()
+        return bin(self._por_material.get(material_id, 0) & self._activos).count("1")
+
+    def get_materiales_de_punto(self, punto_id: int) -> Set[int]:
+        self._asegurar()
+        return self._materiales_de_punto.get(punto_id, set())
+
+
+indice_punto_material = IndicePuntoMaterial()
+eventos.suscribir(eventos.TODAS, indice_punto_material.al_cambiar)
+calentamiento.registrar("indice_punto_material", indice_punto_material.construir)
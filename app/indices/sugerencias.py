@@ -0,0 +1,173 @@
+"""Índice en memoria para autocompletar nombres de materiales y categorías.
+
+Cada texto (nombre de material o de categoría, cada ejemplo de un material
+y cada palabra de todos ellos) se pliega a minúsculas sin tildes y se
+guarda como clave en un array ordenado. Buscar un prefijo es un bisect
+hasta la primera clave >= prefijo y recorrer mientras la clave empiece por
+él, sin tocar la base.
+
+Las claves se reparten en niveles que fijan el orden de las sugerencias:
+primero los nombres que empiezan por el prefijo, luego los que tienen una
+palabra que empieza por él y por último las coincidencias en los ejemplos.
+"""
+import logging
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import calentamiento, eventos
+from app.repositories.categoria_repository import CategoriaRepository
+from app.repositories.material_repository import MaterialRepository
+
+logger = logging.getLogger(__name__)
+
+# Niveles de coincidencia, de más a menos relevante
+NIVEL_NOMBRE = 0
+NIVEL_PALABRA = 1
+NIVEL_EJEMPLO = 2
+
+_SEPARADOR_PALABRAS = re.compile(r"[^\w]+")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas, sin tildes ni diéresis y con los espacios normalizados"""
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    sin_marcas = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", sin_marcas).strip()
+
+
+class _Nivel:
+    """Claves ordenadas y, en paralelo, la sugerencia a la que apunta cada una"""
+
+    __slots__ = ("claves", "sugerencias")
+
+    def __init__(self, pares: List[Tuple[str, int]]):
+        pares.sort()
+        self.claves = [clave for clave, _ in pares]
+        self.sugerencias = [sugerencia for _, sugerencia in pares]
+
+
+class IndiceSugerencias:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sugerencias: List[Dict[str, Any]] = []
+        self._niveles: List[_Nivel] = []
+        self._construido = False
+        self._obsoleto = False
+        self._refresco_pendiente = False
+
+    def construir(self) -> None:
+        """Cargar materiales y categorías activos y reconstruir las claves"""
+        with self._lock:
+            # Se limpia antes de consultar para no perder escrituras concurrentes
+            self._obsoleto = False
+            categorias = CategoriaRepository().get_categorias_campos(
+                ["id", "nombre", "activo"]
+            )
+            materiales = MaterialRepository().get_materiales_campos(
+                ["id", "nombre", "ejemplos", "categoria_id", "activo"]
+            )
+
+            sugerencias: List[Dict[str, Any]] = []
+            pares: List[List[Tuple[str, int]]] = [[], [], []]
+            activas = {c["id"] for c in categorias if c["activo"]}
+
+            def agregar(sugerencia: Dict[str, Any], ejemplos: Optional[str]) -> None:
+                indice = len(sugerencias)
+                sugerencias.append(sugerencia)
+                nombre = plegar(sugerencia["nombre"])
+                pares[NIVEL_NOMBRE].append((nombre, indice))
+                # La primera palabra ya la cubre el nombre completo
+                for palabra in set(_SEPARADOR_PALABRAS.split(nombre)[1:]):
+                    if palabra:
+                        pares[NIVEL_PALABRA].append((palabra, indice))
+                for ejemplo in (ejemplos or "").split(","):
+                    ejemplo = plegar(ejemplo)
+                    claves = {ejemplo, *_SEPARADOR_PALABRAS.split(ejemplo)}
+                    pares[NIVEL_EJEMPLO].extend((c, indice) for c in claves if c)
+
+            for categoria in categorias:
+                if categoria["id"] in activas:
+                    agregar(
+                        {
+                            "tipo": "categoria",
+                            "id": categoria["id"],
+                            "nombre": categoria["nombre"],
+                        },
+                        None,
+                    )
+            for material in materiales:
+                if material["activo"] and material["categoria_id"] in activas:
+                    agregar(
+                        {
+                            "tipo": "material",
+                            "id": material["id"],
+                            "nombre": material["nombre"],
+                            "categoria_id": material["categoria_id"],
+                        },
+                        material["ejemplos"],
+                    )
+
+            self._niveles = [_Nivel(p) for p in pares]
+            self._sugerencias = sugerencias
+            self._construido = True
+
+    def al_cambiar(self, tabla: str, operacion: str, registro_id: Optional[int]) -> None:
+        """Suscriptor de eventos: reconstruir en segundo plano ante cambios del
+        catálogo; mientras tanto se sigue respondiendo con el índice anterior"""
+        if tabla not in ("materiales", "categorias") or not self._construido:
+            return
+        self._obsoleto = True
+        if not self._refresco_pendiente:
+            # Una ráfaga de eventos (p. ej. un lote) comparte un solo hilo
+            self._refresco_pendiente = True
+            threading.Thread(target=self._refrescar, daemon=True).start()
+
+    def _refrescar(self) -> None:
+        self._refresco_pendiente = False
+        try:
+            if self._obsoleto:
+                self.construir()
+        except Exception:
+            logger.exception("Error reconstruyendo el índice de sugerencias")
+
+    def sugerir(self, prefijo: str, limite: int) -> List[Dict[str, Any]]:
+        """Sugerencias cuyo nombre, alguna palabra o algún ejemplo empieza por
+        el prefijo (sin distinguir mayúsculas ni tildes), por nivel y orden alfabético"""
+        if not self._construido:
+            self.construir()
+        prefijo = plegar(prefijo)
+        if not prefijo:
+            return []
+
+        # Referencias locales: una reconstrucción concurrente las sustituye enteras
+        niveles, sugerencias = self._niveles, self._sugerencias
+        vistas, resultado = set(), []
+        for nivel in niveles:
+            i = bisect_left(nivel.claves, prefijo)
+            while (
+                i < len(nivel.claves)
+                and nivel.claves[i].startswith(prefijo)
+                and len(resultado) < limite
+            ):
+                indice = nivel.sugerencias[i]
+                if indice not in vistas:
+                    vistas.add(indice)
+                    resultado.append(sugerencias[indice])
+                i += 1
+        return resultado
+
+    def get_estado(self) -> Dict[str, Any]:
+        return {
+            "construido": self._construido,
+            "sugerencias": len(self._sugerencias),
+            "claves": sum(len(n.claves) for n in self._niveles),
+        }
+
+
+indice_sugerencias = IndiceSugerencias()
+eventos.suscribir(eventos.TODAS, indice_sugerencias.al_cambiar)
+calentamiento.registrar("indice_sugerencias", indice_sugerencias.construir)
@@ -1,7 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config.settings import settings
+from app.config.database import cerrar_pool
+from app.core import calentamiento
+from app.core.notificaciones import escucha_cambios
+from app.core.admision import AdmisionMiddleware
+from app.core import memoria, perfilado, plazos, trazas
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.api.v1.api import api_router
+from app.api import debug, health
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El precalentamiento corre en segundo plano: el proceso acepta peticiones
+    # enseguida y /health/ready devuelve 503 hasta que termine
+    calentamiento.calentar_en_segundo_plano()
+    if settings.escucha_cambios_habilitada:
+        escucha_cambios.iniciar()
+    yield
+    escucha_cambios.detener()
+    cerrar_pool()
 
 
 def create_app() -> FastAPI:
@@ -10,8 +30,26 @@ def create_app() -> FastAPI:
         description=settings.app_description,
         version=settings.version,
         debug=settings.debug,
+        lifespan=lifespan,
     )
 
+    # Perfilado y pico de memoria opcionales: los más internos, para medir solo
+    # el trabajo de la petición
+    if settings.perfilado_habilitado:
+        app.add_middleware(perfilado.PerfiladoMiddleware)
+    if settings.memoria_diagnostico_habilitado:
+        memoria.iniciar()
+        app.add_middleware(memoria.MemoriaMiddleware)
+    # Control de admisión (dentro de CORS para que los 503 lleven sus cabeceras)
+    app.add_middleware(AdmisionMiddleware)
+    # Span raíz por petición: por fuera de la admisión para incluir la espera en cola
+    if settings.trazas_habilitadas:
+        app.add_middleware(trazas.TrazasMiddleware)
+    # Plazo por petición: por fuera de la admisión para contar la espera en cola
+    app.add_middleware(plazos.PlazosMiddleware)
+    app.add_exception_handler(StarletteHTTPException, plazos.manejar_http_exception)
+    app.add_exception_handler(Exception, plazos.manejar_excepcion)
+
     # Configurar CORS
     app.add_middleware(
         CORSMiddleware,
@@ -23,6 +61,14 @@ def create_app() -> FastAPI:
 
     # Incluir routers
     app.include_router(api_router, prefix="/api/v1")
+    app.include_router(health.router, prefix="/health", tags=["health"])
+    # Métricas internas, perfiles y memoria: solo en modo debug
+    if settings.debug:
+        app.include_router(debug.router, prefix="/debug", tags=["debug"])
+    if settings.perfilado_habilitado:
+        perfilado.instrumentar(app)
+    if settings.trazas_habilitadas:
+        trazas.instrumentar(app)
 
     @app.get("/")
     async def read_root():
@@ -34,6 +80,9 @@ def create_app() -> FastAPI:
                 "materiales": "/api/v1/materiales",
                 "puntos_reciclaje": "/api/v1/puntos-reciclaje",
                 "buscar_puntos_cercanos": "/api/v1/puntos-reciclaje/cercanos?lat={lat}&lng={lng}&radio={km}",
+                "sincronizar": "/api/v1/sync?since={token}",
+                "snapshot": "/api/v1/snapshot",
+                "salud": "/health/ready",
             },
         }
 
@@ -2,10 +2,27 @@ from app.config.database import get_db_connection
 from typing import List, Dict, Any, Optional
 from app.schemas.categoria import CategoriaResponse
 from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
 from fastapi import HTTPException
 from psycopg2 import IntegrityError
-
-
+from app.core.trazas import trazar
+
+# Campos que admite ?fields=
+CAMPOS_CATEGORIA = [
+    "id",
+    "nombre",
+    "descripcion",
+    "codigo",
+    "color_identificacion",
+    "icono",
+    "orden_display",
+    "activo",
+    "created_at",
+    "updated_at",
+]
+
+
+@trazar("repositorio")
 class CategoriaRepository:
     def get_all_categorias(self) -> Optional[List[CategoriaResponse]]:
         """Obtener todas las categorías activas"""
@@ -42,6 +59,24 @@ class CategoriaRepository:
         except Exception as e:
             raise Exception(f"Error al obtener categorías: {str(e)}")
 
+    def get_categorias_campos(
+        self, campos: List[str], ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Obtener solo las columnas pedidas (ya validadas contra CAMPOS_CATEGORIA)"""
+        try:
+            consulta = f"""
+                SELECT {", ".join(campos)}
+                FROM categorias
+                {"WHERE id = ANY(%s)" if ids is not None else ""}
+                ORDER BY orden_display;
+            """
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(consulta, (ids,) if ids is not None else None)
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener categorías: {str(e)}")
+
     def get_categoria_by_id(self, categoria_id: int) -> Optional[CategoriaResponse]:
         """Obtener una categoría específica por ID"""
         try:
@@ -75,6 +110,138 @@ class CategoriaRepository:
                 f"Error al obtener categoría con ID {categoria_id}: {str(e)}"
             )
 
+    def get_categorias_by_ids(self, ids: List[int]) -> List[CategoriaResponse]:
+        """Obtener varias categorías por ID en una sola consulta"""
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        """
+                        SELECT id, nombre, descripcion, codigo, color_identificacion, icono, orden_display, activo
+                        FROM categorias
+                        WHERE id = ANY(%s);
+                    """,
+                        (ids,),
+                    )
+                    return [CategoriaResponse(**row) for row in cur.fetchall()]
+
+        except Exception as e:
+            raise Exception(f"Error al obtener categorías por ID: {str(e)}")
+
+    def get_catalogo_json(self) -> str:
+        """Obtener las categorías (por orden_display) con sus materiales
+        anidados, como texto JSON ya serializado por PostgreSQL"""
+        try:
+            with get_db_connection() as conn:
+                # Cursor sin diccionarios y JSON como texto: psycopg2 no
+                # decodifica el resultado
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute("""
+                        SELECT json_build_object(
+                            'total_categorias', COUNT(*),
+                            'total_materiales', COALESCE(SUM(m.total), 0),
+                            'categorias', COALESCE(
+                                json_agg(
+                                    json_build_object(
+                                        'id', c.id,
+                                        'nombre', c.nombre,
+                                        'descripcion', c.descripcion,
+                                        'codigo', c.codigo,
+                                        'color_identificacion', c.color_identificacion,
+                                        'icono', c.icono,
+                                        'orden_display', c.orden_display,
+                                        'activo', c.activo,
+                                        'materiales', COALESCE(m.materiales, '[]'::json)
+                                    )
+                                    ORDER BY c.orden_display, c.id
+                                ),
+                                '[]'::json
+                            )
+                        )::text
+                        FROM categorias c
+                        LEFT JOIN LATERAL (
+                            SELECT
+                                COUNT(*) AS total,
+                                json_agg(
+                                    json_build_object(
+                                        'id', m.id,
+                                        'nombre', m.nombre,
+                                        'codigo', m.codigo,
+                                        'descripcion', m.descripcion,
+                                        'preparacion_requerida', m.preparacion_requerida,
+                                        'beneficio_ambiental', m.beneficio_ambiental,
+                                        'requiere_manejo_especial', m.requiere_manejo_especial,
+                                        'ejemplos', m.ejemplos,
+                                        'materiales_no_aceptados', m.materiales_no_aceptados,
+                                        'es_peligroso', m.es_peligroso,
+                                        'categoria_id', m.categoria_id,
+                                        'activo', m.activo
+                                    )
+                                    ORDER BY m.nombre
+                                ) AS materiales
+                            FROM materiales m
+                            WHERE m.categoria_id = c.id
+                        ) m ON true;
+                    """)
+                    return cur.fetchone()[0]
+        except Exception as e:
+            raise Exception(f"Error al obtener el catálogo: {str(e)}")
+
+    def get_categoria_con_materiales_json(self, categoria_id: int) -> Optional[str]:
+        """Obtener una categoría con sus materiales, como texto JSON ya
+        serializado por PostgreSQL; None si la categoría no existe"""
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute(
+                        """
+                        SELECT json_build_object(
+                            'categoria', json_build_object(
+                                'id', c.id,
+                                'nombre', c.nombre,
+                                'descripcion', c.descripcion,
+                                'codigo', c.codigo,
+                                'color_identificacion', c.color_identificacion,
+                                'icono', c.icono,
+                                'orden_display', c.orden_display,
+                                'activo', c.activo
+                            ),
+                            'total_materiales', COALESCE(m.total, 0),
+                            'materiales', COALESCE(m.materiales, '[]'::json)
+                        )::text
+                        FROM categorias c
+                        LEFT JOIN LATERAL (
+                            SELECT
+                                COUNT(*) AS total,
+                                json_agg(
+                                    json_build_object(
+                                        'id', m.id,
+                                        'nombre', m.nombre,
+                                        'codigo', m.codigo,
+                                        'descripcion', m.descripcion,
+                                        'preparacion_requerida', m.preparacion_requerida,
+                                        'beneficio_ambiental', m.beneficio_ambiental,
+                                        'requiere_manejo_especial', m.requiere_manejo_especial,
+                                        'ejemplos', m.ejemplos,
+                                        'materiales_no_aceptados', m.materiales_no_aceptados,
+                                        'es_peligroso', m.es_peligroso,
+                                        'categoria_id', m.categoria_id,
+                                        'activo', m.activo
+                                    )
+                                    ORDER BY m.nombre
+                                ) AS materiales
+                            FROM materiales m
+                            WHERE m.categoria_id = c.id
+                        ) m ON true
+                        WHERE c.id = %s;
+                    """,
+                        (categoria_id,),
+                    )
+                    fila = cur.fetchone()
+                    return fila[0] if fila else None
+        except Exception as e:
+            raise Exception(f"Error al obtener materiales de la categoría: {str(e)}")
+
     def create_categoria(
         self, categoria_data: Dict[str, Any]
     ) -> Optional[CategoriaResponse]:
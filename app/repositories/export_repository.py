@@ -0,0 +1,42 @@
+from app.config.database import get_db_connection
+from app.config.settings import settings
+from typing import Iterator, List, Tuple
+import psycopg2.extensions
+from app.core.trazas import trazar
+
+
+@trazar("repositorio")
+class ExportRepository:
+    def iter_puntos_materiales(
+        self, como_json: bool = False
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Recorrer vista_puntos_por_material por lotes con un cursor de servidor.
+
+        Produce (columnas, filas) de settings.export_tamano_lote filas cada vez,
+        así la memoria del worker no depende del tamaño de la exportación.
+        Con como_json cada fila es una sola columna con el JSON de la fila.
+        La conexión queda prestada hasta que el generador termina o se cierra.
+        """
+        consulta = (
+            "SELECT row_to_json(v)::text FROM vista_puntos_por_material v;"
+            if como_json
+            else "SELECT * FROM vista_puntos_por_material;"
+        )
+        try:
+            with get_db_connection(readonly=True) as conn:
+                with conn.cursor(
+                    name="export_puntos_materiales",
+                    cursor_factory=psycopg2.extensions.cursor,
+                ) as cur:
+                    cur.itersize = settings.export_tamano_lote
+                    cur.execute(consulta)
+                    columnas = None
+                    while True:
+                        filas = cur.fetchmany(settings.export_tamano_lote)
+                        if columnas is None:
+                            columnas = [d[0] for d in cur.description]
+                        if not filas:
+                            return
+                        yield columnas, filas
+        except Exception as e:
+            raise Exception(f"Error al exportar puntos y materiales: {str(e)}")
@@ -1,11 +1,51 @@
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+import psycopg2.extensions
 from app.config.database import get_db_connection
 from typing import List, Dict, Any, Optional
 from app.schemas.material import MaterialResponse
 from fastapi import HTTPException
-from psycopg2 import IntegrityError
+from psycopg2 import DataError, IntegrityError
+from app.core.trazas import trazar
 
+# Columnas actualizables y su tipo, para tipar los VALUES de las actualizaciones en lote
+COLUMNAS_ACTUALIZABLES = {
+    "nombre": "varchar",
+    "codigo": "varchar",
+    "descripcion": "text",
+    "preparacion_requerida": "text",
+    "beneficio_ambiental": "text",
+    "requiere_manejo_especial": "boolean",
+    "ejemplos": "text",
+    "materiales_no_aceptados": "text",
+    "es_peligroso": "boolean",
+    "categoria_id": "integer",
+    "activo": "boolean",
+}
 
+# Campos que admite ?fields= y su expresión SQL; los de la categoría
+# solo añaden el JOIN cuando se piden
+CAMPOS_MATERIAL = {
+    "id": "m.id",
+    "nombre": "m.nombre",
+    "codigo": "m.codigo",
+    "categoria_id": "m.categoria_id",
+    "descripcion": "m.descripcion",
+    "preparacion_requerida": "m.preparacion_requerida",
+    "beneficio_ambiental": "m.beneficio_ambiental",
+    "es_peligroso": "m.es_peligroso",
+    "requiere_manejo_especial": "m.requiere_manejo_especial",
+    "ejemplos": "m.ejemplos",
+    "materiales_no_aceptados": "m.materiales_no_aceptados",
+    "activo": "m.activo",
+    "created_at": "m.created_at",
+    "updated_at": "m.updated_at",
+    "categoria_nombre": "c.nombre",
+    "color_identificacion": "c.color_identificacion",
+    "icono": "c.icono",
+}
+
+
+@trazar("repositorio")
 class MaterialRepository:
     def get_materiales(
         self, categoria_id: Optional[int] = None
@@ -16,13 +56,14 @@ class MaterialRepository:
                         SELECT m.*, c.nombre as categoria_nombre, c.color_identificacion, c.icono
                         FROM materiales m
                         JOIN categorias c ON m.categoria_id = c.id
+                        WHERE %s::integer IS NULL OR m.categoria_id = %s
                         ORDER BY m.nombre;
                     """
             with get_db_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         consulta,
-                        (categoria_id,),
+                        (categoria_id, categoria_id),
                     )
                     resulado = cur.fetchall()
                     materiales = [MaterialResponse(**dict(row)) for row in resulado]
@@ -30,6 +71,43 @@ class MaterialRepository:
         except Exception as e:
             raise Exception(f"Error al obtener materiales: {str(e)}")
 
+    def get_materiales_campos(
+        self,
+        campos: List[str],
+        categoria_id: Optional[int] = None,
+        ids: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Obtener solo las columnas pedidas (ya validadas contra CAMPOS_MATERIAL)"""
+        try:
+            columnas = ", ".join(f"{CAMPOS_MATERIAL[c]} AS {c}" for c in campos)
+            join = (
+                "JOIN categorias c ON m.categoria_id = c.id"
+                if any(CAMPOS_MATERIAL[c].startswith("c.") for c in campos)
+                else ""
+            )
+            condiciones, valores = [], []
+            if categoria_id is not None:
+                condiciones.append("m.categoria_id = %s")
+                valores.append(categoria_id)
+            if ids is not None:
+                condiciones.append("m.id = ANY(%s)")
+                valores.append(ids)
+            where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+            consulta = f"""
+                SELECT {columnas}
+                FROM materiales m
+                {join}
+                {where}
+                ORDER BY m.nombre;
+            """
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(consulta, valores)
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener materiales: {str(e)}")
+
     def get_material_by_categoria(
         self, categoria_id: int
     ) -> Optional[List[MaterialResponse]]:
@@ -77,6 +155,91 @@ class MaterialRepository:
         except Exception as e:
             raise Exception(f"Error al obtener material: {str(e)}")
 
+    def get_materiales_by_ids(self, ids: List[int]) -> List[MaterialResponse]:
+        """Obtener varios materiales por ID en una sola consulta"""
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        """
+                        SELECT m.*, c.nombre as categoria_nombre, c.color_identificacion, c.icono
+                        FROM materiales m
+                        JOIN categorias c ON m.categoria_id = c.id
+                        WHERE m.id = ANY(%s);
+                    """,
+                        (ids,),
+                    )
+                    return [MaterialResponse(**row) for row in cur.fetchall()]
+        except Exception as e:
+            raise Exception(f"Error al obtener materiales por ID: {str(e)}")
+
+    def get_material_con_puntos_json(self, material_id: int) -> Optional[str]:
+        """Obtener un material con los puntos activos que lo aceptan, como
+        texto JSON ya serializado por PostgreSQL; None si el material no existe"""
+        try:
+            with get_db_connection() as conn:
+                # Cursor sin diccionarios y JSON como texto: psycopg2 no
+                # decodifica el resultado
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute(
+                        """
+                        SELECT json_build_object(
+                            'material', json_build_object(
+                                'id', m.id,
+                                'nombre', m.nombre,
+                                'codigo', m.codigo,
+                                'descripcion', m.descripcion,
+                                'preparacion_requerida', m.preparacion_requerida,
+                                'beneficio_ambiental', m.beneficio_ambiental,
+                                'requiere_manejo_especial', m.requiere_manejo_especial,
+                                'ejemplos', m.ejemplos,
+                                'materiales_no_aceptados', m.materiales_no_aceptados,
+                                'es_peligroso', m.es_peligroso,
+                                'categoria_id', m.categoria_id,
+                                'activo', m.activo,
+                                'categoria_nombre', c.nombre,
+                                'color_identificacion', c.color_identificacion,
+                                'icono', c.icono
+                            ),
+                            'total_puntos', COALESCE(p.total, 0),
+                            'puntos_reciclaje', COALESCE(p.puntos, '[]'::json)
+                        )::text
+                        FROM materiales m
+                        JOIN categorias c ON c.id = m.categoria_id
+                        LEFT JOIN LATERAL (
+                            SELECT
+                                COUNT(*) AS total,
+                                json_agg(
+                                    json_build_object(
+                                        'id', p.id,
+                                        'nombre', p.nombre,
+                                        'direccion', p.direccion,
+                                        'ciudad', p.ciudad,
+                                        'latitud', p.latitud,
+                                        'longitud', p.longitud,
+                                        'tipo_instalacion', p.tipo_instalacion,
+                                        'horario_apertura', p.horario_apertura,
+                                        'horario_cierre', p.horario_cierre,
+                                        'telefono', p.telefono,
+                                        'observaciones', pm.observaciones,
+                                        'cantidad_maxima', pm.cantidad_maxima,
+                                        'horario_especial', pm.horario_especial
+                                    )
+                                    ORDER BY p.ciudad, p.nombre
+                                ) AS puntos
+                            FROM punto_materiales pm
+                            JOIN puntos_reciclaje p ON p.id = pm.punto_reciclaje_id AND p.region = pm.region
+                            WHERE pm.material_id = m.id AND pm.acepta = true AND p.estado = 'activo'
+                        ) p ON true
+                        WHERE m.id = %s;
+                    """,
+                        (material_id,),
+                    )
+                    fila = cur.fetchone()
+                    return fila[0] if fila else None
+        except Exception as e:
+            raise Exception(f"Error al obtener puntos del material: {str(e)}")
+
     def create_material(self, data: Dict[str, Any]) -> MaterialResponse:
         """Crear un nuevo material"""
         try:
@@ -193,6 +356,72 @@ class MaterialRepository:
             print(f"Error actualizando material: {e}")
             raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+    def update_materiales_lote(
+        self, cambios: Dict[int, Dict[str, Any]]
+    ) -> Dict[int, MaterialResponse]:
+        """Actualizar varios materiales en una transacción.
+
+        Los cambios se agrupan por conjunto de columnas y cada grupo se aplica
+        con un único UPDATE ... FROM (VALUES ...). Devuelve los materiales
+        actualizados por ID; los IDs ausentes no existían.
+        """
+        grupos: Dict[tuple, List[int]] = {}
+        for material_id, campos in cambios.items():
+            grupos.setdefault(tuple(sorted(campos)), []).append(material_id)
+
+        actualizados: Dict[int, MaterialResponse] = {}
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    for columnas, ids in grupos.items():
+                        consulta, plantilla = self._build_update_lote_query(columnas)
+                        filas = execute_values(
+                            cur,
+                            consulta,
+                            [
+                                (material_id, *(cambios[material_id][c] for c in columnas))
+                                for material_id in ids
+                            ],
+                            template=plantilla,
+                            page_size=len(ids),
+                            fetch=True,
+                        )
+                        for fila in filas:
+                            actualizados[fila["id"]] = MaterialResponse(**fila)
+                conn.commit()
+            return actualizados
+
+        except IntegrityError as e:
+            if "materiales_nombre_key" in str(e):
+                raise HTTPException(
+                    status_code=409, detail="Ya existe un material con ese nombre"
+                )
+            if "materiales_codigo_key" in str(e):
+                raise HTTPException(
+                    status_code=409, detail="Ya existe un material con ese código"
+                )
+            raise HTTPException(status_code=400, detail=str(e))
+        except DataError as e:
+            # Valores fuera de rango o más largos que la columna
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise Exception(f"Error al actualizar materiales en lote: {str(e)}")
+
+    def _build_update_lote_query(self, columnas: tuple):
+        # Las columnas ya se validaron contra COLUMNAS_ACTUALIZABLES
+        asignaciones = ", ".join(f"{c} = v.{c}" for c in columnas)
+        consulta = f"""
+            UPDATE materiales AS m
+            SET {asignaciones}
+            FROM (VALUES %s) AS v(id, {", ".join(columnas)})
+            WHERE m.id = v.id
+            RETURNING m.*;
+        """
+        plantilla = "(%s::integer, {})".format(
+            ", ".join(f"%s::{COLUMNAS_ACTUALIZABLES[c]}" for c in columnas)
+        )
+        return consulta, plantilla
+
     def delete_material(self, material_id: int) -> Optional[Dict[str, Any]]:
         try:
             with get_db_connection() as conn:
@@ -1,7 +1,48 @@
+from psycopg2 import DataError, IntegrityError
+import psycopg2.extensions
+from fastapi import HTTPException
 from app.config.database import get_db_connection
+from app.config.settings import settings
+from app.core.geo import caja_alrededor, regiones_en_caja
 from typing import List, Dict, Any, Optional
+from app.core.trazas import trazar
 
+# Campos que admite ?fields= y su expresión SQL; el conteo de materiales
+# solo añade el JOIN con punto_materiales cuando se pide
+CAMPOS_PUNTO = {
+    campo: f"p.{campo}"
+    for campo in [
+        "id", "nombre", "descripcion", "direccion", "ciudad", "provincia",
+        "codigo_postal", "latitud", "longitud", "tipo_instalacion",
+        "horario_apertura", "horario_cierre", "dias_servicio", "telefono",
+        "email", "sitio_web", "capacidad_estimada", "instrucciones_acceso",
+        "foto_url", "estado", "fecha_registro", "fecha_actualizacion",
+    ]
+}
+CAMPOS_PUNTO["total_materiales_aceptados"] = "COUNT(pm.material_id)"
 
+# Columnas que se pueden dar al crear o actualizar un punto; region se
+# calcula siempre a partir de latitud y longitud
+COLUMNAS_ESCRIBIBLES = [
+    "nombre", "descripcion", "direccion", "ciudad", "provincia",
+    "codigo_postal", "latitud", "longitud", "tipo_instalacion",
+    "horario_apertura", "horario_cierre", "dias_servicio", "telefono",
+    "email", "sitio_web", "capacidad_estimada", "instrucciones_acceso",
+    "foto_url", "estado",
+]
+
+# Atributos de cada relación punto-material que admite PUT /{id}/materiales
+# y su tipo, para tipar los arrays del upsert
+COLUMNAS_PUNTO_MATERIAL = {
+    "material_id": "integer",
+    "acepta": "boolean",
+    "observaciones": "text",
+    "cantidad_maxima": "varchar",
+    "horario_especial": "varchar",
+}
+
+
+@trazar("repositorio")
 class PuntoReciclajeRepository:
     def get_puntos_reciclaje(
         self, ciudad: Optional[str] = None
@@ -11,39 +52,90 @@ class PuntoReciclajeRepository:
             with get_db_connection() as conn:
                 with conn.cursor() as cur:
                     if ciudad:
+                        regiones = self._get_regiones_ciudad(cur, ciudad)
                         cur.execute(
                             """
                             SELECT p.*, COUNT(pm.material_id) as total_materiales_aceptados
                             FROM puntos_reciclaje p
-                            LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.acepta = true
-                            WHERE p.ciudad ILIKE %s AND p.estado = 'activo'
-                            GROUP BY p.id
+                            LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
+                                AND pm.acepta = true AND pm.region = ANY(%s)
+                            WHERE p.ciudad ILIKE %s AND p.estado = 'activo' AND p.region = ANY(%s)
+                            GROUP BY p.id, p.region
                             ORDER BY p.nombre;
                         """,
-                            (f"%{ciudad}%",),
+                            (regiones, f"%{ciudad}%", regiones),
                         )
                     else:
                         cur.execute("""
                             SELECT p.*, COUNT(pm.material_id) as total_materiales_aceptados
                             FROM puntos_reciclaje p
-                            LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.acepta = true
+                            LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true
                             WHERE p.estado = 'activo'
-                            GROUP BY p.id
+                            GROUP BY p.id, p.region
                             ORDER BY p.ciudad, p.nombre;
                         """)
                     return cur.fetchall()
         except Exception as e:
             raise Exception(f"Error al obtener puntos de reciclaje: {str(e)}")
 
+    def get_puntos_campos(
+        self,
+        campos: List[str],
+        ciudad: Optional[str] = None,
+        ids: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Obtener puntos activos con solo las columnas pedidas (validadas contra CAMPOS_PUNTO)"""
+        try:
+            columnas = ", ".join(f"{CAMPOS_PUNTO[c]} AS {c}" for c in campos)
+            con_conteo = "total_materiales_aceptados" in campos
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    regiones = self._get_regiones_ciudad(cur, ciudad) if ciudad else None
+                    join, valores = "", []
+                    if con_conteo:
+                        join = "LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true"
+                        if regiones is not None:
+                            join += " AND pm.region = ANY(%s)"
+                            valores.append(regiones)
+                    condiciones = ["p.estado = 'activo'"]
+                    if ciudad:
+                        condiciones.append("p.ciudad ILIKE %s AND p.region = ANY(%s)")
+                        valores.extend([f"%{ciudad}%", regiones])
+                    if ids is not None:
+                        condiciones.append("p.id = ANY(%s)")
+                        valores.append(ids)
+
+                    cur.execute(
+                        f"""
+                        SELECT {columnas}
+                        FROM puntos_reciclaje p
+                        {join}
+                        WHERE {" AND ".join(condiciones)}
+                        {"GROUP BY p.id, p.region" if con_conteo else ""}
+                        ORDER BY p.ciudad, p.nombre;
+                    """,
+                        valores,
+                    )
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener puntos de reciclaje: {str(e)}")
+
     def get_puntos_cercanos(
         self, lat: float, lng: float, radio: float
     ) -> List[Dict[str, Any]]:
         """Buscar puntos de reciclaje cercanos a una ubicación"""
         try:
+            caja = caja_alrededor(lat, lng, radio)
+            condiciones, valores_caja, regiones = self._filtro_caja(caja)
+            join_regiones = "AND pm.region = ANY(%s)" if regiones is not None else ""
+            valores = [lat, lng, lat]
+            if regiones is not None:
+                valores.append(regiones)
+            valores.extend(valores_caja + [lat, lng, lat, radio])
             with get_db_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(
-                        """
+                        f"""
                         SELECT 
                             p.id,
                             p.nombre,
@@ -58,37 +150,323 @@ class PuntoReciclajeRepository:
                             p.email,
                             ROUND(
                                 CAST(
-                                    6371 * acos(
+                                    6371 * acos(LEAST(1,
                                         cos(radians(%s)) * 
                                         cos(radians(p.latitud)) * 
                                         cos(radians(p.longitud) - radians(%s)) + 
                                         sin(radians(%s)) * 
                                         sin(radians(p.latitud))
-                                    ) AS DECIMAL
+                                    )) AS DECIMAL
                                 ), 2
                             ) as distancia_km,
                             COUNT(pm.material_id) as total_materiales
                         FROM puntos_reciclaje p
-                        LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.acepta = true
-                        WHERE p.estado = 'activo'
+                        LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
+                            AND pm.acepta = true {join_regiones}
+                        WHERE {" AND ".join(condiciones)}
                         AND (
-                            6371 * acos(
+                            6371 * acos(LEAST(1,
                                 cos(radians(%s)) * 
                                 cos(radians(p.latitud)) * 
                                 cos(radians(p.longitud) - radians(%s)) + 
                                 sin(radians(%s)) * 
                                 sin(radians(p.latitud))
-                            )
+                            ))
                         ) <= %s
                         GROUP BY p.id, p.nombre, p.direccion, p.ciudad, p.latitud, p.longitud, p.tipo_instalacion, p.horario_apertura, p.horario_cierre, p.telefono, p.email
                         ORDER BY distancia_km;
                     """,
-                        (lat, lng, lat, lat, lng, lat, radio),
+                        valores,
                     )
                     return cur.fetchall()
         except Exception as e:
             raise Exception(f"Error al buscar puntos cercanos: {str(e)}")
 
+    def get_puntos_en_caja(self, caja: tuple) -> List[Dict[str, Any]]:
+        """Obtener los puntos activos dentro de una caja (lat_min, lat_max,
+        lng_min, lng_max) con las columnas de la búsqueda de cercanos"""
+        try:
+            condiciones, valores, regiones = self._filtro_caja(caja)
+            join_regiones = ""
+            if regiones is not None:
+                join_regiones = "AND pm.region = ANY(%s)"
+                valores = [regiones] + valores
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        SELECT 
+                            p.id,
+                            p.nombre,
+                            p.direccion,
+                            p.ciudad,
+                            p.latitud,
+                            p.longitud,
+                            p.tipo_instalacion,
+                            p.horario_apertura,
+                            p.horario_cierre,
+                            p.telefono,
+                            p.email,
+                            COUNT(pm.material_id) as total_materiales
+                        FROM puntos_reciclaje p
+                        LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
+                            AND pm.acepta = true {join_regiones}
+                        WHERE {" AND ".join(condiciones)}
+                        GROUP BY p.id, p.region;
+                    """,
+                        valores,
+                    )
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener puntos de la zona: {str(e)}")
+
+    def get_coordenadas_punto(self, punto_id: int) -> Optional[Dict[str, Any]]:
+        """Obtener latitud y longitud de un punto (aunque no esté activo)"""
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT latitud, longitud FROM puntos_reciclaje WHERE id = %s;",
+                        (punto_id,),
+                    )
+                    return cur.fetchone()
+        except Exception as e:
+            raise Exception(f"Error al obtener coordenadas del punto: {str(e)}")
+
+    def get_puntos_mas_cercanos(
+        self, lat: float, lng: float, k: int, radio_maximo: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Obtener los k puntos activos más cercanos, a cualquier distancia.
+
+        Busca dentro de una caja (latitud, longitud) que aprovecha
+        idx_puntos_coordenadas y la amplía hasta encontrar k puntos dentro
+        del radio: así solo se ordenan los candidatos cercanos, no la tabla.
+        """
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    radio = settings.knn_radio_inicial_km
+                    if radio_maximo is not None:
+                        radio = min(radio, radio_maximo)
+                    while True:
+                        caja = caja_alrededor(lat, lng, radio)
+                        if caja is None:
+                            break
+                        filas = self._consultar_mas_cercanos(
+                            cur, lat, lng, k, radio, caja
+                        )
+                        if len(filas) >= k or (
+                            radio_maximo is not None and radio >= radio_maximo
+                        ):
+                            return filas
+                        radio *= settings.knn_factor_ampliacion
+                        if radio_maximo is not None:
+                            radio = min(radio, radio_maximo)
+
+                    # La caja cubre ya casi todo el globo: ordenar sin ella
+                    return self._consultar_mas_cercanos(
+                        cur, lat, lng, k, radio_maximo, None
+                    )
+        except Exception as e:
+            raise Exception(f"Error al buscar los puntos más cercanos: {str(e)}")
+
+    def get_candidatos_ruta(
+        self,
+        lat: float,
+        lng: float,
+        objetivo: Dict[int, int],
+        campos: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Obtener, por cada material, sus objetivo[material] puntos activos más
+        cercanos que lo aceptan, sin repetir puntos.
+
+        Igual que get_puntos_mas_cercanos busca en una caja que se amplía,
+        pero solo para los materiales que aún no tienen bastantes candidatos.
+        """
+        candidatos: Dict[int, Dict[str, Any]] = {}
+        pendientes = [m for m, k in objetivo.items() if k > 0]
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    radio = settings.knn_radio_inicial_km
+                    while pendientes:
+                        caja = caja_alrededor(lat, lng, radio)
+                        filas = self._consultar_candidatos_ruta(
+                            cur, lat, lng, pendientes, max(objetivo.values()),
+                            radio if caja is not None else None, caja, campos,
+                        )
+                        encontrados: Dict[int, int] = {}
+                        for fila in filas:
+                            for material_id in fila.pop("materiales"):
+                                encontrados[material_id] = encontrados.get(material_id, 0) + 1
+                            candidatos.setdefault(fila["id"], fila)
+                        if caja is None:
+                            # Ya se buscó sin caja: no hay más puntos que encontrar
+                            break
+                        pendientes = [
+                            m for m in pendientes if encontrados.get(m, 0) < objetivo[m]
+                        ]
+                        radio *= settings.knn_factor_ampliacion
+            return list(candidatos.values())
+        except Exception as e:
+            raise Exception(f"Error al buscar candidatos para la ruta: {str(e)}")
+
+    def _consultar_candidatos_ruta(
+        self,
+        cur,
+        lat: float,
+        lng: float,
+        materiales: List[int],
+        k: int,
+        radio: Optional[float],
+        caja: Optional[tuple],
+        campos: List[str],
+    ) -> List[Dict[str, Any]]:
+        condiciones, valores_caja, regiones = self._filtro_caja(caja)
+        valores = [lat, lng, lat] + valores_caja + [radio, radio]
+        regiones_pm = ""
+        if regiones is not None:
+            regiones_pm = "AND pm.region = ANY(%s)"
+            valores.append(regiones)
+        valores.extend([materiales, k])
+        columnas = ", ".join(f"{CAMPOS_PUNTO[c]} AS {c}" for c in campos)
+
+        cur.execute(
+            f"""
+            WITH cercanos AS (
+                SELECT id, region, distancia
+                FROM (
+                    SELECT
+                        p.id,
+                        p.region,
+                        6371 * acos(LEAST(1,
+                            cos(radians(%s)) * 
+                            cos(radians(p.latitud)) * 
+                            cos(radians(p.longitud) - radians(%s)) + 
+                            sin(radians(%s)) * 
+                            sin(radians(p.latitud))
+                        )) AS distancia
+                    FROM puntos_reciclaje p
+                    WHERE {" AND ".join(condiciones)}
+                ) candidatos
+                WHERE %s::float IS NULL OR distancia <= %s
+            ),
+            por_material AS (
+                SELECT
+                    pm.material_id,
+                    c.id,
+                    c.region,
+                    row_number() OVER (PARTITION BY pm.material_id ORDER BY c.distancia) AS puesto
+                FROM cercanos c
+                JOIN punto_materiales pm ON pm.punto_reciclaje_id = c.id AND pm.region = c.region
+                    AND pm.acepta = true {regiones_pm}
+                WHERE pm.material_id = ANY(%s)
+            )
+            SELECT {columnas}, array_agg(c.material_id) AS materiales
+            FROM por_material c
+            JOIN puntos_reciclaje p ON p.id = c.id AND p.region = c.region
+            WHERE c.puesto <= %s
+            GROUP BY p.id, p.region;
+        """,
+            valores,
+        )
+        return cur.fetchall()
+
+    def _filtro_caja(self, caja: Optional[tuple]) -> tuple:
+        """Condiciones para los puntos activos dentro de la caja: el rango de
+        coordenadas usa idx_puntos_coordenadas y las regiones que toca la caja
+        descartan el resto de particiones. Devuelve también esas regiones
+        (None si la caja es demasiado grande o no hay caja)."""
+        condiciones, valores = ["p.estado = 'activo'"], []
+        if caja is None:
+            return condiciones, valores, None
+        condiciones.append("p.latitud BETWEEN %s AND %s")
+        condiciones.append("p.longitud BETWEEN %s AND %s")
+        valores.extend(caja)
+        regiones = regiones_en_caja(*caja)
+        if regiones is not None:
+            condiciones.append("p.region = ANY(%s)")
+            valores.append(regiones)
+        return condiciones, valores, regiones
+
+    def _consultar_mas_cercanos(
+        self,
+        cur,
+        lat: float,
+        lng: float,
+        k: int,
+        radio: Optional[float],
+        caja: Optional[tuple],
+    ) -> List[Dict[str, Any]]:
+        condiciones, valores_caja, regiones = self._filtro_caja(caja)
+        valores = [lat, lng, lat] + valores_caja + [radio, radio, k]
+        # Las mismas regiones en los joins para descartar también ahí particiones
+        regiones_p = regiones_pm = ""
+        if regiones is not None:
+            regiones_p = "AND p.region = ANY(%s)"
+            regiones_pm = "AND pm.region = ANY(%s)"
+            valores.extend([regiones, regiones])
+
+        cur.execute(
+            f"""
+            WITH cercanos AS (
+                SELECT id, region, distancia
+                FROM (
+                    SELECT
+                        p.id,
+                        p.region,
+                        6371 * acos(LEAST(1,
+                            cos(radians(%s)) * 
+                            cos(radians(p.latitud)) * 
+                            cos(radians(p.longitud) - radians(%s)) + 
+                            sin(radians(%s)) * 
+                            sin(radians(p.latitud))
+                        )) AS distancia
+                    FROM puntos_reciclaje p
+                    WHERE {" AND ".join(condiciones)}
+                ) candidatos
+                WHERE %s::float IS NULL OR distancia <= %s
+                ORDER BY distancia
+                LIMIT %s
+            )
+            SELECT 
+                p.id,
+                p.nombre,
+                p.direccion,
+                p.ciudad,
+                p.latitud,
+                p.longitud,
+                p.tipo_instalacion,
+                p.horario_apertura,
+                p.horario_cierre,
+                p.telefono,
+                p.email,
+                ROUND(CAST(c.distancia AS DECIMAL), 2) as distancia_km,
+                COUNT(pm.material_id) as total_materiales
+            FROM cercanos c
+            JOIN puntos_reciclaje p ON p.id = c.id AND p.region = c.region {regiones_p}
+            LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
+                AND pm.acepta = true {regiones_pm}
+            GROUP BY p.id, p.region, c.distancia
+            ORDER BY c.distancia;
+        """,
+            valores,
+        )
+        return cur.fetchall()
+
+    def _get_regiones_ciudad(self, cur, ciudad: str) -> List[int]:
+        """Regiones con puntos de las ciudades que coinciden con el filtro.
+
+        Se consultan aparte para pasarlas como constantes: así el planificador
+        descarta las particiones al planificar, cosa que no hace con el
+        resultado de una subconsulta.
+        """
+        cur.execute(
+            "SELECT DISTINCT region FROM regiones_ciudad WHERE ciudad ILIKE %s;",
+            (f"%{ciudad}%",),
+        )
+        return [fila["region"] for fila in cur.fetchall()]
+
     def get_punto_by_id(self, punto_id: int) -> Optional[Dict[str, Any]]:
         """Obtener punto por ID"""
         try:
@@ -104,6 +482,147 @@ class PuntoReciclajeRepository:
         except Exception as e:
             raise Exception(f"Error al obtener punto: {str(e)}")
 
+    def get_punto_con_materiales_json(self, punto_id: int) -> Optional[str]:
+        """Obtener un punto activo con los materiales activos que acepta, como
+        texto JSON ya serializado por PostgreSQL; None si el punto no existe"""
+        try:
+            with get_db_connection() as conn:
+                # Cursor sin diccionarios y JSON como texto: psycopg2 no
+                # decodifica el resultado
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute(
+                        """
+                        SELECT json_build_object(
+                            'punto_reciclaje', row_to_json(p),
+                            'total_materiales', COALESCE(m.total, 0),
+                            'materiales_aceptados', COALESCE(m.materiales, '[]'::json)
+                        )::text
+                        FROM puntos_reciclaje p
+                        LEFT JOIN LATERAL (
+                            SELECT
+                                COUNT(*) AS total,
+                                json_agg(
+                                    json_build_object(
+                                        'id', m.id,
+                                        'nombre', m.nombre,
+                                        'codigo', m.codigo,
+                                        'descripcion', m.descripcion,
+                                        'preparacion_requerida', m.preparacion_requerida,
+                                        'es_peligroso', m.es_peligroso,
+                                        'requiere_manejo_especial', m.requiere_manejo_especial,
+                                        'categoria_id', c.id,
+                                        'categoria_nombre', c.nombre,
+                                        'color_identificacion', c.color_identificacion,
+                                        'icono', c.icono,
+                                        'observaciones', pm.observaciones,
+                                        'cantidad_maxima', pm.cantidad_maxima,
+                                        'horario_especial', pm.horario_especial
+                                    )
+                                    ORDER BY c.orden_display, m.nombre
+                                ) AS materiales
+                            FROM punto_materiales pm
+                            JOIN materiales m ON m.id = pm.material_id AND m.activo = true
+                            JOIN categorias c ON c.id = m.categoria_id
+                            WHERE pm.punto_reciclaje_id = p.id AND pm.region = p.region
+                                AND pm.acepta = true
+                        ) m ON true
+                        WHERE p.id = %s AND p.estado = 'activo';
+                    """,
+                        (punto_id,),
+                    )
+                    fila = cur.fetchone()
+                    return fila[0] if fila else None
+        except Exception as e:
+            raise Exception(f"Error al obtener materiales del punto: {str(e)}")
+
+    def get_puntos_by_ids(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Obtener varios puntos activos por ID en una sola consulta"""
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT p.*, COUNT(pm.material_id) as total_materiales_aceptados
+                        FROM puntos_reciclaje p
+                        LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true
+                        WHERE p.id = ANY(%s) AND p.estado = 'activo'
+                        GROUP BY p.id, p.region;
+                    """,
+                        (ids,),
+                    )
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener puntos por ID: {str(e)}")
+
+    def get_materiales_aceptados_por_punto(
+        self, punto_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Obtener, por punto, si está activo y los materiales activos que acepta.
+
+        Sin punto_ids devuelve todos los puntos (para construir índices en memoria).
+        """
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT
+                            p.id AS punto_id,
+                            p.estado = 'activo' AS activo,
+                            COALESCE(
+                                array_agg(pm.material_id) FILTER (WHERE pm.material_id IS NOT NULL),
+                                '{}'
+                            ) AS materiales
+                        FROM puntos_reciclaje p
+                        LEFT JOIN (
+                            punto_materiales pm
+                            JOIN materiales m ON m.id = pm.material_id AND m.activo = true
+                        ) ON pm.punto_reciclaje_id = p.id AND pm.region = p.region AND pm.acepta = true
+                        WHERE %s::integer[] IS NULL OR p.id = ANY(%s)
+                        GROUP BY p.id, p.region;
+                    """,
+                        (punto_ids, punto_ids),
+                    )
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener materiales aceptados por punto: {str(e)}")
+
+    def get_facetas_por_punto(
+        self, punto_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Obtener ciudad, tipo, estado y categorías aceptadas de cada punto.
+
+        Sin punto_ids devuelve todos los puntos (para construir los contadores de facetas).
+        """
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT
+                            p.id AS punto_id,
+                            p.ciudad,
+                            p.tipo_instalacion::text AS tipo_instalacion,
+                            p.estado::text AS estado,
+                            COALESCE(
+                                array_agg(DISTINCT m.categoria_id) FILTER (WHERE m.categoria_id IS NOT NULL),
+                                '{}'
+                            ) AS categorias
+                        FROM puntos_reciclaje p
+                        LEFT JOIN (
+                            punto_materiales pm
+                            JOIN materiales m ON m.id = pm.material_id AND m.activo = true
+                            JOIN categorias c ON c.id = m.categoria_id AND c.activo = true
+                        ) ON pm.punto_reciclaje_id = p.id AND pm.region = p.region AND pm.acepta = true
+                        WHERE %s::integer[] IS NULL OR p.id = ANY(%s)
+                        GROUP BY p.id, p.region;
+                    """,
+                        (punto_ids, punto_ids),
+                    )
+                    return cur.fetchall()
+        except Exception as e:
+            raise Exception(f"Error al obtener facetas de puntos: {str(e)}")
+
     def get_puntos_por_material(self, material_id: int) -> List[Dict[str, Any]]:
         """Obtener puntos que aceptan un material específico"""
         try:
@@ -126,7 +645,7 @@ class PuntoReciclajeRepository:
                             pm.cantidad_maxima,
                             pm.horario_especial
                         FROM puntos_reciclaje p
-                        JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id
+                        JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
                         WHERE pm.material_id = %s AND pm.acepta = true AND p.estado = 'activo'
                         ORDER BY p.ciudad, p.nombre;
                     """,
@@ -135,3 +654,169 @@ class PuntoReciclajeRepository:
                     return cur.fetchall()
         except Exception as e:
             raise Exception(f"Error al buscar puntos para el material: {str(e)}")
+
+    def create_punto(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crear un punto (columnas validadas contra COLUMNAS_ESCRIBIBLES)"""
+        # Los campos a None se omiten para que apliquen los DEFAULT de la tabla
+        # (estado 'activo', tipo_instalacion 'centro_acopio', ...)
+        columnas = [c for c in COLUMNAS_ESCRIBIBLES if data.get(c) is not None]
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    # La región se calcula con las coordenadas ya redondeadas al
+                    # tipo de la columna, las mismas que se guardan
+                    cur.execute(
+                        f"""
+                        INSERT INTO puntos_reciclaje ({", ".join(columnas)}, region)
+                        VALUES (
+                            {", ".join(["%s"] * len(columnas))},
+                            region_de(%s::numeric(10, 8), %s::numeric(11, 8))
+                        )
+                        RETURNING *;
+                    """,
+                        [data[c] for c in columnas] + [data["latitud"], data["longitud"]],
+                    )
+                    punto = cur.fetchone()
+                conn.commit()
+                return punto
+        except (IntegrityError, DataError) as e:
+            raise HTTPException(status_code=400, detail=str(e).splitlines()[0])
+        except Exception as e:
+            raise Exception(f"Error al crear punto de reciclaje: {str(e)}")
+
+    def update_punto(
+        self, punto_id: int, campos: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Actualizar un punto; None si no existe.
+
+        Si cambian las coordenadas se recalcula la región: la fila pasa a su
+        nueva partición y sus relaciones con materiales la siguen por el
+        ON UPDATE CASCADE de la clave foránea.
+        """
+        columnas = [c for c in COLUMNAS_ESCRIBIBLES if c in campos]
+        asignaciones = [f"{c} = %s" for c in columnas]
+        valores = [campos[c] for c in columnas]
+        if "latitud" in campos or "longitud" in campos:
+            # En el SET las columnas valen lo anterior a la actualización; los
+            # parámetros se redondean como la columna (ver create_punto)
+            asignaciones.append(
+                "region = region_de("
+                "COALESCE(%s::numeric(10, 8), latitud), "
+                "COALESCE(%s::numeric(11, 8), longitud))"
+            )
+            valores.extend([campos.get("latitud"), campos.get("longitud")])
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        UPDATE puntos_reciclaje
+                        SET {", ".join(asignaciones)}
+                        WHERE id = %s
+                        RETURNING *;
+                    """,
+                        valores + [punto_id],
+                    )
+                    punto = cur.fetchone()
+                conn.commit()
+                return punto
+        except (IntegrityError, DataError) as e:
+            raise HTTPException(status_code=400, detail=str(e).splitlines()[0])
+        except Exception as e:
+            raise Exception(f"Error al actualizar punto de reciclaje: {str(e)}")
+
+    def delete_punto(self, punto_id: int) -> Optional[Dict[str, Any]]:
+        """Eliminar un punto y, en cascada, sus relaciones; None si no existe"""
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM puntos_reciclaje WHERE id = %s RETURNING id, nombre;",
+                        (punto_id,),
+                    )
+                    punto = cur.fetchone()
+                conn.commit()
+                return punto
+        except Exception as e:
+            raise Exception(f"Error al eliminar punto de reciclaje: {str(e)}")
+
+    def reemplazar_materiales_punto(
+        self, punto_id: int, materiales: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Dejar como materiales del punto exactamente los indicados.
+
+        Una sola sentencia: un upsert sobre UNIQUE(punto_reciclaje_id,
+        material_id, region) que solo reescribe las relaciones que cambian y
+        un DELETE de las que ya no están. Devuelve los IDs de material
+        insertados, actualizados y eliminados, o None si el punto no existe.
+        """
+        columnas = list(COLUMNAS_PUNTO_MATERIAL)
+        atributos = columnas[1:]
+        arrays = ", ".join(f"%s::{COLUMNAS_PUNTO_MATERIAL[c]}[]" for c in columnas)
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        WITH punto AS (
+                            -- Bloquea el cambio de región o el borrado del punto mientras tanto
+                            SELECT id, region FROM puntos_reciclaje WHERE id = %s FOR KEY SHARE
+                        ),
+                        nuevos AS (
+                            SELECT * FROM unnest({arrays}) AS n({", ".join(columnas)})
+                        ),
+                        -- Relaciones previas (instantánea de la sentencia), para
+                        -- distinguir inserciones de actualizaciones
+                        previos AS (
+                            SELECT pm.material_id
+                            FROM punto_materiales pm
+                            JOIN punto p ON pm.punto_reciclaje_id = p.id AND pm.region = p.region
+                        ),
+                        upsert AS (
+                            INSERT INTO punto_materiales (punto_reciclaje_id, region, {", ".join(columnas)})
+                            SELECT p.id, p.region, {", ".join(f"n.{c}" for c in columnas)}
+                            FROM punto p CROSS JOIN nuevos n
+                            ON CONFLICT (punto_reciclaje_id, material_id, region) DO UPDATE
+                            SET {", ".join(f"{c} = EXCLUDED.{c}" for c in atributos)}
+                            WHERE ({", ".join(f"punto_materiales.{c}" for c in atributos)})
+                                IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in atributos)})
+                            RETURNING material_id
+                        ),
+                        eliminados AS (
+                            DELETE FROM punto_materiales pm
+                            USING punto p
+                            WHERE pm.punto_reciclaje_id = p.id AND pm.region = p.region
+                                AND pm.material_id <> ALL (SELECT material_id FROM nuevos)
+                            RETURNING pm.material_id
+                        )
+                        SELECT
+                            EXISTS (SELECT 1 FROM punto) AS existe,
+                            ARRAY(
+                                SELECT material_id FROM upsert
+                                WHERE material_id NOT IN (SELECT material_id FROM previos) ORDER BY 1
+                            ) AS insertados,
+                            ARRAY(
+                                SELECT material_id FROM upsert
+                                WHERE material_id IN (SELECT material_id FROM previos) ORDER BY 1
+                            ) AS actualizados,
+                            ARRAY(SELECT material_id FROM eliminados ORDER BY 1) AS eliminados;
+                    """,
+                        [punto_id] + [[m.get(c) for m in materiales] for c in columnas],
+                    )
+                    resultado = cur.fetchone()
+                conn.commit()
+                if not resultado["existe"]:
+                    return None
+                del resultado["existe"]
+                return resultado
+        except IntegrityError as e:
+            if "material_id_fkey" in str(e):
+                raise HTTPException(
+                    status_code=400, detail="Alguno de los materiales no existe"
+                )
+            raise HTTPException(status_code=400, detail=str(e).splitlines()[0])
+        except DataError as e:
+            # Igual que create_punto/update_punto: valores más largos que la columna
+            raise HTTPException(status_code=400, detail=str(e).splitlines()[0])
+        except Exception as e:
+            raise Exception(f"Error al reemplazar materiales del punto: {str(e)}")
@@ -0,0 +1,86 @@
+from app.config.database import get_db_connection
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from psycopg2.extras import RealDictCursor
+from app.core.trazas import trazar
+
+# tabla -> columna de última modificación
+TABLAS_SINCRONIZABLES = {
+    "categorias": "updated_at",
+    "materiales": "updated_at",
+    "puntos_reciclaje": "fecha_actualizacion",
+    "punto_materiales": "updated_at",
+}
+
+
+@trazar("repositorio")
+class SyncRepository:
+    def get_cambios(self, desde: Optional[datetime] = None) -> Dict[str, Any]:
+        """Obtener los registros creados, modificados o eliminados desde una fecha.
+
+        Todas las consultas se hacen en una sola transacción REPEATABLE READ
+        para que el resultado sea una foto consistente de la base.
+        """
+        try:
+            with get_db_connection(
+                isolation_level="REPEATABLE READ", readonly=True
+            ) as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Las filas llevan la hora de inicio de su transacción: una
+                    # escritura aún sin confirmar fuera de esta foto tendrá una
+                    # hora anterior a LOCALTIMESTAMP, así que el punto de corte
+                    # es el inicio de la transacción escritora más antigua
+                    cur.execute(
+                        """
+                        SELECT LEAST(
+                            LOCALTIMESTAMP,
+                            (
+                                SELECT min(xact_start)::timestamp
+                                FROM pg_stat_activity
+                                WHERE backend_xid IS NOT NULL
+                            )
+                        ) AS ahora;
+                    """
+                    )
+                    ahora = cur.fetchone()["ahora"]
+
+                    cambios: Dict[str, Any] = {"ahora": ahora}
+                    for tabla, columna in TABLAS_SINCRONIZABLES.items():
+                        cambios[tabla] = {
+                            "actualizados": self._get_actualizados(
+                                cur, tabla, columna, desde
+                            ),
+                            "eliminados": self._get_eliminados(cur, tabla, desde),
+                        }
+                return cambios
+        except Exception as e:
+            raise Exception(f"Error al obtener cambios para sincronizar: {str(e)}")
+
+    def _get_actualizados(
+        self, cur, tabla: str, columna: str, desde: Optional[datetime]
+    ) -> List[Dict[str, Any]]:
+        # tabla y columna vienen de TABLAS_SINCRONIZABLES, nunca del cliente
+        if desde is None:
+            cur.execute(f"SELECT * FROM {tabla} ORDER BY id;")
+        else:
+            cur.execute(
+                f"SELECT * FROM {tabla} WHERE {columna} >= %s ORDER BY id;", (desde,)
+            )
+        return cur.fetchall()
+
+    def _get_eliminados(
+        self, cur, tabla: str, desde: Optional[datetime]
+    ) -> List[int]:
+        # En una sincronización completa no hay nada que borrar en el cliente
+        if desde is None:
+            return []
+        cur.execute(
+            """
+            SELECT DISTINCT registro_id
+            FROM registros_eliminados
+            WHERE tabla = %s AND eliminado_en >= %s
+            ORDER BY registro_id;
+            """,
+            (tabla, desde),
+        )
+        return [row["registro_id"] for row in cur.fetchall()]
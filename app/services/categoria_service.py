@@ -1,25 +1,75 @@
 from app.repositories.categoria_repository import CategoriaRepository
 from typing import List, Optional, Any, Dict
+from fastapi import HTTPException
 from app.schemas.categoria import CategoriaResponse
+from app.core import eventos
+from app.core.coalescencia import coalescer
+from app.core.trazas import trazar
 
 
+@trazar("servicio")
 class CategoriaService:
     def __init__(self):
         self.categoria_repo = CategoriaRepository()
 
-    def get_all_categorias(self) -> Optional[List[CategoriaResponse]]:
-        """Obtener todas las categorías"""
+    @coalescer("categorias")
+    def get_all_categorias(
+        self, campos: Optional[List[str]] = None
+    ) -> Optional[List[CategoriaResponse]]:
+        """Obtener todas las categorías (solo los campos pedidos, si se indican)"""
+        if campos:
+            return self.categoria_repo.get_categorias_campos(campos)
         categorias = self.categoria_repo.get_all_categorias()
         return categorias
 
-    def get_categoria_by_id(self, categoria_id: int) -> Optional[CategoriaResponse]:
+    @coalescer("categoria")
+    def get_categoria_by_id(
+        self, categoria_id: int, campos: Optional[List[str]] = None
+    ) -> Optional[CategoriaResponse]:
+        if campos:
+            filas = self.categoria_repo.get_categorias_campos(campos, ids=[categoria_id])
+            return filas[0] if filas else None
         categoria = self.categoria_repo.get_categoria_by_id(categoria_id=categoria_id)
         return categoria
 
+    @coalescer("categorias_por_ids")
+    def get_categorias_by_ids(
+        self, ids: List[int], campos: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Obtener varias categorías en el orden pedido, indicando las que no existen"""
+        if campos:
+            filas = self.categoria_repo.get_categorias_campos(campos, ids=ids)
+            categorias = {c["id"]: c for c in filas}
+        else:
+            categorias = {
+                c.id: c for c in self.categoria_repo.get_categorias_by_ids(ids)
+            }
+        return {
+            "categorias": [categorias[i] for i in ids if i in categorias],
+            "faltantes": [i for i in ids if i not in categorias],
+        }
+
+    @coalescer("categoria_con_materiales")
+    def get_categoria_con_materiales(self, categoria_id: int) -> bytes:
+        """Obtener una categoría con sus materiales, como JSON listo para
+        enviar construido en una sola consulta"""
+        datos = self.categoria_repo.get_categoria_con_materiales_json(categoria_id)
+        if datos is None:
+            raise HTTPException(status_code=404, detail="Categoría no encontrada")
+        return datos.encode("utf-8")
+
+    @coalescer("catalogo")
+    def get_catalogo(self) -> bytes:
+        """Obtener el catálogo completo (categorías con sus materiales) como
+        JSON listo para enviar, construido en una sola consulta"""
+        return self.categoria_repo.get_catalogo_json().encode("utf-8")
+
     def create_categoria(self, categoria_data: dict) -> CategoriaResponse:
         nueva_categoria = self.categoria_repo.create_categoria(
             categoria_data=categoria_data
         )
+        if nueva_categoria:
+            eventos.publicar("categorias", "INSERT", nueva_categoria.id)
         return nueva_categoria
 
     def update_categoria(
@@ -28,8 +78,10 @@ class CategoriaService:
         categoria_actualizada = self.categoria_repo.update_categoria(
             categoria_id=categoria_id, categoria_data=categoria_data
         )
+        eventos.publicar("categorias", "UPDATE", categoria_id)
         return categoria_actualizada
 
     def delete_categoria(self, categoria_id: int) -> Optional[Dict[str, Any]]:
         resultado = self.categoria_repo.delete_categoria(categoria_id=categoria_id)
+        eventos.publicar("categorias", "DELETE", categoria_id)
         return resultado
@@ -0,0 +1,46 @@
+from app.repositories.export_repository import ExportRepository
+from fastapi import HTTPException
+from typing import Iterator
+import csv
+import io
+from app.core.trazas import trazar
+
+FORMATOS_EXPORT = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+@trazar("servicio")
+class ExportService:
+    def __init__(self):
+        self.export_repo = ExportRepository()
+
+    def validar_formato(self, formato: str) -> str:
+        """Devolver el tipo de contenido del formato o 400 si no se admite"""
+        if formato not in FORMATOS_EXPORT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Formato no soportado. Formatos disponibles: {', '.join(FORMATOS_EXPORT)}",
+            )
+        return FORMATOS_EXPORT[formato]
+
+    def exportar_puntos_materiales(self, formato: str) -> Iterator[bytes]:
+        """Generar la matriz punto-material en trozos listos para enviar"""
+        if formato == "ndjson":
+            # La base ya serializa cada fila a JSON
+            for _, filas in self.export_repo.iter_puntos_materiales(como_json=True):
+                yield "".join(f"{fila[0]}\n" for fila in filas).encode("utf-8")
+            return
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        cabecera_escrita = False
+        for columnas, filas in self.export_repo.iter_puntos_materiales():
+            if not cabecera_escrita:
+                escritor.writerow(columnas)
+                cabecera_escrita = True
+            escritor.writerows(filas)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
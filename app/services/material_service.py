@@ -1,26 +1,70 @@
-from app.repositories.material_repository import MaterialRepository
+from app.repositories.material_repository import (
+    MaterialRepository,
+    COLUMNAS_ACTUALIZABLES,
+)
 from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
 from fastapi import HTTPException
 from typing import List, Dict, Any, Optional
 
 from app.schemas.material import MaterialResponse
+from app.core import eventos
+from app.core.coalescencia import coalescer
+from app.indices.sugerencias import indice_sugerencias
+from app.core.trazas import trazar
 
+# Tipo de Python que admite cada tipo de columna de COLUMNAS_ACTUALIZABLES
+_TIPOS_PYTHON = {"varchar": str, "text": str, "boolean": bool, "integer": int}
 
+
+def _tipo_valido(columna: str, valor: Any) -> bool:
+    tipo = _TIPOS_PYTHON[COLUMNAS_ACTUALIZABLES[columna]]
+    if tipo is int and isinstance(valor, bool):
+        return False
+    return isinstance(valor, tipo)
+
+
+@trazar("servicio")
 class MaterialService:
     def __init__(self):
         self.material_repo = MaterialRepository()
         self.punto_repo = PuntoReciclajeRepository()
 
+    @coalescer("materiales")
     def get_materiales(
-        self, categoria_id: Optional[int] = None
+        self, categoria_id: Optional[int] = None, campos: Optional[List[str]] = None
     ) -> List[MaterialResponse]:
         """Obtener materiales, opcionalmente filtrados por categoría"""
+        if campos:
+            return self.material_repo.get_materiales_campos(campos, categoria_id)
         materiales = self.material_repo.get_materiales(categoria_id)
         return materiales
 
-    def get_materiales_por_categoria(self, categoria_id: int) -> List[MaterialResponse]:
+    @coalescer("materiales_por_ids")
+    def get_materiales_by_ids(
+        self, ids: List[int], campos: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Obtener varios materiales en el orden pedido, indicando los que no existen"""
+        if campos:
+            filas = self.material_repo.get_materiales_campos(campos, ids=ids)
+            materiales = {m["id"]: m for m in filas}
+        else:
+            materiales = {
+                m.id: m for m in self.material_repo.get_materiales_by_ids(ids)
+            }
+        return {
+            "materiales": [materiales[i] for i in ids if i in materiales],
+            "faltantes": [i for i in ids if i not in materiales],
+        }
+
+    @coalescer("materiales_por_categoria")
+    def get_materiales_por_categoria(
+        self, categoria_id: int, campos: Optional[List[str]] = None
+    ) -> List[MaterialResponse]:
         """Obtener materiales por categoría"""
-        materiales = self.material_repo.get_material_by_categoria(categoria_id)
+        if campos:
+            materiales = self.material_repo.get_materiales_campos(campos, categoria_id)
+        else:
+            materiales = self.material_repo.get_material_by_categoria(categoria_id)
         if not materiales:
             raise HTTPException(
                 status_code=404,
@@ -28,15 +72,38 @@ class MaterialService:
             )
         return materiales
 
-    def get_material_by_id(self, material_id: int) -> MaterialResponse:
+    @coalescer("material")
+    def get_material_by_id(
+        self, material_id: int, campos: Optional[List[str]] = None
+    ) -> MaterialResponse:
         """Obtener puntos que aceptan un material específico"""
         # Verificar que el material existe
-        material = self.material_repo.get_material_by_id(material_id)
+        if campos:
+            filas = self.material_repo.get_materiales_campos(campos, ids=[material_id])
+            material = filas[0] if filas else None
+        else:
+            material = self.material_repo.get_material_by_id(material_id)
         if not material:
             raise HTTPException(status_code=404, detail="Material no encontrado")
 
         return material
 
+    def get_sugerencias(self, prefijo: str, limite: int) -> Dict[str, Any]:
+        """Autocompletar nombres de materiales y categorías desde el índice en memoria"""
+        return {
+            "prefijo": prefijo,
+            "sugerencias": indice_sugerencias.sugerir(prefijo, limite),
+        }
+
+    @coalescer("puntos_por_material")
+    def get_puntos_por_material(self, material_id: int) -> bytes:
+        """Obtener un material con los puntos que lo aceptan, como JSON listo
+        para enviar construido en una sola consulta"""
+        datos = self.material_repo.get_material_con_puntos_json(material_id)
+        if datos is None:
+            raise HTTPException(status_code=404, detail="Material no encontrado")
+        return datos.encode("utf-8")
+
     def create_material(self, data: Dict[str, Any]) -> MaterialResponse:
         """Crear un nuevo material"""
         try:
@@ -46,6 +113,7 @@ class MaterialService:
                 )
 
             nuevo_material = self.material_repo.create_material(data)
+            eventos.publicar("materiales", "INSERT", nuevo_material.id)
             return nuevo_material
         except Exception as e:
             raise HTTPException(
@@ -63,12 +131,68 @@ class MaterialService:
                 raise HTTPException(status_code=404, detail="Material no encontrado")
 
             material_actualizado = self.material_repo.update_material(material_id, data)
+            eventos.publicar("materiales", "UPDATE", material_id)
             return material_actualizado
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error al actualizar material: {str(e)}"
             )
 
+    def update_materiales_lote(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Actualizar varios materiales a la vez con resultado por elemento"""
+        resultados: List[Dict[str, Any]] = []
+        cambios: Dict[int, Dict[str, Any]] = {}
+
+        for indice, item in enumerate(items):
+            material_id = item.get("id")
+            # Igual que en PATCH /{id}, los campos a None no se modifican
+            campos = {k: v for k, v in item.items() if k != "id" and v is not None}
+            no_permitidos = sorted(set(campos) - set(COLUMNAS_ACTUALIZABLES))
+
+            # bool es subclase de int: True no es un id válido
+            if not isinstance(material_id, int) or isinstance(material_id, bool):
+                error = "El campo 'id' es obligatorio y debe ser un entero"
+            elif material_id in cambios:
+                error = "ID repetido en el lote"
+            elif no_permitidos:
+                error = f"Campos no permitidos: {', '.join(no_permitidos)}"
+            elif mal_tipados := sorted(
+                c for c, v in campos.items() if not _tipo_valido(c, v)
+            ):
+                error = f"Tipo no válido en: {', '.join(mal_tipados)}"
+            elif not campos:
+                error = "No se proporcionaron datos para actualizar"
+            else:
+                error = None
+                cambios[material_id] = campos
+
+            resultados.append(
+                {"indice": indice, "id": material_id, "estado": "pendiente"}
+                if error is None
+                else {"indice": indice, "id": material_id, "estado": "invalido", "detalle": error}
+            )
+
+        actualizados = self.material_repo.update_materiales_lote(cambios) if cambios else {}
+
+        for resultado in resultados:
+            if resultado["estado"] != "pendiente":
+                continue
+            material = actualizados.get(resultado["id"])
+            if material is None:
+                resultado["estado"] = "no_encontrado"
+            else:
+                resultado["estado"] = "actualizado"
+                resultado["material"] = material
+
+        for material_id in actualizados:
+            eventos.publicar("materiales", "UPDATE", material_id)
+
+        return {
+            "total": len(items),
+            "actualizados": len(actualizados),
+            "resultados": resultados,
+        }
+
     def delete_material(self, material_id: int) -> Optional[Dict[str, Any]]:
         """Eliminar un material existente"""
         try:
@@ -86,6 +210,7 @@ class MaterialService:
                 )
 
             resultado = self.material_repo.delete_material(material_id)
+            eventos.publicar("materiales", "DELETE", material_id)
             return resultado
 
         except Exception as e:
@@ -1,51 +1,256 @@
-from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
-from app.repositories.material_repository import MaterialRepository
+from app.repositories.punto_reciclaje_repository import (
+    PuntoReciclajeRepository,
+    CAMPOS_PUNTO,
+    COLUMNAS_ESCRIBIBLES,
+    COLUMNAS_PUNTO_MATERIAL,
+)
 from app.config.settings import settings
+from app.core import eventos
+from app.core.coalescencia import coalescer
+from app.indices.punto_material import indice_punto_material
+from app.indices.facetas import indice_facetas
+from app.indices.cercanos import cache_cercanos
 from fastapi import HTTPException
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+from app.core.trazas import trazar
 
+# Tipo de Python que admite cada atributo opcional de COLUMNAS_PUNTO_MATERIAL
+_TIPOS_PUNTO_MATERIAL = {"boolean": bool, "text": str, "varchar": str}
 
+
+@trazar("servicio")
 class PuntoReciclajeService:
     def __init__(self):
         self.punto_repo = PuntoReciclajeRepository()
-        self.material_repo = MaterialRepository()
 
+    @coalescer("puntos_reciclaje")
     def get_puntos_reciclaje(
-        self, ciudad: Optional[str] = None
+        self, ciudad: Optional[str] = None, campos: Optional[List[str]] = None
     ) -> Dict[str, List[Dict[str, Any]]]:
         """Obtener puntos de reciclaje, opcionalmente filtrados por ciudad"""
-        puntos = self.punto_repo.get_puntos_reciclaje(ciudad)
+        if campos:
+            puntos = self.punto_repo.get_puntos_campos(campos, ciudad=ciudad)
+        else:
+            puntos = self.punto_repo.get_puntos_reciclaje(ciudad)
         return {"puntos_reciclaje": puntos}
 
+    @coalescer("puntos_por_ids")
+    def get_puntos_by_ids(
+        self, ids: List[int], campos: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Obtener varios puntos activos en el orden pedido, indicando los que faltan"""
+        if campos:
+            filas = self.punto_repo.get_puntos_campos(campos, ids=ids)
+        else:
+            filas = self.punto_repo.get_puntos_by_ids(ids)
+        puntos = {p["id"]: p for p in filas}
+        return {
+            "puntos_reciclaje": [puntos[i] for i in ids if i in puntos],
+            "faltantes": [i for i in ids if i not in puntos],
+        }
+
+    def get_puntos_por_materiales(
+        self,
+        materiales: List[int],
+        modo: str = "all",
+        ciudad: Optional[str] = None,
+        campos: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Obtener los puntos activos que aceptan todos (modo=all) o alguno
+        (modo=any) de los materiales, resolviendo la intersección en memoria"""
+        ids = indice_punto_material.buscar(materiales, modo)
+        puntos = []
+        if ids:
+            puntos = self.punto_repo.get_puntos_campos(
+                campos or list(CAMPOS_PUNTO), ciudad=ciudad, ids=ids
+            )
+        return {"materiales": materiales, "modo": modo, "puntos_reciclaje": puntos}
+
+    def get_facetas(
+        self,
+        ciudad: Optional[str] = None,
+        tipo_instalacion: Optional[str] = None,
+        estado: Optional[str] = None,
+        categoria_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Conteos por ciudad, tipo de instalación, estado y categoría aceptada"""
+        return indice_facetas.contar(ciudad, tipo_instalacion, estado, categoria_id)
+
+    @coalescer("puntos_cercanos")
     def get_puntos_cercanos(
-        self, lat: float, lng: float, radio: Optional[float] = None
+        self,
+        lat: float,
+        lng: float,
+        radio: Optional[float] = None,
+        k: Optional[int] = None,
     ) -> Dict[str, Any]:
-        """Buscar puntos de reciclaje cercanos a una ubicación"""
-        if radio is None:
-            radio = settings.default_search_radius
+        """Buscar puntos de reciclaje cercanos a una ubicación.
 
-        puntos_cercanos = self.punto_repo.get_puntos_cercanos(lat, lng, radio)
+        Con k devuelve los k más cercanos a cualquier distancia (o dentro
+        de radio, si también se indica). Se resuelve desde la caché por
+        celda cuando es posible y si no con SQL.
+        """
+        if k is not None:
+            puntos_cercanos = cache_cercanos.buscar(lat, lng, radio, k)
+            if puntos_cercanos is None:
+                puntos_cercanos = self.punto_repo.get_puntos_mas_cercanos(
+                    lat, lng, k, radio
+                )
+            ubicacion = {"latitud": lat, "longitud": lng, "k": k, "radio_km": radio}
+        else:
+            if radio is None:
+                radio = settings.default_search_radius
+            puntos_cercanos = cache_cercanos.buscar(lat, lng, radio)
+            if puntos_cercanos is None:
+                puntos_cercanos = self.punto_repo.get_puntos_cercanos(lat, lng, radio)
+            ubicacion = {"latitud": lat, "longitud": lng, "radio_km": radio}
 
         return {
-            "ubicacion_busqueda": {"latitud": lat, "longitud": lng, "radio_km": radio},
+            "ubicacion_busqueda": ubicacion,
             "puntos_encontrados": len(puntos_cercanos),
             "puntos": puntos_cercanos,
         }
 
-    def get_materiales_por_punto(self, punto_id: int) -> Dict[str, Any]:
-        """Obtener materiales que acepta un punto específico"""
-        # Verificar que el punto existe
-        punto = self.punto_repo.get_punto_by_id(punto_id)
-        if not punto:
+    @coalescer("materiales_por_punto")
+    def get_materiales_por_punto(self, punto_id: int) -> bytes:
+        """Obtener un punto con los materiales que acepta, como JSON listo
+        para enviar construido en una sola consulta"""
+        datos = self.punto_repo.get_punto_con_materiales_json(punto_id)
+        if datos is None:
             raise HTTPException(
                 status_code=404, detail="Punto de reciclaje no encontrado"
             )
+        return datos.encode("utf-8")
+
+    def create_punto(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crear un punto de reciclaje"""
+        faltantes = [
+            c for c in ("nombre", "direccion", "ciudad", "latitud", "longitud")
+            if data.get(c) is None
+        ]
+        if faltantes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Faltan datos obligatorios: {', '.join(faltantes)}",
+            )
+        self._validar_campos(data)
+
+        punto = self.punto_repo.create_punto(data)
+        eventos.publicar("puntos_reciclaje", "INSERT", punto["id"])
+        return punto
 
-        # Obtener materiales que acepta
-        materiales = self.material_repo.get_materiales_por_punto(punto_id)
+    def update_punto(self, punto_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Actualizar un punto; los campos a None no se modifican"""
+        campos = {k: v for k, v in data.items() if v is not None}
+        if not campos:
+            raise HTTPException(
+                status_code=400, detail="No se proporcionaron datos para actualizar"
+            )
+        self._validar_campos(campos)
+
+        punto = self.punto_repo.update_punto(punto_id, campos)
+        if punto is None:
+            raise HTTPException(
+                status_code=404, detail="Punto de reciclaje no encontrado"
+            )
+        eventos.publicar("puntos_reciclaje", "UPDATE", punto_id)
+        return punto
 
+    def delete_punto(self, punto_id: int) -> Dict[str, Any]:
+        """Eliminar un punto y sus relaciones con materiales"""
+        punto = self.punto_repo.delete_punto(punto_id)
+        if punto is None:
+            raise HTTPException(
+                status_code=404, detail="Punto de reciclaje no encontrado"
+            )
+        eventos.publicar("puntos_reciclaje", "DELETE", punto_id)
         return {
+            "message": "Punto de reciclaje eliminado exitosamente",
             "punto_reciclaje": punto,
+        }
+
+    def reemplazar_materiales(
+        self, punto_id: int, items: List[Union[int, Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Reemplazar el conjunto de materiales que acepta un punto.
+
+        Cada elemento es un ID de material o un objeto con material_id y,
+        opcionalmente, acepta, observaciones, cantidad_maxima y horario_especial.
+        """
+        materiales: Dict[int, Dict[str, Any]] = {}
+        for indice, item in enumerate(items):
+            if isinstance(item, int) and not isinstance(item, bool):
+                item = {"material_id": item}
+            if (
+                not isinstance(item, dict)
+                or not isinstance(item.get("material_id"), int)
+                or isinstance(item["material_id"], bool)
+            ):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Elemento {indice}: se esperaba un ID de material o un objeto con 'material_id' entero",
+                )
+            no_permitidos = sorted(set(item) - set(COLUMNAS_PUNTO_MATERIAL))
+            if no_permitidos:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Elemento {indice}: campos no permitidos: {', '.join(no_permitidos)}",
+                )
+            mal_tipados = sorted(
+                c
+                for c, v in item.items()
+                if c != "material_id"
+                and v is not None
+                and not isinstance(v, _TIPOS_PUNTO_MATERIAL[COLUMNAS_PUNTO_MATERIAL[c]])
+            )
+            if mal_tipados:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Elemento {indice}: tipo no válido en: {', '.join(mal_tipados)}",
+                )
+            if item["material_id"] in materiales:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Elemento {indice}: material {item['material_id']} repetido",
+                )
+            materiales[item["material_id"]] = {
+                **item,
+                "acepta": True if item.get("acepta") is None else item["acepta"],
+            }
+
+        resultado = self.punto_repo.reemplazar_materiales_punto(
+            punto_id, list(materiales.values())
+        )
+        if resultado is None:
+            raise HTTPException(
+                status_code=404, detail="Punto de reciclaje no encontrado"
+            )
+        if resultado["insertados"] or resultado["actualizados"] or resultado["eliminados"]:
+            # Las cachés e índices tratan el ID de punto_materiales como el del punto
+            eventos.publicar("punto_materiales", "UPDATE", punto_id)
+        return {
+            "punto_reciclaje_id": punto_id,
             "total_materiales": len(materiales),
-            "materiales_aceptados": materiales,
+            **resultado,
         }
+
+    def _validar_campos(self, data: Dict[str, Any]) -> None:
+        no_permitidos = sorted(set(data) - set(COLUMNAS_ESCRIBIBLES))
+        if no_permitidos:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Campos no permitidos: {', '.join(no_permitidos)}",
+            )
+        for campo, limite in (("latitud", 90), ("longitud", 180)):
+            valor = data.get(campo)
+            if valor is None:
+                continue
+            if (
+                isinstance(valor, bool)
+                or not isinstance(valor, (int, float))
+                or not -limite <= valor <= limite
+            ):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"'{campo}' debe ser un número entre {-limite} y {limite}",
+                )
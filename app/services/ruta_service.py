@@ -0,0 +1,155 @@
+from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
+from app.indices.punto_material import indice_punto_material
+from app.config.settings import settings
+from app.core.geo import distancias_desde_km, matriz_distancias_km
+from typing import List, Dict, Any
+import numpy as np
+from app.core.trazas import trazar
+
+CAMPOS_RUTA = [
+    "id", "nombre", "direccion", "ciudad", "latitud", "longitud",
+    "tipo_instalacion", "horario_apertura", "horario_cierre",
+]
+
+# Desvío mínimo en el coste de una parada: evita dividir por cero con puntos
+# en el mismo lugar que el origen o que una parada ya elegida
+DESVIO_MINIMO_KM = 0.1
+
+
+@trazar("servicio")
+class RutaService:
+    def __init__(self):
+        self.punto_repo = PuntoReciclajeRepository()
+
+    def planificar(
+        self, lat: float, lng: float, materiales: List[int]
+    ) -> Dict[str, Any]:
+        """Elegir pocos puntos activos que juntos acepten todos los materiales
+        y ordenarlos como un recorrido corto que parte de (lat, lng)"""
+        materiales = list(dict.fromkeys(materiales))
+        # Solo los puntos más cercanos de cada material son candidatos: se
+        # piden tantos como haya (según el índice), hasta el máximo configurado
+        objetivo = {
+            m: min(settings.ruta_candidatos_por_material, indice_punto_material.contar(m))
+            for m in materiales
+        }
+        puntos = self.punto_repo.get_candidatos_ruta(lat, lng, objetivo, CAMPOS_RUTA)
+
+        # cobertura[i, j]: el punto i acepta el material j
+        cobertura = np.zeros((len(puntos), len(materiales)), dtype=bool)
+        for i, punto in enumerate(puntos):
+            aceptados = indice_punto_material.get_materiales_de_punto(punto["id"])
+            cobertura[i] = [m in aceptados for m in materiales]
+
+        latitudes = np.array([float(p["latitud"]) for p in puntos])
+        longitudes = np.array([float(p["longitud"]) for p in puntos])
+        elegidos = self._cubrir(cobertura, lat, lng, latitudes, longitudes)
+
+        # Nodo 0 = origen; nodo i + 1 = puntos[elegidos[i]]
+        distancias = matriz_distancias_km(
+            np.concatenate(([lat], latitudes[elegidos])),
+            np.concatenate(([lng], longitudes[elegidos])),
+        )
+        recorrido = self._ordenar(distancias, list(range(1, len(elegidos) + 1)))
+
+        paradas, asignados, anterior, total = [], set(), 0, 0.0
+        for nodo in recorrido:
+            i = elegidos[nodo - 1]
+            # Cada material se entrega en la primera parada que lo acepta
+            entrega = [
+                m
+                for j, m in enumerate(materiales)
+                if cobertura[i, j] and m not in asignados
+            ]
+            asignados.update(entrega)
+            tramo = float(distancias[anterior, nodo])
+            total += tramo
+            paradas.append(
+                {
+                    "orden": len(paradas) + 1,
+                    "distancia_desde_anterior_km": round(tramo, 3),
+                    "materiales": entrega,
+                    "punto_reciclaje": puntos[i],
+                }
+            )
+            anterior = nodo
+
+        return {
+            "origen": {"latitud": lat, "longitud": lng},
+            "materiales": materiales,
+            "no_cubiertos": [m for m in materiales if m not in asignados],
+            "total_paradas": len(paradas),
+            "distancia_total_km": round(total, 3),
+            "paradas": paradas,
+        }
+
+    def _cubrir(
+        self,
+        cobertura: np.ndarray,
+        lat: float,
+        lng: float,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+    ) -> List[int]:
+        """Cobertura de conjuntos voraz ponderada por coste: en cada paso el
+        punto con más materiales pendientes por km de desvío, medido como la
+        distancia al nodo ya elegido (origen o parada) más cercano"""
+        desvio = distancias_desde_km(lat, lng, latitudes, longitudes)
+        pendientes = cobertura.any(axis=0)
+        elegidos: List[int] = []
+        while pendientes.any():
+            ganancia = cobertura[:, pendientes].sum(axis=1)
+            rendimiento = np.where(
+                ganancia > 0, ganancia / (desvio + DESVIO_MINIMO_KM), -1.0
+            )
+            mejor = int(np.argmax(rendimiento))
+            elegidos.append(mejor)
+            pendientes &= ~cobertura[mejor]
+            desvio = np.minimum(
+                desvio,
+                distancias_desde_km(
+                    latitudes[mejor], longitudes[mejor], latitudes, longitudes
+                ),
+            )
+
+        # Quitar paradas que quedaron cubiertas por las elegidas después
+        cubiertos = cobertura[elegidos].any(axis=0)
+        for i in reversed(list(elegidos)):
+            resto = [j for j in elegidos if j != i]
+            if resto and np.array_equal(cobertura[resto].any(axis=0), cubiertos):
+                elegidos.remove(i)
+        return elegidos
+
+    def _ordenar(self, distancias: np.ndarray, nodos: List[int]) -> List[int]:
+        """Recorrido abierto desde el nodo 0: vecino más cercano y mejora 2-opt"""
+        ruta = [0]
+        restantes = np.array(nodos, dtype=int)
+        while restantes.size:
+            k = int(np.argmin(distancias[ruta[-1], restantes]))
+            ruta.append(int(restantes[k]))
+            restantes = np.delete(restantes, k)
+
+        ruta = np.array(ruta, dtype=int)
+        n = len(ruta)
+        mejora = True
+        while mejora:
+            mejora = False
+            for i in range(1, n - 1):
+                # Invertir ruta[i..j] para cada j > i a la vez
+                a, b = ruta[i - 1], ruta[i]
+                j = np.arange(i + 1, n)
+                c = ruta[j]
+                tiene_siguiente = j + 1 < n
+                siguiente = ruta[np.minimum(j + 1, n - 1)]
+                antes = distancias[a, b] + np.where(
+                    tiene_siguiente, distancias[c, siguiente], 0.0
+                )
+                despues = distancias[a, c] + np.where(
+                    tiene_siguiente, distancias[b, siguiente], 0.0
+                )
+                delta = despues - antes
+                k = int(np.argmin(delta))
+                if delta[k] < -1e-9:
+                    ruta[i : j[k] + 1] = ruta[i : j[k] + 1][::-1].copy()
+                    mejora = True
+        return [int(nodo) for nodo in ruta[1:]]
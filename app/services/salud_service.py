@@ -0,0 +1,61 @@
+from app.config.database import get_db_connection, get_pool
+from app.config.settings import settings
+from app.core import calentamiento
+from app.repositories.categoria_repository import CategoriaRepository
+from app.repositories.material_repository import MaterialRepository
+from app.repositories.punto_reciclaje_repository import PuntoReciclajeRepository
+from typing import Dict, Any, Tuple
+from app.core.trazas import trazar
+
+
+def _abrir_pool() -> None:
+    """Abrir las db_pool_min conexiones iniciales"""
+    get_pool()
+
+
+def _ejecutar_consultas_frecuentes() -> None:
+    """Ejecutar una vez las consultas de las rutas más usadas"""
+    CategoriaRepository().get_all_categorias()
+    MaterialRepository().get_materiales()
+    puntos = PuntoReciclajeRepository().get_puntos_reciclaje()
+    if puntos:
+        PuntoReciclajeRepository().get_puntos_cercanos(
+            float(puntos[0]["latitud"]),
+            float(puntos[0]["longitud"]),
+            settings.default_search_radius,
+        )
+
+
+calentamiento.registrar("pool_conexiones", _abrir_pool, orden=0)
+calentamiento.registrar("consultas_frecuentes", _ejecutar_consultas_frecuentes, orden=10)
+
+
+@trazar("servicio")
+class SaludService:
+    def get_vivo(self) -> Dict[str, Any]:
+        """El proceso responde; no consulta dependencias"""
+        return {"estado": "vivo"}
+
+    def get_preparado(self) -> Tuple[bool, Dict[str, Any]]:
+        """Comprobar que el precalentamiento terminó y que la base responde"""
+        if calentamiento.hay_errores():
+            # Reintentar lo que falló (p. ej. la base no estaba lista al arrancar)
+            calentamiento.calentar_en_segundo_plano()
+        componentes = calentamiento.get_estado()
+        base_datos = self._comprobar_base_datos()
+        preparado = calentamiento.listo() and base_datos["estado"] == "ok"
+
+        return preparado, {
+            "estado": "preparado" if preparado else "no_preparado",
+            "base_datos": base_datos,
+            "componentes": componentes,
+        }
+
+    def _comprobar_base_datos(self) -> Dict[str, Any]:
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1;")
+            return {"estado": "ok", "pool": get_pool().get_estado()}
+        except Exception as e:
+            return {"estado": "error", "detalle": str(e)}
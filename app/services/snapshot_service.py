@@ -0,0 +1,369 @@
+from app.services.sync_service import SyncService
+from app.config.settings import settings
+from app.core import calentamiento, eventos
+from app.core.memoria_compartida import SegmentoCompartido
+from fastapi import HTTPException
+from typing import List, Dict, Any, Optional, Tuple, Union
+from datetime import datetime, time
+from decimal import Decimal
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time as time_module
+from app.core.trazas import trazar
+
+logger = logging.getLogger(__name__)
+
+FORMATO_SNAPSHOT = 1
+
+# Columnas publicadas por tabla, en el orden del snapshot
+COLUMNAS_SNAPSHOT = {
+    "categorias": [
+        "id", "nombre", "descripcion", "codigo", "color_identificacion", "icono",
+        "orden_display", "activo",
+    ],
+    "materiales": [
+        "id", "nombre", "categoria_id", "codigo", "descripcion",
+        "preparacion_requerida", "beneficio_ambiental", "es_peligroso",
+        "requiere_manejo_especial", "ejemplos", "materiales_no_aceptados", "activo",
+    ],
+    "puntos_reciclaje": [
+        "id", "nombre", "descripcion", "direccion", "ciudad", "provincia",
+        "latitud", "longitud", "tipo_instalacion", "horario_apertura",
+        "horario_cierre", "dias_servicio", "telefono", "email", "sitio_web",
+        "instrucciones_acceso", "foto_url",
+    ],
+    "punto_materiales": [
+        "punto_reciclaje_id", "material_id", "observaciones", "cantidad_maxima",
+        "horario_especial",
+    ],
+}
+
+
+class SnapshotCatalogo:
+    """Modelo de lectura completo en memoria, codificado como un único archivo.
+
+    Se carga una vez con una sincronización completa y, tras cada escritura,
+    se pone al día aplicando solo el delta de GET /sync antes de recodificar.
+
+    Con un segmento compartido, un solo proceso (el que tiene el flock del
+    segmento) mantiene el modelo, lo regenera ante los eventos y publica el
+    archivo; el resto no carga las tablas y sirve la copia mapeada, que
+    vuelve a mapear en cuanto el publicador la sustituye. Las escrituras de
+    otros procesos le llegan por LISTEN/NOTIFY (escucha_cambios_habilitada).
+    Si el publicador muere, el primer proceso que reciba un evento o no
+    encuentre el archivo toma el relevo.
+    """
+
+    def __init__(self, segmento: Optional[SegmentoCompartido] = None):
+        self._segmento = segmento
+        self._lock = threading.Lock()
+        self._tablas: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._desde: Optional[datetime] = None
+        self._obsoleto = True
+        # (datos, versión) en una sola referencia: quien la lee sin el lock
+        # nunca empareja los datos de un snapshot con la versión de otro.
+        # Con segmento solo se usa si no se pudo escribir en él
+        self._publicado: Optional[Tuple[bytes, str]] = None
+        self._version: Optional[str] = None
+        self._refresco_pendiente = False
+        # Hilo que vigila que el archivo publicado siga existiendo y PID del
+        # proceso en el que corre (tras un fork el hilo no existe en el hijo)
+        self._vigilante: Optional[threading.Thread] = None
+        self._vigilante_pid: Optional[int] = None
+        self._fin_vigilancia = threading.Event()
+
+    def marcar_obsoleto(self, *_evento) -> None:
+        if self._segmento is not None and not self._tomar_publicador():
+            # Otro proceso regenera y publica; este solo vuelve a mapear el archivo
+            return
+        self._obsoleto = True
+        if (
+            self._version is not None or self._segmento is not None
+        ) and not self._refresco_pendiente:
+            # Regenerar en segundo plano para que el primer lector no espere;
+            # una ráfaga de eventos (p. ej. un lote) comparte un solo hilo
+            self._refresco_pendiente = True
+            threading.Thread(target=self._refrescar, daemon=True).start()
+
+    def _refrescar(self) -> None:
+        self._refresco_pendiente = False
+        try:
+            self.obtener()
+        except Exception:
+            logger.exception("Error regenerando el snapshot del catálogo")
+
+    def obtener(self) -> Tuple[Union[bytes, memoryview], str]:
+        """Devolver (datos, versión), regenerando el snapshot si hubo cambios"""
+        if self._segmento is None:
+            if self._obsoleto or self._version is None:
+                with self._lock:
+                    if self._obsoleto or self._version is None:
+                        self._poner_al_dia()
+            return self._publicado
+
+        publicado = self._segmento.leer()
+        if self._obsoleto or publicado is None:
+            if self._tomar_publicador():
+                publicado = self._publicar()
+            elif publicado is None:
+                publicado = self._esperar_publicacion()
+        version, datos = publicado
+        return datos, version
+
+    def ceder(self) -> None:
+        """Dejar de publicar y soltar el modelo (el maestro de gunicorn antes
+        del fork); el primer worker que lo necesite toma el relevo"""
+        if self._segmento is None:
+            return
+        # Parar el vigilante antes de un fork: un hilo con un lock tomado
+        # dejaría ese lock bloqueado para siempre en los hijos
+        self._fin_vigilancia.set()
+        if self._vigilante is not None and self._vigilante_pid == os.getpid():
+            self._vigilante.join()
+        with self._lock:
+            self._segmento.ceder()
+            self._tablas = {}
+            self._desde = None
+            self._version = None
+            self._publicado = None
+            self._obsoleto = True
+            self._vigilante = None
+            self._vigilante_pid = None
+
+    def get_info(self) -> Dict[str, Any]:
+        datos, version = self.obtener()
+        return {
+            "formato": FORMATO_SNAPSHOT,
+            "version": version,
+            "tamano_bytes": len(datos),
+        }
+
+    def _tomar_publicador(self) -> bool:
+        if not self._segmento.tomar_publicador():
+            return False
+        if self._vigilante_pid != os.getpid():
+            self._vigilante_pid = os.getpid()
+            self._fin_vigilancia = threading.Event()
+            self._vigilante = threading.Thread(target=self._vigilar, daemon=True)
+            self._vigilante.start()
+        return True
+
+    def _vigilar(self) -> None:
+        """Volver a publicar si el archivo compartido desaparece (limpieza de
+        /dev/shm, reinicio del tmpfs) mientras este proceso es el publicador"""
+        fin = self._fin_vigilancia
+        while not fin.wait(settings.snapshot_vigilancia_segundos):
+            if not self._segmento.es_publicador():
+                return
+            try:
+                if self._segmento.leer() is None:
+                    self._publicar()
+            except Exception:
+                logger.exception("Error volviendo a publicar el snapshot")
+
+    def _publicar(self) -> Tuple[str, Union[bytes, memoryview]]:
+        """Solo el publicador: poner el modelo al día y escribir el archivo si
+        cambió o desapareció"""
+        with self._lock:
+            publicado = self._segmento.leer()
+            if self._obsoleto or publicado is None:
+                self._poner_al_dia(forzar=publicado is None)
+                publicado = self._segmento.leer()
+            if publicado is None:
+                # No se pudo escribir en el segmento: servir la copia local
+                datos, version = self._publicado
+                publicado = (version, datos)
+            return publicado
+
+    def _poner_al_dia(self, forzar: bool = False) -> None:
+        # Se limpia antes de consultar para no perder escrituras concurrentes
+        self._obsoleto = False
+        try:
+            self._actualizar(forzar)
+        except Exception:
+            self._obsoleto = True
+            raise
+
+    def _esperar_publicacion(self) -> Tuple[str, memoryview]:
+        """Otro proceso es el publicador pero aún no hay archivo (arranque o
+        limpieza del directorio): esperarlo, o tomar el relevo si muere"""
+        limite = time_module.monotonic() + settings.snapshot_espera_segundos
+        while time_module.monotonic() < limite:
+            time_module.sleep(0.05)
+            publicado = self._segmento.leer()
+            if publicado is not None:
+                return publicado
+            if self._tomar_publicador():
+                return self._publicar()
+        raise HTTPException(
+            status_code=503, detail="El snapshot del catálogo aún no está disponible"
+        )
+
+    def _actualizar(self, forzar: bool = False) -> None:
+        cambios, nuevo_desde = SyncService().get_cambios_desde(self._desde)
+        if self._desde is None:
+            self._tablas = {tabla: {} for tabla in COLUMNAS_SNAPSHOT}
+
+        for tabla, filas in self._tablas.items():
+            for row in cambios[tabla]["actualizados"]:
+                filas[row["id"]] = dict(row)
+            for registro_id in cambios[tabla]["eliminados"]:
+                filas.pop(registro_id, None)
+
+        self._desde = nuevo_desde
+        datos = self._codificar()
+        version = hashlib.sha1(datos).hexdigest()[:16]
+        if version == self._version and not forzar:
+            return
+        self._version = version
+        self._publicado = (datos, version)
+        if self._segmento is not None:
+            try:
+                self._segmento.publicar(version, datos)
+                # La copia local no se conserva: se sirve la del segmento
+                self._publicado = None
+            except OSError:
+                logger.exception("No se pudo publicar el snapshot; se sirve la copia local")
+
+    def _filas_publicadas(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Publicar solo lo visible para los clientes: puntos con estado
+        'activo', categorías activas, materiales activos de una categoría
+        activa y las relaciones que aceptan uno de esos materiales en uno de
+        esos puntos (los filtros de vista_puntos_por_material, más el de
+        categorías para que ningún material apunte a una que no se publica)"""
+        categorias_activas = {
+            c_id for c_id, c in self._tablas["categorias"].items() if c["activo"]
+        }
+        materiales_activos = {
+            m_id
+            for m_id, m in self._tablas["materiales"].items()
+            if m["activo"] and m["categoria_id"] in categorias_activas
+        }
+        puntos_activos = {
+            p_id
+            for p_id, p in self._tablas["puntos_reciclaje"].items()
+            if p["estado"] == "activo"
+        }
+        return {
+            "categorias": sorted(
+                (
+                    c
+                    for c in self._tablas["categorias"].values()
+                    if c["id"] in categorias_activas
+                ),
+                key=lambda c: (c["orden_display"] or 0, c["id"]),
+            ),
+            "materiales": [
+                m
+                for _, m in sorted(self._tablas["materiales"].items())
+                if m["id"] in materiales_activos
+            ],
+            "puntos_reciclaje": [
+                p
+                for _, p in sorted(self._tablas["puntos_reciclaje"].items())
+                if p["id"] in puntos_activos
+            ],
+            "punto_materiales": [
+                pm
+                for _, pm in sorted(self._tablas["punto_materiales"].items())
+                if pm["acepta"]
+                and pm["punto_reciclaje_id"] in puntos_activos
+                and pm["material_id"] in materiales_activos
+            ],
+        }
+
+    def _codificar(self) -> bytes:
+        """Formato columnar: una lista por columna y las cadenas internadas.
+
+        Cada valor de texto se sustituye por su índice en "cadenas", de modo
+        que nombres de ciudad, horarios o tipos repetidos se guardan una vez.
+        """
+        cadenas: List[str] = []
+        indices: Dict[str, int] = {}
+
+        def internar(valor: Any) -> Any:
+            if valor is None:
+                return None
+            if isinstance(valor, time):
+                valor = valor.isoformat()
+            elif isinstance(valor, Decimal):
+                return float(valor)
+            if isinstance(valor, str):
+                indice = indices.get(valor)
+                if indice is None:
+                    indice = indices[valor] = len(cadenas)
+                    cadenas.append(valor)
+                return indice
+            return valor
+
+        tablas = {}
+        for tabla, filas in self._filas_publicadas().items():
+            columnas = COLUMNAS_SNAPSHOT[tabla]
+            tablas[tabla] = {
+                "filas": len(filas),
+                "columnas": {
+                    columna: [internar(fila.get(columna)) for fila in filas]
+                    for columna in columnas
+                },
+            }
+
+        contenido = json.dumps(
+            {"formato": FORMATO_SNAPSHOT, "cadenas": cadenas, "tablas": tablas},
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode()
+        # mtime=0 para que el mismo contenido produzca los mismos bytes
+        return gzip.compress(contenido, compresslevel=9, mtime=0)
+
+
+snapshot_catalogo = SnapshotCatalogo(
+    SegmentoCompartido(settings.memoria_compartida_dir, "snapshot_catalogo")
+    if settings.memoria_compartida_dir
+    else None
+)
+eventos.suscribir(eventos.TODAS, snapshot_catalogo.marcar_obsoleto)
+calentamiento.registrar("snapshot_catalogo", snapshot_catalogo.obtener)
+
+
+@trazar("servicio")
+class SnapshotService:
+    def __init__(self):
+        self.snapshot = snapshot_catalogo
+
+    def get_info(self) -> Dict[str, Any]:
+        """Obtener versión y tamaño del snapshot actual"""
+        return self.snapshot.get_info()
+
+    def get_snapshot(self) -> Tuple[Union[bytes, memoryview], str]:
+        """Obtener el snapshot completo y su versión"""
+        return self.snapshot.obtener()
+
+    def get_rango(self, rango: str, tamano: int) -> Tuple[int, int]:
+        """Interpretar una cabecera Range de un solo intervalo en bytes"""
+        unidad, _, valor = rango.partition("=")
+        if unidad.strip() != "bytes" or "," in valor:
+            raise HTTPException(status_code=416, detail="Rango no soportado")
+        inicio_txt, _, fin_txt = valor.strip().partition("-")
+        try:
+            if inicio_txt:
+                inicio = int(inicio_txt)
+                fin = int(fin_txt) if fin_txt else tamano - 1
+            else:
+                # bytes=-N: los últimos N bytes
+                inicio = max(tamano - int(fin_txt), 0)
+                fin = tamano - 1
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Rango inválido")
+
+        fin = min(fin, tamano - 1)
+        if inicio > fin or inicio >= tamano:
+            raise HTTPException(
+                status_code=416,
+                detail="Rango fuera del snapshot",
+                headers={"Content-Range": f"bytes */{tamano}"},
+            )
+        return inicio, fin
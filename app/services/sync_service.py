@@ -0,0 +1,49 @@
+from app.repositories.sync_repository import SyncRepository
+from app.config.settings import settings
+from fastapi import HTTPException
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+import base64
+from app.core.trazas import trazar
+
+
+@trazar("servicio")
+class SyncService:
+    def __init__(self):
+        self.sync_repo = SyncRepository()
+
+    def get_cambios(self, token: Optional[str] = None) -> Dict[str, Any]:
+        """Obtener los cambios desde el token indicado (o todo si no hay token)"""
+        desde = self._decodificar_token(token) if token else None
+        cambios, nuevo_desde = self.get_cambios_desde(desde)
+
+        return {
+            "token": self._codificar_token(nuevo_desde),
+            "completo": desde is None,
+            **cambios,
+        }
+
+    def get_cambios_desde(
+        self, desde: Optional[datetime] = None
+    ) -> Tuple[Dict[str, Any], datetime]:
+        """Obtener los cambios desde una fecha y la fecha para la siguiente consulta"""
+        cambios = self.sync_repo.get_cambios(desde)
+
+        # "ahora" ya retrocede hasta la transacción escritora abierta más
+        # antigua; el margen cubre además las que empezaron justo al tomar la
+        # foto. Los registros repetidos son inofensivos: el cliente los sobrescribe
+        ahora = cambios.pop("ahora")
+        nuevo_desde = ahora - timedelta(seconds=settings.sync_margen_segundos)
+        if desde is not None and nuevo_desde < desde:
+            nuevo_desde = desde
+
+        return cambios, nuevo_desde
+
+    def _codificar_token(self, desde: datetime) -> str:
+        return base64.urlsafe_b64encode(desde.isoformat().encode()).decode()
+
+    def _decodificar_token(self, token: str) -> datetime:
+        try:
+            return datetime.fromisoformat(base64.urlsafe_b64decode(token).decode())
+        except Exception:
+            raise HTTPException(status_code=400, detail="Token de sincronización inválido")
@@ -4,6 +4,8 @@
 -- ============================================================================
 
 -- Eliminar tablas y tipos si existen (para recrear limpiamente)
+DROP TABLE IF EXISTS registros_eliminados CASCADE;
+DROP TABLE IF EXISTS regiones_ciudad CASCADE;
 DROP TABLE IF EXISTS punto_materiales CASCADE;
 DROP TABLE IF EXISTS materiales CASCADE;
 DROP TABLE IF EXISTS puntos_reciclaje CASCADE;
@@ -31,6 +33,43 @@ CREATE TYPE estado_punto_enum AS ENUM (
     'temporalmente_cerrado'
 );
 
+-- ============================================================================
+-- REGIONES GEOGRÁFICAS (PARTICIONADO)
+-- puntos_reciclaje y punto_materiales se particionan por región: la celda de
+-- 1° x 1° que contiene el punto, numerada fila (latitud) a fila. Cada
+-- partición agrupa una franja de latitud completa, así que una consulta que
+-- filtra por las celdas de una caja o de una ciudad solo lee sus franjas.
+-- La API calcula la misma celda en app/core/geo.py (region_de).
+-- ============================================================================
+CREATE OR REPLACE FUNCTION region_de(lat NUMERIC, lng NUMERIC)
+RETURNS INTEGER AS $$
+    SELECT (LEAST(floor(lat), 89)::INTEGER + 90) * 360 + (LEAST(floor(lng), 179)::INTEGER + 180);
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+-- Crea una partición por cada franja de `paso` grados de latitud entre
+-- lat_min y lat_max, más la partición por defecto para el resto del globo
+CREATE OR REPLACE FUNCTION crear_particiones_region(
+    tabla TEXT, lat_min INTEGER, lat_max INTEGER, paso INTEGER DEFAULT 4
+)
+RETURNS VOID AS $$
+DECLARE
+    lat INTEGER;
+BEGIN
+    lat := lat_min;
+    WHILE lat < lat_max LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+            format('%s_lat_%s', tabla, replace(lat::TEXT, '-', 'm')),
+            tabla,
+            (lat + 90) * 360,
+            (LEAST(lat + paso, lat_max) + 90) * 360
+        );
+        lat := lat + paso;
+    END LOOP;
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', tabla || '_otras', tabla);
+END;
+$$ LANGUAGE plpgsql;
+
 -- ============================================================================
 -- TABLA: categorias
 -- Almacena las categorías principales de materiales reciclables
@@ -74,7 +113,7 @@ CREATE TABLE materiales (
 -- Almacena información de centros de acopio y puntos de reciclaje
 -- ============================================================================
 CREATE TABLE puntos_reciclaje (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     nombre VARCHAR(100) NOT NULL,
     descripcion TEXT,
     direccion VARCHAR(200) NOT NULL,
@@ -95,25 +134,66 @@ CREATE TABLE puntos_reciclaje (
     foto_url VARCHAR(500), -- URL de foto del punto
     estado estado_punto_enum DEFAULT 'activo',
     fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    region INTEGER NOT NULL, -- region_de(latitud, longitud), clave de partición
+
+    -- La clave primaria de una tabla particionada debe incluir la clave de partición
+    PRIMARY KEY (id, region),
+    CONSTRAINT puntos_reciclaje_region_check CHECK (region = region_de(latitud, longitud))
+) PARTITION BY RANGE (region);
+
+-- Franjas desde Tierra del Fuego hasta el norte de Colombia y Venezuela
+SELECT crear_particiones_region('puntos_reciclaje', -56, 16);
 
 -- ============================================================================
 -- TABLA: punto_materiales (RELACIÓN MUCHOS A MUCHOS)
 -- Conecta qué materiales acepta cada punto de reciclaje
 -- ============================================================================
 CREATE TABLE punto_materiales (
-    id SERIAL PRIMARY KEY,
-    punto_reciclaje_id INTEGER NOT NULL REFERENCES puntos_reciclaje(id) ON DELETE CASCADE,
+    id SERIAL,
+    punto_reciclaje_id INTEGER NOT NULL,
+    region INTEGER NOT NULL, -- la del punto: cada relación vive en la partición de su punto
     material_id INTEGER NOT NULL REFERENCES materiales(id) ON DELETE CASCADE,
     acepta BOOLEAN DEFAULT TRUE,
     observaciones TEXT, -- Condiciones especiales para este material en este punto
     cantidad_maxima VARCHAR(50), -- Límite de cantidad si aplica
     horario_especial VARCHAR(100), -- Si tiene horario diferente para este material
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
-    -- Evitar duplicados
-    UNIQUE(punto_reciclaje_id, material_id)
+    PRIMARY KEY (id, region),
+    -- Si el punto cambia de región, sus relaciones lo siguen
+    FOREIGN KEY (punto_reciclaje_id, region) REFERENCES puntos_reciclaje(id, region)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+
+    -- Evitar duplicados (la región depende del punto, así que equivale a
+    -- la unicidad por punto y material)
+    UNIQUE(punto_reciclaje_id, material_id, region)
+) PARTITION BY RANGE (region);
+
+SELECT crear_particiones_region('punto_materiales', -56, 16);
+
+-- ============================================================================
+-- TABLA: regiones_ciudad
+-- Regiones en las que hay puntos de cada ciudad, para que el filtro por
+-- ciudad pueda descartar particiones. Se mantiene por trigger; una entrada
+-- que quedó sin puntos solo hace leer una partición de más.
+-- ============================================================================
+CREATE TABLE regiones_ciudad (
+    ciudad VARCHAR(50) NOT NULL,
+    region INTEGER NOT NULL,
+    PRIMARY KEY (ciudad, region)
+);
+
+-- ============================================================================
+-- TABLA: registros_eliminados
+-- Marcas de borrado (tombstones) para la sincronización incremental
+-- ============================================================================
+CREATE TABLE registros_eliminados (
+    id SERIAL PRIMARY KEY,
+    tabla VARCHAR(30) NOT NULL,
+    registro_id INTEGER NOT NULL,
+    eliminado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- ============================================================================
@@ -126,10 +206,18 @@ CREATE INDEX idx_puntos_ciudad ON puntos_reciclaje(ciudad);
 CREATE INDEX idx_puntos_coordenadas ON puntos_reciclaje(latitud, longitud);
 CREATE INDEX idx_puntos_tipo ON puntos_reciclaje(tipo_instalacion);
 CREATE INDEX idx_puntos_estado ON puntos_reciclaje(estado);
+CREATE INDEX idx_puntos_region ON puntos_reciclaje(region);
 CREATE INDEX idx_punto_materiales_punto ON punto_materiales(punto_reciclaje_id);
 CREATE INDEX idx_punto_materiales_material ON punto_materiales(material_id);
 CREATE INDEX idx_categorias_activo ON categorias(activo);
 
+-- Índices para la sincronización incremental (GET /sync)
+CREATE INDEX idx_categorias_updated_at ON categorias(updated_at);
+CREATE INDEX idx_materiales_updated_at ON materiales(updated_at);
+CREATE INDEX idx_puntos_fecha_actualizacion ON puntos_reciclaje(fecha_actualizacion);
+CREATE INDEX idx_punto_materiales_updated_at ON punto_materiales(updated_at);
+CREATE INDEX idx_registros_eliminados_fecha ON registros_eliminados(eliminado_en);
+
 -- ============================================================================
 -- TRIGGERS PARA ACTUALIZACIÓN AUTOMÁTICA DE TIMESTAMPS
 -- ============================================================================
@@ -149,10 +237,190 @@ CREATE TRIGGER update_materiales_updated_at
     BEFORE UPDATE ON materiales 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- puntos_reciclaje usa fecha_actualizacion en lugar de updated_at
+CREATE OR REPLACE FUNCTION update_fecha_actualizacion_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.fecha_actualizacion = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
 CREATE TRIGGER update_puntos_updated_at 
     BEFORE UPDATE ON puntos_reciclaje 
+    FOR EACH ROW EXECUTE FUNCTION update_fecha_actualizacion_column();
+
+CREATE TRIGGER update_punto_materiales_updated_at 
+    BEFORE UPDATE ON punto_materiales 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- ============================================================================
+-- TRIGGERS PARA REGISTRAR ELIMINACIONES (TOMBSTONES)
+-- Incluye los borrados en cascada (p. ej. materiales de una categoría).
+-- En las tablas particionadas el trigger se ejecuta en cada partición, así
+-- que el nombre de la tabla llega como argumento; y una fila que cambia de
+-- región se borra de una partición y se inserta en otra, lo que no es una
+-- eliminación.
+-- ============================================================================
+CREATE OR REPLACE FUNCTION registrar_eliminacion()
+RETURNS TRIGGER AS $$
+DECLARE
+    tabla TEXT := COALESCE(TG_ARGV[0], TG_TABLE_NAME);
+    sigue BOOLEAN;
+BEGIN
+    IF TG_ARGV[0] IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE id = $1)', tabla)
+            INTO sigue USING OLD.id;
+        IF sigue THEN
+            RETURN OLD;
+        END IF;
+    END IF;
+    INSERT INTO registros_eliminados (tabla, registro_id) VALUES (tabla, OLD.id);
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER registrar_eliminacion_categorias 
+    AFTER DELETE ON categorias 
+    FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion();
+
+CREATE TRIGGER registrar_eliminacion_materiales 
+    AFTER DELETE ON materiales 
+    FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion();
+
+CREATE TRIGGER registrar_eliminacion_puntos 
+    AFTER DELETE ON puntos_reciclaje 
+    FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion('puntos_reciclaje');
+
+CREATE TRIGGER registrar_eliminacion_punto_materiales 
+    AFTER DELETE ON punto_materiales 
+    FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion('punto_materiales');
+
+-- ============================================================================
+-- TRIGGERS DE NOTIFICACIÓN DE CAMBIOS (LISTEN/NOTIFY)
+-- Cada proceso de la API escucha el canal 'ecoandino_cambios' e invalida sus
+-- cachés e índices en memoria, también ante cambios hechos por SQL directo
+-- o cargas masivas. Los triggers son por sentencia: cada INSERT, UPDATE o
+-- DELETE envía un solo aviso con los ids distintos que tocó (en
+-- punto_materiales, los de sus puntos). Con más de 500 ids el aviso lleva
+-- ids null y los procesos reconstruyen en lugar de actualizar id a id.
+-- Las tablas particionadas pasan su nombre como argumento del trigger.
+-- ============================================================================
+CREATE OR REPLACE FUNCTION notificar_cambio()
+RETURNS TRIGGER AS $$
+DECLARE
+    columna TEXT := 'id';
+    filas TEXT;
+    ids INTEGER[];
+BEGIN
+    IF COALESCE(TG_ARGV[0], TG_TABLE_NAME) = 'punto_materiales' THEN
+        columna := 'punto_reciclaje_id';
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        filas := format('SELECT %I FROM filas_nuevas', columna);
+    ELSIF TG_OP = 'DELETE' THEN
+        filas := format('SELECT %I FROM filas_viejas', columna);
+    ELSE
+        filas := format(
+            'SELECT %1$I FROM filas_nuevas UNION SELECT %1$I FROM filas_viejas', columna
+        );
+    END IF;
+    EXECUTE format('SELECT array_agg(DISTINCT x) FROM (%s) AS t(x)', filas) INTO ids;
+
+    IF ids IS NULL THEN
+        -- La sentencia no tocó ninguna fila
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('ecoandino_cambios', json_build_object(
+        'tabla', COALESCE(TG_ARGV[0], TG_TABLE_NAME),
+        'operacion', TG_OP,
+        'ids', CASE WHEN cardinality(ids) <= 500 THEN ids END,
+        'pid', pg_backend_pid()
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notificar_insercion_categorias 
+    AFTER INSERT ON categorias 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_actualizacion_categorias 
+    AFTER UPDATE ON categorias 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_eliminacion_categorias 
+    AFTER DELETE ON categorias 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_insercion_materiales 
+    AFTER INSERT ON materiales 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_actualizacion_materiales 
+    AFTER UPDATE ON materiales 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_eliminacion_materiales 
+    AFTER DELETE ON materiales 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_insercion_puntos 
+    AFTER INSERT ON puntos_reciclaje 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_actualizacion_puntos 
+    AFTER UPDATE ON puntos_reciclaje 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_eliminacion_puntos 
+    AFTER DELETE ON puntos_reciclaje 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_insercion_punto_materiales 
+    AFTER INSERT ON punto_materiales 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER notificar_actualizacion_punto_materiales 
+    AFTER UPDATE ON punto_materiales 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER notificar_eliminacion_punto_materiales 
+    AFTER DELETE ON punto_materiales 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+-- ============================================================================
+-- TRIGGER DE REGIONES POR CIUDAD
+-- Registra la región de cada punto nuevo o movido en regiones_ciudad
+-- ============================================================================
+CREATE OR REPLACE FUNCTION registrar_region_ciudad()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO regiones_ciudad (ciudad, region)
+    VALUES (NEW.ciudad, NEW.region)
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER registrar_region_ciudad_puntos 
+    AFTER INSERT OR UPDATE OF ciudad, region ON puntos_reciclaje 
+    FOR EACH ROW EXECUTE FUNCTION registrar_region_ciudad();
+
 -- ============================================================================
 -- DATOS INICIALES: CATEGORÍAS
 -- ============================================================================
@@ -223,23 +491,25 @@ INSERT INTO materiales (nombre, categoria_id, codigo, descripcion, preparacion_r
 -- ============================================================================
 -- DATOS INICIALES: PUNTOS DE RECICLAJE
 -- ============================================================================
-INSERT INTO puntos_reciclaje (nombre, descripcion, direccion, ciudad, provincia, latitud, longitud, tipo_instalacion, horario_apertura, horario_cierre, telefono, email, instrucciones_acceso) VALUES
-('EcoPunto Centro Histórico', 'Centro de acopio principal en el centro de Quito', 'Av. García Moreno y Sucre', 'Quito', 'Pichincha', -0.2202, -78.5132, 'centro_acopio', '08:00:00', '18:00:00', '+593-2-123-4567', 'centro@ecoandino.com', 'Entrada por la puerta principal, mostrar cédula'),
+INSERT INTO puntos_reciclaje (nombre, descripcion, direccion, ciudad, provincia, latitud, longitud, tipo_instalacion, horario_apertura, horario_cierre, telefono, email, instrucciones_acceso, region) VALUES
+('EcoPunto Centro Histórico', 'Centro de acopio principal en el centro de Quito', 'Av. García Moreno y Sucre', 'Quito', 'Pichincha', -0.2202, -78.5132, 'centro_acopio', '08:00:00', '18:00:00', '+593-2-123-4567', 'centro@ecoandino.com', 'Entrada por la puerta principal, mostrar cédula', region_de(-0.2202, -78.5132)),
 
-('Punto Verde La Carolina', 'Estación de reciclaje en el Parque La Carolina', 'Parque La Carolina, junto al vivarium', 'Quito', 'Pichincha', -0.1807, -78.4840, 'punto_limpio', '06:00:00', '20:00:00', '+593-2-234-5678', 'carolina@ecoandino.com', 'Ubicado cerca de la laguna artificial'),
+('Punto Verde La Carolina', 'Estación de reciclaje en el Parque La Carolina', 'Parque La Carolina, junto al vivarium', 'Quito', 'Pichincha', -0.1807, -78.4840, 'punto_limpio', '06:00:00', '20:00:00', '+593-2-234-5678', 'carolina@ecoandino.com', 'Ubicado cerca de la laguna artificial', region_de(-0.1807, -78.4840)),
 
-('EcoEstación Norte', 'Punto de reciclaje en el sector norte de Quito', 'Av. Eloy Alfaro y De los Shyris', 'Quito', 'Pichincha', -0.1500, -78.4700, 'estacion_reciclaje', '07:00:00', '19:00:00', '+593-2-345-6789', 'norte@ecoandino.com', 'Acceso vehicular disponible, estacionamiento gratuito'),
+('EcoEstación Norte', 'Punto de reciclaje en el sector norte de Quito', 'Av. Eloy Alfaro y De los Shyris', 'Quito', 'Pichincha', -0.1500, -78.4700, 'estacion_reciclaje', '07:00:00', '19:00:00', '+593-2-345-6789', 'norte@ecoandino.com', 'Acceso vehicular disponible, estacionamiento gratuito', region_de(-0.1500, -78.4700)),
 
-('Punto Móvil Sur', 'Unidad móvil que recorre el sur de Quito', 'Variable según cronograma', 'Quito', 'Pichincha', -0.2800, -78.5200, 'punto_movil', '09:00:00', '17:00:00', '+593-99-123-4567', 'movil@ecoandino.com', 'Consultar cronograma de ubicaciones semanales'),
+('Punto Móvil Sur', 'Unidad móvil que recorre el sur de Quito', 'Variable según cronograma', 'Quito', 'Pichincha', -0.2800, -78.5200, 'punto_movil', '09:00:00', '17:00:00', '+593-99-123-4567', 'movil@ecoandino.com', 'Consultar cronograma de ubicaciones semanales', region_de(-0.2800, -78.5200)),
 
-('Contenedores Plaza Foch', 'Contenedores públicos especializados', 'Plaza Foch, La Mariscal', 'Quito', 'Pichincha', -0.2014, -78.4918, 'contenedor_publico', NULL, NULL, NULL, NULL, 'Contenedores disponibles 24/7, solo materiales específicos');
+('Contenedores Plaza Foch', 'Contenedores públicos especializados', 'Plaza Foch, La Mariscal', 'Quito', 'Pichincha', -0.2014, -78.4918, 'contenedor_publico', NULL, NULL, NULL, NULL, 'Contenedores disponibles 24/7, solo materiales específicos', region_de(-0.2014, -78.4918));
 
 -- ============================================================================
 -- RELACIONES: QUÉ MATERIALES ACEPTA CADA PUNTO
+-- Cada relación toma la región de su punto
 -- ============================================================================
 
 -- EcoPunto Centro Histórico - Acepta la mayoría de materiales básicos
-INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones) VALUES
+INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones, region)
+SELECT v.*, p.region FROM (VALUES
 (1, 1, true, 'Máximo 50 botellas por visita'),
 (1, 2, true, 'Lavar completamente antes de entregar'),
 (1, 3, true, 'Solo bolsas limpias y secas'),
@@ -253,10 +523,13 @@ INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaci
 (1, 12, true, 'Aplastar antes de entregar'),
 (1, 13, true, 'Quitar etiquetas de papel'),
 (1, 18, true, 'Solo ropa en buen estado'),
-(1, 23, true, 'Horario especial: 14:00-16:00');
+(1, 23, true, 'Horario especial: 14:00-16:00')
+) AS v(punto_reciclaje_id, material_id, acepta, observaciones)
+JOIN puntos_reciclaje p ON p.id = v.punto_reciclaje_id;
 
 -- Punto Verde La Carolina - Punto completo con materiales especiales
-INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones) VALUES
+INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones, region)
+SELECT v.*, p.region FROM (VALUES
 (2, 1, true, NULL),
 (2, 2, true, NULL),
 (2, 3, true, NULL),
@@ -278,10 +551,13 @@ INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaci
 (2, 22, true, 'Traer en botellas plásticas'),
 (2, 23, true, 'Horario especial: 10:00-12:00 y 15:00-17:00'),
 (2, 25, true, 'Coordinar entrega previa'),
-(2, 26, true, 'Evaluación previa requerida');
+(2, 26, true, 'Evaluación previa requerida')
+) AS v(punto_reciclaje_id, material_id, acepta, observaciones)
+JOIN puntos_reciclaje p ON p.id = v.punto_reciclaje_id;
 
 -- EcoEstación Norte - Especializado en electrónicos y metales
-INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones) VALUES
+INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones, region)
+SELECT v.*, p.region FROM (VALUES
 (3, 1, true, NULL),
 (3, 2, true, NULL),
 (3, 12, true, NULL),
@@ -293,10 +569,13 @@ INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaci
 (3, 22, true, 'Punto de recolección certificado'),
 (3, 27, true, 'Solo con cita previa'),
 (3, 28, true, 'Verificar que no estén vacíos'),
-(3, 29, true, 'Manejo especializado, cita obligatoria');
+(3, 29, true, 'Manejo especializado, cita obligatoria')
+) AS v(punto_reciclaje_id, material_id, acepta, observaciones)
+JOIN puntos_reciclaje p ON p.id = v.punto_reciclaje_id;
 
 -- Punto Móvil Sur - Básicos y textiles
-INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones) VALUES
+INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones, region)
+SELECT v.*, p.region FROM (VALUES
 (4, 1, true, 'Según capacidad del vehículo'),
 (4, 2, true, 'Según capacidad del vehículo'),
 (4, 5, true, 'Según capacidad del vehículo'),
@@ -305,16 +584,21 @@ INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaci
 (4, 10, true, 'Según capacidad del vehículo'),
 (4, 12, true, 'Según capacidad del vehículo'),
 (4, 18, true, 'Recolección especial de textiles'),
-(4, 19, true, 'Evaluación in situ');
+(4, 19, true, 'Evaluación in situ')
+) AS v(punto_reciclaje_id, material_id, acepta, observaciones)
+JOIN puntos_reciclaje p ON p.id = v.punto_reciclaje_id;
 
 -- Contenedores Plaza Foch - Solo básicos 24/7
-INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones) VALUES
+INSERT INTO punto_materiales (punto_reciclaje_id, material_id, acepta, observaciones, region)
+SELECT v.*, p.region FROM (VALUES
 (5, 1, true, 'Contenedor azul'),
 (5, 5, true, 'Contenedor azul'),
 (5, 6, true, 'Contenedor verde'),
 (5, 7, true, 'Contenedor verde'),
 (5, 9, true, 'Contenedor azul'),
-(5, 12, true, 'Contenedor gris');
+(5, 12, true, 'Contenedor gris')
+) AS v(punto_reciclaje_id, material_id, acepta, observaciones)
+JOIN puntos_reciclaje p ON p.id = v.punto_reciclaje_id;
 
 -- ============================================================================
 -- VISTAS PARA CONSULTAS ÚTILES
@@ -358,7 +642,7 @@ SELECT
     p.estado,
     COUNT(pm.material_id) as total_materiales_aceptados
 FROM puntos_reciclaje p
-LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.acepta = true
+LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true
 WHERE p.estado = 'activo'
 GROUP BY p.id, p.nombre, p.tipo_instalacion, p.direccion, p.ciudad, p.latitud, p.longitud, p.telefono, p.horario_apertura, p.horario_cierre, p.estado
 ORDER BY total_materiales_aceptados DESC;
@@ -384,7 +668,7 @@ SELECT
     pm.cantidad_maxima,
     pm.horario_especial
 FROM puntos_reciclaje p
-JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id
+JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
 JOIN materiales m ON pm.material_id = m.id
 JOIN categorias c ON m.categoria_id = c.id
 WHERE p.estado = 'activo' AND pm.acepta = true AND m.activo = true
@@ -430,7 +714,7 @@ BEGIN
         CAST(p.tipo_instalacion AS VARCHAR(50)),
         COUNT(pm.material_id)
     FROM puntos_reciclaje p
-    LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.acepta = true
+    LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true
     WHERE p.estado = 'activo'
     AND (
         6371 * acos(
@@ -453,6 +737,8 @@ COMMENT ON TABLE categorias IS 'Categorías principales de materiales reciclable
 COMMENT ON TABLE materiales IS 'Materiales específicos con instrucciones detalladas de preparación';
 COMMENT ON TABLE puntos_reciclaje IS 'Ubicaciones físicas donde se pueden llevar materiales reciclables';
 COMMENT ON TABLE punto_materiales IS 'Relación que define qué materiales acepta cada punto de reciclaje';
+COMMENT ON TABLE registros_eliminados IS 'Registros borrados, consultados por la sincronización incremental';
+COMMENT ON TABLE regiones_ciudad IS 'Regiones con puntos de cada ciudad, para descartar particiones al filtrar por ciudad';
 
 -- ============================================================================
 -- FINALIZACIÓN
@@ -300,15 +300,17 @@ def demo_puntos_reciclaje_crud():
     punto_data = {
         "nombre": "EcoPunto Centro",
         "direccion": "Calle 10 # 15-20, Centro",
+        "ciudad": "Bogotá",
         "latitud": 4.6097,
         "longitud": -74.0817,
         "telefono": "+57 1 234 5678",
         "email": "centro@ecopunto.com",
-        "horario_atencion": "Lunes a Viernes: 8:00 AM - 6:00 PM",
+        "horario_apertura": "08:00",
+        "horario_cierre": "18:00",
+        "dias_servicio": "Lunes,Martes,Miércoles,Jueves,Viernes",
         "tipo_instalacion": "centro_acopio",
         "estado": "activo",
-        "capacidad_maxima": 1000.0,
-        "activo": True
+        "capacidad_estimada": "1000 kg"
     }
 
     try:
@@ -373,7 +375,7 @@ def demo_puntos_reciclaje_crud():
     print_success("UPDATE - Actualizando información del punto...")
     update_data = {
         "telefono": "+57 1 234 9999",
-        "capacidad_maxima": 1500.0,
+        "capacidad_estimada": "1500 kg",
         "estado": "activo"
     }
 
@@ -386,7 +388,7 @@ def demo_puntos_reciclaje_crud():
             punto_actualizado = response.json()
             print_result("Punto actualizado exitosamente")
             print_result(f"Nuevo teléfono: {punto_actualizado['telefono']}")
-            print_result(f"Nueva capacidad: {punto_actualizado['capacidad_maxima']} kg")
+            print_result(f"Nueva capacidad: {punto_actualizado['capacidad_estimada']}")
         else:
             print_error(f"Error al actualizar punto: {response.status_code}")
     except Exception as e:
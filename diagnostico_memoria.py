@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+EcoAndino - Diagnóstico de Memoria de Endpoints de Listado
+==========================================================
+
+Carga filas sintéticas en categorias y materiales, llama a los endpoints de
+listado con el diagnóstico de memoria (tracemalloc) activo y comprueba que
+el pico de memoria de cada petición no supere el límite indicado. Al
+terminar elimina las filas sintéticas.
+
+Ejecutar: python diagnostico_memoria.py [--filas 100000] [--limite-materiales-mb 250]
+
+Requisitos:
+- DATABASE_URL apuntando a una base de datos de PRUEBAS con base.sql cargado
+- Todas las dependencias instaladas (incluido httpx para TestClient)
+
+Devuelve código de salida 1 si algún endpoint supera su límite.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# El diagnóstico debe activarse antes de importar la aplicación
+os.environ["MEMORIA_DIAGNOSTICO_HABILITADO"] = "true"
+os.environ["MEMORIA_MUESTREO"] = "1"
+# Un solo frame por asignación: el pico no depende de la profundidad de la
+# traza y el precalentamiento con muchas filas no se vuelve minutos
+os.environ["MEMORIA_FRAMES"] = "1"
+os.environ["COALESCENCIA_HABILITADA"] = "false"
+# /debug solo se monta en modo debug
+os.environ["DEBUG"] = "true"
+
+import psycopg2  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.config.settings import settings  # noqa: E402
+from app.main import app  # noqa: E402
+
+PREFIJO_CATEGORIA = "DG"
+PREFIJO_MATERIAL = "DM"
+
+
+class Colors:
+    """Colores para output en terminal"""
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    YELLOW = '\033[93m'
+    CYAN = '\033[96m'
+    BOLD = '\033[1m'
+    END = '\033[0m'
+
+
+def print_header(title: str):
+    """Imprime un encabezado estilizado"""
+    print(f"\n{Colors.CYAN}{Colors.BOLD}{'='*50}{Colors.END}")
+    print(f"{Colors.CYAN}{Colors.BOLD}{title.center(50)}{Colors.END}")
+    print(f"{Colors.CYAN}{Colors.BOLD}{'='*50}{Colors.END}\n")
+
+
+def print_success(message: str):
+    print(f"{Colors.GREEN}✅ {message}{Colors.END}")
+
+
+def print_error(message: str):
+    print(f"{Colors.RED}❌ {message}{Colors.END}")
+
+
+def print_info(message: str):
+    print(f"{Colors.YELLOW}ℹ️  {message}{Colors.END}")
+
+
+def cargar_filas(conn, filas: int):
+    """Insertar filas sintéticas: `filas` categorías y `filas` materiales"""
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO categorias (nombre, descripcion, codigo, orden_display)
+            SELECT 'Diagnóstico ' || lpad(g::text, 7, '0'),
+                   'Categoría sintética para el diagnóstico de memoria',
+                   %s || lpad(g::text, 7, '0'),
+                   1000 + g
+            FROM generate_series(1, %s) g;
+            """,
+            (PREFIJO_CATEGORIA, filas),
+        )
+        cur.execute(
+            """
+            INSERT INTO materiales (nombre, categoria_id, codigo, descripcion, ejemplos)
+            SELECT 'Material sintético ' || g,
+                   (SELECT id FROM categorias WHERE codigo = %s || '0000001'),
+                   %s || lpad(g::text, 7, '0'),
+                   'Material sintético para el diagnóstico de memoria',
+                   'Ejemplo ' || g
+            FROM generate_series(1, %s) g;
+            """,
+            (PREFIJO_CATEGORIA, PREFIJO_MATERIAL, filas),
+        )
+
+
+def eliminar_filas(conn):
+    """Eliminar las filas sintéticas (los materiales caen en cascada)"""
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM categorias WHERE codigo LIKE %s;", (PREFIJO_CATEGORIA + "%",))
+
+
+def esperar_preparado(client: TestClient, espera: float) -> bool:
+    """Esperar a que termine el precalentamiento para no medir sus asignaciones"""
+    limite = time.time() + espera
+    while time.time() < limite:
+        if client.get("/health/ready").status_code == 200:
+            return True
+        time.sleep(1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnóstico de memoria de endpoints de listado")
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--limite-categorias-mb", type=float, default=300)
+    parser.add_argument("--limite-materiales-mb", type=float, default=250)
+    args = parser.parse_args()
+
+    limites = {
+        "GET /api/v1/categorias": ("/api/v1/categorias/", args.limite_categorias_mb),
+        "GET /api/v1/materiales": ("/api/v1/materiales/", args.limite_materiales_mb),
+    }
+
+    print_header("DIAGNÓSTICO DE MEMORIA")
+    conn = psycopg2.connect(settings.database_url)
+    print_info(f"Cargando {args.filas} categorías y {args.filas} materiales sintéticos...")
+    cargar_filas(conn, args.filas)
+
+    fallos = 0
+    try:
+        with TestClient(app) as client:
+            if not esperar_preparado(client, espera=600):
+                print_error("La aplicación no terminó el precalentamiento")
+                sys.exit(1)
+
+            for ruta, (url, _) in limites.items():
+                for _ in range(args.repeticiones):
+                    respuesta = client.get(url)
+                    if respuesta.status_code != 200:
+                        print_error(f"{url} respondió {respuesta.status_code}")
+                        fallos += 1
+
+            # /debug exige el token de perfilado si está configurado
+            cabeceras = {}
+            if settings.perfilado_token:
+                cabeceras["X-Profile-Token"] = settings.perfilado_token
+            estado = client.get("/debug/memory", headers=cabeceras).json()["rutas"]
+            for ruta, (url, limite_mb) in limites.items():
+                medida = estado.get(ruta)
+                if not medida:
+                    print_error(f"{ruta}: sin muestras")
+                    fallos += 1
+                    continue
+                pico_mb = medida["pico_maximo_kb"] / 1024
+                mensaje = f"{ruta}: pico {pico_mb:.1f} MB (límite {limite_mb:.0f} MB, {medida['muestras']} muestras)"
+                if pico_mb <= limite_mb:
+                    print_success(mensaje)
+                else:
+                    print_error(mensaje)
+                    fallos += 1
+    finally:
+        print_info("Eliminando filas sintéticas...")
+        eliminar_filas(conn)
+        conn.close()
+
+    if fallos:
+        print_error(f"{fallos} comprobaciones fallidas")
+        sys.exit(1)
+    print_success("Todos los endpoints dentro de sus límites de memoria")
+
+
+if __name__ == "__main__":
+    main()
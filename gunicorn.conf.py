@@ -0,0 +1,48 @@
+"""Configuración de gunicorn para producción.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+- Un worker uvicorn por CPU (o settings.workers), creados por fork desde
+  un maestro que ya importó la aplicación (preload_app).
+- El maestro genera el snapshot del catálogo antes de crear los workers y,
+  si MEMORIA_COMPARTIDA_DIR está definido, lo publica en memoria compartida
+  para que todos lo sirvan desde la misma copia mapeada. Después cede el
+  papel de publicador: lo toma el primer worker que reciba un cambio.
+- Recarga sin cortes: `kill -HUP <pid maestro>` reemplaza los workers de uno
+  en uno; para cargar código nuevo con preload_app usar `kill -USR2` y luego
+  `kill -QUIT` al maestro anterior.
+"""
+import logging
+import multiprocessing
+
+from app.config.settings import settings
+
+bind = settings.bind
+workers = settings.workers or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = settings.worker_timeout
+graceful_timeout = settings.graceful_timeout
+keepalive = 5
+
+# Reciclar workers periódicamente acota cualquier crecimiento de memoria
+max_requests = 10000
+max_requests_jitter = 1000
+
+
+def when_ready(server):
+    """Precalentar el snapshot en el maestro, antes del fork de los workers"""
+    from app.config.database import cerrar_pool
+    from app.services.snapshot_service import snapshot_catalogo
+
+    try:
+        snapshot_catalogo.obtener()
+        server.log.info("Snapshot del catálogo generado en el maestro")
+    except Exception:
+        # Sin base de datos disponible cada worker lo generará bajo demanda
+        logging.getLogger(__name__).exception("No se pudo precalentar el snapshot")
+    finally:
+        # Ni los sockets ni el flock de publicador deben heredarse por los workers
+        snapshot_catalogo.ceder()
+        cerrar_pool()
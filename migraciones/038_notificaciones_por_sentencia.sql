@@ -0,0 +1,130 @@
+-- ============================================================================
+-- MIGRACIÓN 038: NOTIFICACIONES POR SENTENCIA
+-- Sustituye los triggers FOR EACH ROW de notificar_cambio() por triggers
+-- FOR EACH STATEMENT con tablas de transición, igual que el base.sql actual:
+-- cada sentencia envía un solo NOTIFY con los ids distintos que tocó en
+-- lugar de uno por fila.
+--
+-- Ejecutar:  psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migraciones/038_notificaciones_por_sentencia.sql
+--
+-- Sirve tanto para bases con tablas planas como para las ya particionadas
+-- (migración 045). La API acepta los avisos de ambos formatos, así que
+-- puede desplegarse antes o después de ejecutarla.
+-- ============================================================================
+BEGIN;
+
+DROP TRIGGER IF EXISTS notificar_cambio_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_insercion_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_actualizacion_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_eliminacion_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_cambio_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_insercion_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_actualizacion_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_eliminacion_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_cambio_puntos ON puntos_reciclaje;
+DROP TRIGGER IF EXISTS notificar_insercion_puntos ON puntos_reciclaje;
+DROP TRIGGER IF EXISTS notificar_actualizacion_puntos ON puntos_reciclaje;
+DROP TRIGGER IF EXISTS notificar_eliminacion_puntos ON puntos_reciclaje;
+DROP TRIGGER IF EXISTS notificar_cambio_punto_materiales ON punto_materiales;
+DROP TRIGGER IF EXISTS notificar_insercion_punto_materiales ON punto_materiales;
+DROP TRIGGER IF EXISTS notificar_actualizacion_punto_materiales ON punto_materiales;
+DROP TRIGGER IF EXISTS notificar_eliminacion_punto_materiales ON punto_materiales;
+
+CREATE OR REPLACE FUNCTION notificar_cambio()
+RETURNS TRIGGER AS $$
+DECLARE
+    columna TEXT := 'id';
+    filas TEXT;
+    ids INTEGER[];
+BEGIN
+    IF COALESCE(TG_ARGV[0], TG_TABLE_NAME) = 'punto_materiales' THEN
+        columna := 'punto_reciclaje_id';
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        filas := format('SELECT %I FROM filas_nuevas', columna);
+    ELSIF TG_OP = 'DELETE' THEN
+        filas := format('SELECT %I FROM filas_viejas', columna);
+    ELSE
+        filas := format(
+            'SELECT %1$I FROM filas_nuevas UNION SELECT %1$I FROM filas_viejas', columna
+        );
+    END IF;
+    EXECUTE format('SELECT array_agg(DISTINCT x) FROM (%s) AS t(x)', filas) INTO ids;
+
+    IF ids IS NULL THEN
+        -- La sentencia no tocó ninguna fila
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('ecoandino_cambios', json_build_object(
+        'tabla', COALESCE(TG_ARGV[0], TG_TABLE_NAME),
+        'operacion', TG_OP,
+        'ids', CASE WHEN cardinality(ids) <= 500 THEN ids END,
+        'pid', pg_backend_pid()
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notificar_insercion_categorias 
+    AFTER INSERT ON categorias 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_actualizacion_categorias 
+    AFTER UPDATE ON categorias 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_eliminacion_categorias 
+    AFTER DELETE ON categorias 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_insercion_materiales 
+    AFTER INSERT ON materiales 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_actualizacion_materiales 
+    AFTER UPDATE ON materiales 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_eliminacion_materiales 
+    AFTER DELETE ON materiales 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_insercion_puntos 
+    AFTER INSERT ON puntos_reciclaje 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_actualizacion_puntos 
+    AFTER UPDATE ON puntos_reciclaje 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_eliminacion_puntos 
+    AFTER DELETE ON puntos_reciclaje 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_insercion_punto_materiales 
+    AFTER INSERT ON punto_materiales 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER notificar_actualizacion_punto_materiales 
+    AFTER UPDATE ON punto_materiales 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER notificar_eliminacion_punto_materiales 
+    AFTER DELETE ON punto_materiales 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+COMMIT;
@@ -0,0 +1,446 @@
+-- ============================================================================
+-- MIGRACIÓN 045: PARTICIONADO REGIONAL
+-- Convierte puntos_reciclaje y punto_materiales de una base creada con el
+-- base.sql anterior (tablas planas) en tablas particionadas por región,
+-- igual que el base.sql actual. Conserva ids, secuencias y fechas; no genera
+-- tombstones ni notificaciones.
+--
+-- Ejecutar:  psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migraciones/045_particionado_regional.sql
+--
+-- Requiere PostgreSQL 15 o superior. Todo ocurre en una transacción que
+-- bloquea ambas tablas mientras se copian: programarla fuera de horario y
+-- reiniciar la API al terminar para que reconstruya sus índices en memoria.
+-- ============================================================================
+BEGIN;
+
+LOCK TABLE puntos_reciclaje, punto_materiales IN ACCESS EXCLUSIVE MODE;
+
+-- ----------------------------------------------------------------------------
+-- Regiones y funciones de trigger (las mismas definiciones que base.sql)
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION region_de(lat NUMERIC, lng NUMERIC)
+RETURNS INTEGER AS $$
+    SELECT (LEAST(floor(lat), 89)::INTEGER + 90) * 360 + (LEAST(floor(lng), 179)::INTEGER + 180);
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+-- Crea una partición por cada franja de `paso` grados de latitud entre
+-- lat_min y lat_max, más la partición por defecto para el resto del globo
+CREATE OR REPLACE FUNCTION crear_particiones_region(
+    tabla TEXT, lat_min INTEGER, lat_max INTEGER, paso INTEGER DEFAULT 4
+)
+RETURNS VOID AS $$
+DECLARE
+    lat INTEGER;
+BEGIN
+    lat := lat_min;
+    WHILE lat < lat_max LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+            format('%s_lat_%s', tabla, replace(lat::TEXT, '-', 'm')),
+            tabla,
+            (lat + 90) * 360,
+            (LEAST(lat + paso, lat_max) + 90) * 360
+        );
+        lat := lat + paso;
+    END LOOP;
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', tabla || '_otras', tabla);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION registrar_eliminacion()
+RETURNS TRIGGER AS $$
+DECLARE
+    tabla TEXT := COALESCE(TG_ARGV[0], TG_TABLE_NAME);
+    sigue BOOLEAN;
+BEGIN
+    IF TG_ARGV[0] IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE id = $1)', tabla)
+            INTO sigue USING OLD.id;
+        IF sigue THEN
+            RETURN OLD;
+        END IF;
+    END IF;
+    INSERT INTO registros_eliminados (tabla, registro_id) VALUES (tabla, OLD.id);
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION notificar_cambio()
+RETURNS TRIGGER AS $$
+DECLARE
+    columna TEXT := 'id';
+    filas TEXT;
+    ids INTEGER[];
+BEGIN
+    IF COALESCE(TG_ARGV[0], TG_TABLE_NAME) = 'punto_materiales' THEN
+        columna := 'punto_reciclaje_id';
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        filas := format('SELECT %I FROM filas_nuevas', columna);
+    ELSIF TG_OP = 'DELETE' THEN
+        filas := format('SELECT %I FROM filas_viejas', columna);
+    ELSE
+        filas := format(
+            'SELECT %1$I FROM filas_nuevas UNION SELECT %1$I FROM filas_viejas', columna
+        );
+    END IF;
+    EXECUTE format('SELECT array_agg(DISTINCT x) FROM (%s) AS t(x)', filas) INTO ids;
+
+    IF ids IS NULL THEN
+        -- La sentencia no tocó ninguna fila
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('ecoandino_cambios', json_build_object(
+        'tabla', COALESCE(TG_ARGV[0], TG_TABLE_NAME),
+        'operacion', TG_OP,
+        'ids', CASE WHEN cardinality(ids) <= 500 THEN ids END,
+        'pid', pg_backend_pid()
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION registrar_region_ciudad()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO regiones_ciudad (ciudad, region)
+    VALUES (NEW.ciudad, NEW.region)
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- ----------------------------------------------------------------------------
+-- Apartar las tablas planas; las secuencias pasan a las tablas nuevas
+-- ----------------------------------------------------------------------------
+DROP VIEW IF EXISTS vista_puntos_resumen;
+DROP VIEW IF EXISTS vista_puntos_por_material;
+
+ALTER TABLE punto_materiales RENAME TO punto_materiales_plana;
+ALTER TABLE punto_materiales_plana RENAME CONSTRAINT punto_materiales_pkey TO punto_materiales_plana_pkey;
+ALTER TABLE puntos_reciclaje RENAME TO puntos_reciclaje_plana;
+ALTER TABLE puntos_reciclaje_plana RENAME CONSTRAINT puntos_reciclaje_pkey TO puntos_reciclaje_plana_pkey;
+
+ALTER SEQUENCE puntos_reciclaje_id_seq OWNED BY NONE;
+ALTER SEQUENCE punto_materiales_id_seq OWNED BY NONE;
+
+-- ----------------------------------------------------------------------------
+-- Tablas particionadas
+-- ----------------------------------------------------------------------------
+CREATE TABLE puntos_reciclaje (
+    id INTEGER NOT NULL DEFAULT nextval('puntos_reciclaje_id_seq'),
+    nombre VARCHAR(100) NOT NULL,
+    descripcion TEXT,
+    direccion VARCHAR(200) NOT NULL,
+    ciudad VARCHAR(50) NOT NULL,
+    provincia VARCHAR(50),
+    codigo_postal VARCHAR(10),
+    latitud DECIMAL(10, 8) NOT NULL,
+    longitud DECIMAL(11, 8) NOT NULL,
+    tipo_instalacion tipo_instalacion_enum DEFAULT 'centro_acopio',
+    horario_apertura TIME,
+    horario_cierre TIME,
+    dias_servicio VARCHAR(100) DEFAULT 'Lunes,Martes,Miércoles,Jueves,Viernes,Sábado',
+    telefono VARCHAR(20),
+    email VARCHAR(100),
+    sitio_web VARCHAR(200),
+    capacidad_estimada VARCHAR(50), -- Descripción de capacidad
+    instrucciones_acceso TEXT, -- Cómo llegar o instrucciones especiales
+    foto_url VARCHAR(500), -- URL de foto del punto
+    estado estado_punto_enum DEFAULT 'activo',
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    region INTEGER NOT NULL, -- region_de(latitud, longitud), clave de partición
+
+    PRIMARY KEY (id, region),
+    CONSTRAINT puntos_reciclaje_region_check CHECK (region = region_de(latitud, longitud))
+) PARTITION BY RANGE (region);
+
+SELECT crear_particiones_region('puntos_reciclaje', -56, 16);
+
+CREATE TABLE punto_materiales (
+    id INTEGER NOT NULL DEFAULT nextval('punto_materiales_id_seq'),
+    punto_reciclaje_id INTEGER NOT NULL,
+    region INTEGER NOT NULL, -- la del punto: cada relación vive en la partición de su punto
+    material_id INTEGER NOT NULL,
+    acepta BOOLEAN DEFAULT TRUE,
+    observaciones TEXT, -- Condiciones especiales para este material en este punto
+    cantidad_maxima VARCHAR(50), -- Límite de cantidad si aplica
+    horario_especial VARCHAR(100), -- Si tiene horario diferente para este material
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, region),
+    UNIQUE(punto_reciclaje_id, material_id, region)
+) PARTITION BY RANGE (region);
+
+SELECT crear_particiones_region('punto_materiales', -56, 16);
+
+ALTER SEQUENCE puntos_reciclaje_id_seq OWNED BY puntos_reciclaje.id;
+ALTER SEQUENCE punto_materiales_id_seq OWNED BY punto_materiales.id;
+
+CREATE TABLE IF NOT EXISTS regiones_ciudad (
+    ciudad VARCHAR(50) NOT NULL,
+    region INTEGER NOT NULL,
+    PRIMARY KEY (ciudad, region)
+);
+
+-- ----------------------------------------------------------------------------
+-- Copia de los datos (antes de crear triggers, claves foráneas e índices
+-- secundarios, que se validan y construyen de una vez al final)
+-- ----------------------------------------------------------------------------
+INSERT INTO puntos_reciclaje
+SELECT p.*, region_de(p.latitud, p.longitud)
+FROM puntos_reciclaje_plana p;
+
+INSERT INTO punto_materiales (
+    id, punto_reciclaje_id, region, material_id, acepta, observaciones,
+    cantidad_maxima, horario_especial, created_at, updated_at
+)
+SELECT pm.id, pm.punto_reciclaje_id, p.region, pm.material_id, pm.acepta, pm.observaciones,
+       pm.cantidad_maxima, pm.horario_especial, pm.created_at, pm.updated_at
+FROM punto_materiales_plana pm
+JOIN puntos_reciclaje p ON p.id = pm.punto_reciclaje_id;
+
+INSERT INTO regiones_ciudad (ciudad, region)
+SELECT DISTINCT ciudad, region FROM puntos_reciclaje
+ON CONFLICT DO NOTHING;
+
+DO $$
+BEGIN
+    IF (SELECT COUNT(*) FROM puntos_reciclaje) <> (SELECT COUNT(*) FROM puntos_reciclaje_plana)
+       OR (SELECT COUNT(*) FROM punto_materiales) <> (SELECT COUNT(*) FROM punto_materiales_plana) THEN
+        RAISE EXCEPTION 'La copia no coincide con las tablas planas; migración cancelada';
+    END IF;
+END;
+$$;
+
+DROP TABLE punto_materiales_plana;
+DROP TABLE puntos_reciclaje_plana;
+
+ALTER TABLE punto_materiales
+    ADD FOREIGN KEY (punto_reciclaje_id, region) REFERENCES puntos_reciclaje(id, region)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+    ADD FOREIGN KEY (material_id) REFERENCES materiales(id) ON DELETE CASCADE;
+
+-- ----------------------------------------------------------------------------
+-- Índices
+-- ----------------------------------------------------------------------------
+CREATE INDEX idx_puntos_ciudad ON puntos_reciclaje(ciudad);
+CREATE INDEX idx_puntos_coordenadas ON puntos_reciclaje(latitud, longitud);
+CREATE INDEX idx_puntos_tipo ON puntos_reciclaje(tipo_instalacion);
+CREATE INDEX idx_puntos_estado ON puntos_reciclaje(estado);
+CREATE INDEX idx_puntos_region ON puntos_reciclaje(region);
+CREATE INDEX idx_punto_materiales_punto ON punto_materiales(punto_reciclaje_id);
+CREATE INDEX idx_punto_materiales_material ON punto_materiales(material_id);
+CREATE INDEX idx_puntos_fecha_actualizacion ON puntos_reciclaje(fecha_actualizacion);
+CREATE INDEX idx_punto_materiales_updated_at ON punto_materiales(updated_at);
+
+-- ----------------------------------------------------------------------------
+-- Triggers
+-- ----------------------------------------------------------------------------
+-- notificar_cambio() ahora es por sentencia: sustituir también los triggers
+-- por fila de categorias y materiales (ver migración 038)
+DROP TRIGGER IF EXISTS notificar_cambio_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_cambio_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_insercion_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_actualizacion_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_eliminacion_categorias ON categorias;
+DROP TRIGGER IF EXISTS notificar_insercion_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_actualizacion_materiales ON materiales;
+DROP TRIGGER IF EXISTS notificar_eliminacion_materiales ON materiales;
+
+CREATE TRIGGER notificar_insercion_categorias 
+    AFTER INSERT ON categorias 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_actualizacion_categorias 
+    AFTER UPDATE ON categorias 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_eliminacion_categorias 
+    AFTER DELETE ON categorias 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_insercion_materiales 
+    AFTER INSERT ON materiales 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_actualizacion_materiales 
+    AFTER UPDATE ON materiales 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_eliminacion_materiales 
+    AFTER DELETE ON materiales 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER update_puntos_updated_at 
+    BEFORE UPDATE ON puntos_reciclaje 
+    FOR EACH ROW EXECUTE FUNCTION update_fecha_actualizacion_column();
+
+CREATE TRIGGER update_punto_materiales_updated_at 
+    BEFORE UPDATE ON punto_materiales 
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER registrar_eliminacion_puntos 
+    AFTER DELETE ON puntos_reciclaje 
+    FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion('puntos_reciclaje');
+
+CREATE TRIGGER registrar_eliminacion_punto_materiales 
+    AFTER DELETE ON punto_materiales 
+    FOR EACH ROW EXECUTE FUNCTION registrar_eliminacion('punto_materiales');
+
+CREATE TRIGGER notificar_insercion_puntos 
+    AFTER INSERT ON puntos_reciclaje 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_actualizacion_puntos 
+    AFTER UPDATE ON puntos_reciclaje 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_eliminacion_puntos 
+    AFTER DELETE ON puntos_reciclaje 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('puntos_reciclaje');
+
+CREATE TRIGGER notificar_insercion_punto_materiales 
+    AFTER INSERT ON punto_materiales 
+    REFERENCING NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER notificar_actualizacion_punto_materiales 
+    AFTER UPDATE ON punto_materiales 
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER notificar_eliminacion_punto_materiales 
+    AFTER DELETE ON punto_materiales 
+    REFERENCING OLD TABLE AS filas_viejas 
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio('punto_materiales');
+
+CREATE TRIGGER registrar_region_ciudad_puntos 
+    AFTER INSERT OR UPDATE OF ciudad, region ON puntos_reciclaje 
+    FOR EACH ROW EXECUTE FUNCTION registrar_region_ciudad();
+
+-- ----------------------------------------------------------------------------
+-- Vistas y función de búsqueda, con el join por región
+-- ----------------------------------------------------------------------------
+-- Vista de puntos con conteo de materiales que aceptan
+CREATE VIEW vista_puntos_resumen AS
+SELECT 
+    p.id,
+    p.nombre,
+    p.tipo_instalacion,
+    p.direccion,
+    p.ciudad,
+    p.latitud,
+    p.longitud,
+    p.telefono,
+    p.horario_apertura,
+    p.horario_cierre,
+    p.estado,
+    COUNT(pm.material_id) as total_materiales_aceptados
+FROM puntos_reciclaje p
+LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true
+WHERE p.estado = 'activo'
+GROUP BY p.id, p.nombre, p.tipo_instalacion, p.direccion, p.ciudad, p.latitud, p.longitud, p.telefono, p.horario_apertura, p.horario_cierre, p.estado
+ORDER BY total_materiales_aceptados DESC;
+
+-- Vista para buscar puntos por material específico
+CREATE VIEW vista_puntos_por_material AS
+SELECT 
+    p.id as punto_id,
+    p.nombre as punto_nombre,
+    p.direccion,
+    p.ciudad,
+    p.latitud,
+    p.longitud,
+    p.telefono,
+    p.tipo_instalacion,
+    p.horario_apertura,
+    p.horario_cierre,
+    m.id as material_id,
+    m.nombre as material_nombre,
+    m.codigo as material_codigo,
+    c.nombre as categoria_nombre,
+    pm.observaciones,
+    pm.cantidad_maxima,
+    pm.horario_especial
+FROM puntos_reciclaje p
+JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region
+JOIN materiales m ON pm.material_id = m.id
+JOIN categorias c ON m.categoria_id = c.id
+WHERE p.estado = 'activo' AND pm.acepta = true AND m.activo = true
+ORDER BY p.ciudad, p.nombre, c.orden_display, m.nombre;
+
+CREATE OR REPLACE FUNCTION buscar_puntos_cercanos(
+    lat_usuario DECIMAL(10,8), 
+    lng_usuario DECIMAL(11,8), 
+    radio_km DECIMAL DEFAULT 10
+)
+RETURNS TABLE (
+    punto_id INTEGER,
+    nombre VARCHAR(100),
+    direccion VARCHAR(200),
+    distancia_km DECIMAL,
+    latitud DECIMAL(10,8),
+    longitud DECIMAL(11,8),
+    tipo_instalacion VARCHAR(50),
+    total_materiales BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 
+        p.id,
+        p.nombre,
+        p.direccion,
+        ROUND(
+            CAST(
+                6371 * acos(
+                    cos(radians(lat_usuario)) * 
+                    cos(radians(p.latitud)) * 
+                    cos(radians(p.longitud) - radians(lng_usuario)) + 
+                    sin(radians(lat_usuario)) * 
+                    sin(radians(p.latitud))
+                ) AS DECIMAL
+            ), 2
+        ) as distancia_km,
+        p.latitud,
+        p.longitud,
+        CAST(p.tipo_instalacion AS VARCHAR(50)),
+        COUNT(pm.material_id)
+    FROM puntos_reciclaje p
+    LEFT JOIN punto_materiales pm ON p.id = pm.punto_reciclaje_id AND pm.region = p.region AND pm.acepta = true
+    WHERE p.estado = 'activo'
+    AND (
+        6371 * acos(
+            cos(radians(lat_usuario)) * 
+            cos(radians(p.latitud)) * 
+            cos(radians(p.longitud) - radians(lng_usuario)) + 
+            sin(radians(lat_usuario)) * 
+            sin(radians(p.latitud))
+        )
+    ) <= radio_km
+    GROUP BY p.id, p.nombre, p.direccion, p.latitud, p.longitud, p.tipo_instalacion
+    ORDER BY distancia_km;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON TABLE puntos_reciclaje IS 'Ubicaciones físicas donde se pueden llevar materiales reciclables';
+COMMENT ON TABLE punto_materiales IS 'Relación que define qué materiales acepta cada punto de reciclaje';
+COMMENT ON TABLE regiones_ciudad IS 'Regiones con puntos de cada ciudad, para descartar particiones al filtrar por ciudad';
+
+COMMIT;
+
+ANALYZE puntos_reciclaje;
+ANALYZE punto_materiales;
+ANALYZE regiones_ciudad;